@@ -0,0 +1,185 @@
+"""
+Admission and discharge workflow.
+
+Admitting, attending or discharging a patient used to be a bare status
+change with a full ``patient.save()``. Here each is one transaction that
+locks the patient row, writes only ``status`` (and ``ward``) with
+``update_fields``, puts the patient in a bed or frees their bed, resolves
+the ``PendingAdmission`` / ``PlannedDischarge`` / appointment it settles and
+appends a ``PatientTransition`` row. Either all of that happens or none of
+it does.
+
+``discharge_ward()`` is the end-of-day batch: every admitted patient on a
+ward whose planned discharge is due (or an explicit list) is discharged
+with one bulk UPDATE per table and one bulk INSERT of history, instead of
+a request per patient.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import beds, charts, handover, transitions
+from .models import (
+    Appointment, BedStatus, Patient, PatientTransition, PendingAdmission, PlannedDischarge,
+)
+
+ADMITTED = "Admitted"
+ATTENDED = "Attended"
+DISCHARGED = "Discharged"
+
+
+class InvalidPatientTransition(Exception):
+    """The patient is already admitted/discharged, or the admission it settles is gone."""
+
+
+def _lock(patient_id):
+    """The patient row, locked for the rest of the transaction. Raises Patient.DoesNotExist."""
+    return Patient.objects.select_for_update().only("id", "status", "ward").get(pk=patient_id)
+
+
+def _set_status(patient, action, target, actor, bed=None, fields=()):
+    source, patient.status = patient.status, target
+    patient.save(update_fields=["status", "updated_at", *fields])
+    PatientTransition.objects.create(
+        patient=patient, action=action, from_status=source, to_status=target,
+        ward=bed.ward if bed else patient.ward, bed=bed, actor=actor,
+    )
+
+
+# -----------------------------
+# Single patient
+# -----------------------------
+def admit(patient_id, actor=None, ward=None, bed_id=None, pending_admission_id=None):
+    """
+    Admit ``patient_id`` into bed ``bed_id``, or the first free bed of
+    ``ward`` (defaulting to the pending admission's ward), or without a bed
+    if neither is given. Marks the pending admission processed.
+    Returns the bed (or None). Raises Patient.DoesNotExist,
+    BedStatus.DoesNotExist, beds.BedConflict or InvalidPatientTransition.
+    """
+    with transaction.atomic():
+        patient = _lock(patient_id)
+        if patient.status == ADMITTED:
+            raise InvalidPatientTransition("Patient is already admitted")
+        pending = None
+        if pending_admission_id is not None:
+            pending = PendingAdmission.objects.select_for_update().filter(
+                pk=pending_admission_id, processed=False
+            ).first()
+            if pending is None:
+                raise InvalidPatientTransition(f"No open pending admission {pending_admission_id}")
+            ward = ward or pending.ward
+
+        bed = None
+        if bed_id is not None:
+            bed = beds.assign(bed_id, patient.pk)
+        elif ward:
+            bed = beds.allocate(ward, patient.pk)
+        fields = ()
+        if bed is not None and patient.ward != bed.ward:
+            patient.ward = bed.ward
+            fields = ("ward",)
+
+        if pending is not None:
+            pending.processed = True
+            pending.patient = patient
+            pending.save(update_fields=["processed", "patient"])
+        _set_status(patient, "admit", ADMITTED, actor, bed=bed, fields=fields)
+    return bed
+
+
+def discharge(patient_id, actor=None):
+    """
+    Discharge ``patient_id``: free their bed and complete their open
+    planned discharges. Returns the freed bed (or None).
+    """
+    with transaction.atomic():
+        patient = _lock(patient_id)
+        if patient.status == DISCHARGED:
+            raise InvalidPatientTransition("Patient is already discharged")
+        bed = None
+        for bed_id in BedStatus.objects.filter(patient_id=patient.pk, occupied=True).values_list("pk", flat=True):
+            bed = beds.release(bed_id)
+        PlannedDischarge.objects.filter(patient_id=patient.pk, completed=False).update(completed=True)
+        _set_status(patient, "discharge", DISCHARGED, actor, bed=bed)
+    return bed
+
+
+def attend(patient_id, actor=None, appointment_id=None):
+    """
+    Mark ``patient_id`` attended and complete the appointment they came
+    for: ``appointment_id``, or else their earliest accepted one today.
+    A returning outpatient may already be attended; each visit is logged.
+    Returns the completed appointment's id (or None). Raises
+    transitions.InvalidTransition / TransitionNotFound for a given
+    appointment that cannot be completed.
+    """
+    appointments = Appointment.objects.filter(patient_id=patient_id)
+    with transaction.atomic():
+        patient = _lock(patient_id)
+        if appointment_id is None:
+            appointment_id = appointments.filter(
+                date=timezone.localdate(), status__in=transitions.spellings("ACCEPTED"),
+            ).order_by("time", "id").values_list("pk", flat=True).first()
+        if appointment_id is not None:
+            transitions.transition(appointments, appointment_id, "complete", actor=actor)
+        _set_status(patient, "attend", ATTENDED, actor)
+    return appointment_id
+
+
+# -----------------------------
+# Ward batch discharge
+# -----------------------------
+def end_of_day(now=None):
+    """Midnight after ``now``, in local time."""
+    tomorrow = timezone.localdate(now) + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(tomorrow, time.min))
+
+
+def discharge_ward(ward, actor=None, until=None, patient_ids=None):
+    """
+    Discharge the admitted patients on ``ward``: those in ``patient_ids``,
+    or else those with an open planned discharge due before ``until``
+    (default: the end of today). Returns the ids discharged; listed
+    patients who are not admitted on the ward are left alone.
+    """
+    now = timezone.now()
+    patients = Patient.objects.select_for_update().filter(ward=ward, status=ADMITTED)
+    if patient_ids is not None:
+        patients = patients.filter(pk__in=patient_ids)
+    else:
+        due = PlannedDischarge.objects.filter(completed=False, target_time__lt=until or end_of_day(now))
+        patients = patients.filter(pk__in=due.values("patient_id"))
+
+    with transaction.atomic():
+        ids = list(patients.order_by("pk").values_list("pk", flat=True))
+        if not ids:
+            return []
+        freed = list(
+            BedStatus.objects.select_for_update().filter(patient_id__in=ids, occupied=True)
+            .values_list("pk", "patient_id", "ward", "bed_number")
+        )
+        Patient.objects.filter(pk__in=ids).update(status=DISCHARGED, updated_at=now)
+        BedStatus.objects.filter(pk__in=[row[0] for row in freed]).update(occupied=False, patient=None, updated_at=now)
+        PlannedDischarge.objects.filter(patient_id__in=ids, completed=False).update(completed=True)
+
+        bed_of = {patient_id: bed_id for bed_id, patient_id, _, _ in freed}
+        PatientTransition.objects.bulk_create([
+            PatientTransition(
+                patient_id=patient_id, action="discharge", from_status=ADMITTED, to_status=DISCHARGED,
+                ward=ward, bed_id=bed_of.get(patient_id), actor=actor,
+            )
+            for patient_id in ids
+        ])
+
+        # Bulk updates send no signals; do what the receivers would have.
+        charts.mark_stale(*ids)
+        transaction.on_commit(handover.changed)
+
+        def free_on_board():
+            for bed_id, _, bed_ward, number in freed:
+                beds.board.changed(bed_id, bed_ward, number, False, None)
+
+        transaction.on_commit(free_on_board)
+    return ids
@@ -0,0 +1,186 @@
+"""
+JWT authentication without a per-request user query.
+
+Tokens carry the user's ``role``, ``specialization`` and ``is_active`` as
+claims, stamped at login and again on every refresh. ``ClaimsJWTAuthentication``
+turns them into a ``User`` holding just those fields; whatever else a view
+reads (name, email, ...) is loaded in one query on first access.
+
+Tokens without the claims (issued before they existed), and users saved in
+this process since the token was issued, go through ``user_cache`` instead:
+a short-TTL in-process cache of user rows that ``User`` saves and deletes
+clear (see signals.py). Changes made in another process reach tokens issued
+earlier once the access token expires or is refreshed.
+"""
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from . import metrics, revocation
+from .models import User
+
+CLAIM_FIELDS = ("role", "specialization", "is_active")
+CACHE_TTL = 60          # seconds a cached user row is trusted
+CACHE_MAX = 10000
+
+
+def add_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return token
+
+
+def _build_user(values):
+    """A ``User`` from {attname: value}; missing fields are deferred."""
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def user_from_claims(user_id, token):
+    user = _build_user({"id": user_id, **{field: token[field] for field in CLAIM_FIELDS}})
+    user._from_claims = True
+    return user
+
+
+# -----------------------------
+# User cache
+# -----------------------------
+class UserCache:
+    """{user id: full user row} with a TTL, plus when each user last changed."""
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._changed = {}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._rows.get(user_id)
+        hit = entry is not None and entry[0] > now
+        metrics.cache_lookup("users", hit)
+        if hit:
+            row = entry[1]
+        else:
+            row = User.objects.filter(pk=user_id).values().first()
+            if row is None:
+                return None
+            with self._lock:
+                if len(self._rows) >= CACHE_MAX:
+                    self._rows = {k: v for k, v in self._rows.items() if v[0] > now}
+                self._rows[user_id] = (now + self.ttl, row)
+        return _build_user(row)
+
+    def invalidate(self, user_id):
+        now = time.time()
+        horizon = now - api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        with self._lock:
+            self._rows.pop(user_id, None)
+            if len(self._changed) >= CACHE_MAX:
+                self._changed = {k: t for k, t in self._changed.items() if t > horizon}
+            self._changed[user_id] = now
+
+    def changed_since(self, user_id, issued_at):
+        """True if the user was saved in this process at or after ``issued_at`` (epoch seconds)."""
+        return self._changed.get(user_id, 0) >= issued_at
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._changed.clear()
+
+
+user_cache = UserCache()
+
+
+# -----------------------------
+# Authentication
+# -----------------------------
+class TimedJWTAuthentication(JWTAuthentication):
+    """simplejwt authentication that records its own latency for /metrics."""
+
+    def authenticate(self, request):
+        started = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            metrics.observe("auth_duration_seconds", time.perf_counter() - started, authenticator="jwt")
+
+
+class ClaimsJWTAuthentication(TimedJWTAuthentication):
+    """Builds ``request.user`` from token claims, falling back to ``user_cache``."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(token):
+            raise InvalidToken(_("Token has been revoked"))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        has_claims = all(field in validated_token for field in CLAIM_FIELDS)
+        if has_claims and not user_cache.changed_since(user_id, validated_token.get("iat", 0)):
+            user = user_from_claims(user_id, validated_token)
+        else:
+            user = user_cache.get(user_id)
+            if user is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+# -----------------------------
+# Token serializers (SIMPLE_JWT settings)
+# -----------------------------
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads the user so a refreshed access token carries current claims."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if revocation.is_revoked(refresh):
+            raise InvalidToken(_("Token has been revoked"))
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        access = refresh.access_token
+        access.set_iat()
+        data = {"access": str(add_claims(access, user))}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revocation.revoke(refresh)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(add_claims(refresh, user))
+        return data
+
+
+class RevocationAwareTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if revocation.is_revoked(UntypedToken(attrs["token"])):
+            raise InvalidToken(_("Token has been revoked"))
+        return data
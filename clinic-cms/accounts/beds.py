@@ -0,0 +1,232 @@
+"""
+Ward bed board.
+
+Each process keeps an occupancy index per ward: the ward's beds in
+bed-number order, an int used as a bitmap (bit i set = bed i occupied) and
+the occupant of each bed. The board, free counts and the first free bed of
+a ward are answered from it without a query.
+
+The index is loaded from ``BedStatus`` on first use. Saves and deletes in
+this process update it once their transaction commits (receivers in
+signals.py): an occupancy change flips one bit, anything else (a new bed,
+a bed renumbered or moved to another ward) reloads it. Changes made by
+other processes are picked up by ``sync()``, which at most every
+``SYNC_INTERVAL`` seconds compares the table's row count and newest
+``updated_at`` with what was loaded.
+
+``assign()`` and ``release()`` lock the bed row and re-check it, so two
+nurses cannot put patients in the same bed; the index only suggests which
+bed to try.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import BedStatus, PendingAdmission, PlannedDischarge
+
+SYNC_INTERVAL = 5.0         # seconds between staleness checks per process
+PROJECTION_HOURS = 24
+
+
+class BedConflict(Exception):
+    """The bed is taken, the patient already has one, or the ward is full."""
+
+
+# -----------------------------
+# Occupancy index
+# -----------------------------
+class Ward:
+    __slots__ = ("name", "ids", "numbers", "patients", "occupied", "position")
+
+    def __init__(self, name):
+        self.name = name
+        self.ids = []
+        self.numbers = []
+        self.patients = []
+        self.occupied = 0
+        self.position = {}
+
+    def add(self, bed_id, number, patient_id, occupied):
+        i = len(self.ids)
+        self.ids.append(bed_id)
+        self.numbers.append(number)
+        self.patients.append(patient_id if occupied else None)
+        self.position[bed_id] = i
+        if occupied:
+            self.occupied |= 1 << i
+
+    def set(self, bed_id, occupied, patient_id):
+        i = self.position[bed_id]
+        if occupied:
+            self.occupied |= 1 << i
+        else:
+            self.occupied &= ~(1 << i)
+        self.patients[i] = patient_id if occupied else None
+
+    @property
+    def free(self):
+        return len(self.ids) - self.occupied.bit_count()
+
+    def free_beds(self):
+        """Ids of the free beds, in bed-number order."""
+        vacant = ~self.occupied & ((1 << len(self.ids)) - 1)
+        while vacant:
+            low = vacant & -vacant
+            yield self.ids[low.bit_length() - 1]
+            vacant ^= low
+
+    def as_dict(self):
+        return {
+            "beds": self.numbers,
+            "ids": self.ids,
+            # one character per bed, in the same order: "1" occupied
+            "occupancy": format(self.occupied, f"0{len(self.ids)}b")[::-1] if self.ids else "",
+            "patients": self.patients,
+            "free": self.free,
+        }
+
+
+class BedBoard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wards = None
+        self.bed_ward = {}
+        self.stamp = None
+        self.next_sync = 0.0
+
+    def _stamp(self):
+        stamp = BedStatus.objects.aggregate(n=Count("id"), latest=Max("updated_at"))
+        return stamp["n"], stamp["latest"]
+
+    def load(self):
+        stamp = self._stamp()
+        wards, bed_ward = {}, {}
+        rows = BedStatus.objects.order_by("ward", "bed_number", "id").values_list(
+            "id", "ward", "bed_number", "patient_id", "occupied"
+        )
+        for bed_id, ward, number, patient_id, occupied in rows.iterator():
+            if ward not in wards:
+                wards[ward] = Ward(ward)
+            wards[ward].add(bed_id, number, patient_id, occupied)
+            bed_ward[bed_id] = ward
+        with self._lock:
+            self.wards, self.bed_ward, self.stamp = wards, bed_ward, stamp
+            self.next_sync = time.monotonic() + SYNC_INTERVAL
+
+    def sync(self):
+        """Load on first use, and reload when another process has changed beds."""
+        if self.wards is None:
+            self.load()
+        elif time.monotonic() >= self.next_sync:
+            self.next_sync = time.monotonic() + SYNC_INTERVAL
+            if self._stamp() != self.stamp:
+                self.load()
+        return self.wards
+
+    def changed(self, bed_id, ward, number, occupied, patient_id):
+        with self._lock:
+            if self.wards is None:
+                return
+            current = self.wards.get(self.bed_ward.get(bed_id))
+            if current is None or current.name != ward or current.numbers[current.position[bed_id]] != number:
+                self.wards = None  # new or moved bed: reload on next read
+                return
+            current.set(bed_id, occupied, patient_id)
+
+    def removed(self, bed_id):
+        with self._lock:
+            self.wards = None
+
+    def occupancy(self):
+        """{ward: (free beds, [occupants' patient ids])}."""
+        wards = self.sync()
+        with self._lock:
+            return {name: (ward.free, [p for p in ward.patients if p is not None]) for name, ward in wards.items()}
+
+    def snapshot(self):
+        wards = self.sync()
+        with self._lock:
+            return {name: ward.as_dict() for name, ward in wards.items()}
+
+
+board = BedBoard()
+
+
+# -----------------------------
+# Operations
+# -----------------------------
+def assign(bed_id, patient_id):
+    """Put ``patient_id`` in bed ``bed_id``. Raises BedStatus.DoesNotExist or BedConflict."""
+    with transaction.atomic():
+        bed = BedStatus.objects.select_for_update().get(pk=bed_id)
+        if bed.occupied:
+            raise BedConflict(f"Bed {bed.bed_number} is occupied")
+        current = (
+            BedStatus.objects.filter(patient_id=patient_id, occupied=True)
+            .values_list("ward", "bed_number").first()
+        )
+        if current is not None:
+            raise BedConflict(f"Patient is already in bed {current[1]} ({current[0] or 'no ward'})")
+        bed.occupied = True
+        bed.patient_id = patient_id
+        bed.save(update_fields=["occupied", "patient", "updated_at"])
+    return bed
+
+
+def release(bed_id):
+    """Free bed ``bed_id`` (a no-op if it is already free). Raises BedStatus.DoesNotExist."""
+    with transaction.atomic():
+        bed = BedStatus.objects.select_for_update().get(pk=bed_id)
+        if bed.occupied or bed.patient_id:
+            bed.occupied = False
+            bed.patient_id = None
+            bed.save(update_fields=["occupied", "patient", "updated_at"])
+    return bed
+
+
+def allocate(ward, patient_id):
+    """Assign the first free bed of ``ward``, trying the next one if another nurse got there first."""
+    candidates = board.sync().get(ward)
+    for bed_id in list(candidates.free_beds()) if candidates else []:
+        try:
+            return assign(bed_id, patient_id)
+        except BedStatus.DoesNotExist:
+            continue
+        except BedConflict:
+            if BedStatus.objects.filter(patient_id=patient_id, occupied=True).exists():
+                raise
+    raise BedConflict(f"No free bed in ward {ward or '(none)'}")
+
+
+def projection(hours=PROJECTION_HOURS, now=None):
+    """
+    Per ward: beds free now, planned discharges of current occupants due
+    within ``hours`` (overdue ones included), unprocessed admissions
+    expected on the ward, and the free count once both have happened.
+    """
+    now = now or timezone.now()
+    occupancy = board.occupancy()
+    ward_of = {patient_id: name for name, (_, patients) in occupancy.items() for patient_id in patients}
+    result = {name: {"free": free, "discharges": [], "pending_admissions": 0} for name, (free, _) in occupancy.items()}
+
+    discharges = PlannedDischarge.objects.filter(
+        completed=False, target_time__lte=now + timedelta(hours=hours), patient_id__in=list(ward_of),
+    ).order_by("target_time").values_list("patient_id", "target_time")
+    for patient_id, target_time in discharges:
+        result[ward_of[patient_id]]["discharges"].append(target_time)
+
+    unassigned = 0
+    pending = PendingAdmission.objects.filter(processed=False).values_list("ward").annotate(n=Count("id"))
+    for ward, n in pending:
+        if ward in result:
+            result[ward]["pending_admissions"] = n
+        else:
+            unassigned += n
+
+    for ward in result.values():
+        ward["projected_free"] = ward["free"] + len(ward["discharges"]) - ward["pending_admissions"]
+    return {"hours": hours, "wards": result, "unassigned_admissions": unassigned}
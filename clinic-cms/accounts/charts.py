@@ -0,0 +1,193 @@
+"""
+Patient chart snapshots.
+
+Opening a chart needs the patient's name and age, latest vitals, active
+prescriptions, recent lab results and outstanding invoices. Instead of
+reading five tables on every open, ``PatientChart`` keeps one JSON
+document per patient, and the chart endpoint reads that one row by
+primary key.
+
+The snapshot is write-through. Receivers in signals.py call
+``mark_stale()`` when a row it is built from is saved or deleted. Code
+that changes those rows with ``QuerySet.update()`` calls ``rows_changed()``.
+The rebuild runs when the transaction commits, once per patient however
+many rows changed. Each rebuild bumps ``version``, which the endpoint
+serves as the ETag, so an unchanged chart costs a 304 answered from the
+same read.
+
+The document holds everyone's view of the chart. ``view()`` drops the
+items the requesting user may not see under the row-level policies, and
+works out the age, which changes without any write.
+"""
+import logging
+import threading
+from datetime import date
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.dateparse import parse_date
+
+from . import metrics, policies
+from .models import LabResult, LatestVitals, Patient, PatientChart, Prescription
+
+logger = logging.getLogger(__name__)
+
+RECENT_LABS = 5
+MAX_ITEMS = 50             # per list, so one patient cannot bloat the document
+
+PATIENT_FIELDS = (
+    "id", "user_id", "date_of_birth", "gender", "phone", "ward", "status", "reason", "assigned_doctor_id",
+)
+VITALS_FIELDS = ("observed_at", "temperature", "systolic", "diastolic", "heart_rate", "respiratory_rate")
+
+# section -> model label whose policy decides which items a user sees
+SECTION_MODELS = {
+    "active_prescriptions": "accounts.Prescription",
+    "recent_labs": "accounts.LabResult",
+    "outstanding_invoices": "billing.Invoice",
+}
+
+
+# -----------------------------
+# Build
+# -----------------------------
+def build(patient_id):
+    """The chart document for ``patient_id``, or None if there is no such patient."""
+    Invoice = apps.get_model("billing", "Invoice")
+    patient = Patient.objects.filter(pk=patient_id).values(
+        *PATIENT_FIELDS, "user__first_name", "user__last_name", "user__username",
+    ).first()
+    if patient is None:
+        return None
+    first_name, last_name = patient.pop("user__first_name"), patient.pop("user__last_name")
+    username = patient.pop("user__username")
+    patient["full_name"] = f"{first_name} {last_name}".strip() or username
+
+    prescriptions = Prescription.objects.filter(
+        patient_id=patient_id, status__in=[Prescription.PENDING, Prescription.CLAIMED]
+    ).order_by(
+        "-created_at", "-id"
+    ).values("id", "medication_name", "dosage", "duration", "prescribed_by_id", "created_at")[:MAX_ITEMS]
+    labs = LabResult.objects.filter(patient_id=patient_id).order_by("-created_at", "-id").values(
+        "id", "test_name", "result", "created_by_id", "created_at"
+    )[:RECENT_LABS]
+    invoices = Invoice.objects.filter(patient_id=patient_id, status="unpaid").order_by("-created_at", "-id").values(
+        "id", "amount", "description", "doctor_id", "created_at"
+    )[:MAX_ITEMS]
+
+    return {
+        "patient": patient,
+        "vitals": LatestVitals.objects.filter(patient_id=patient_id).values(*VITALS_FIELDS).first(),
+        "active_prescriptions": list(prescriptions),
+        "recent_labs": list(labs),
+        "outstanding_invoices": list(invoices),
+    }
+
+
+def refresh(patient_id):
+    """
+    Rebuild and store the snapshot; returns the new PatientChart (None if
+    the patient is gone).
+
+    The snapshot row is locked before the sources are read, so concurrent
+    rebuilds of one chart run one after the other and the last to write
+    has read everything committed before it.
+    """
+    chart = PatientChart.objects.filter(pk=patient_id)
+    with transaction.atomic():
+        if not chart.select_for_update().exists():
+            try:
+                with transaction.atomic():
+                    # Version 0 never commits: it is bumped or deleted below.
+                    PatientChart.objects.create(patient_id=patient_id, data={}, version=0)
+            except IntegrityError:
+                pass  # created concurrently; the lock below waits for it
+            chart.select_for_update().exists()
+        data = build(patient_id)
+        if data is None:
+            chart.delete()
+            return None
+        chart.update(data=data, version=F("version") + 1)
+    return chart.only("version", "data").first()
+
+
+# -----------------------------
+# Write-through
+# -----------------------------
+_pending = threading.local()
+
+
+def mark_stale(*patient_ids):
+    """Rebuild these patients' charts once the current transaction commits (now, outside one)."""
+    ids = getattr(_pending, "ids", None)
+    if ids is None:
+        ids = _pending.ids = set()
+    ids.update(pid for pid in patient_ids if pid is not None)
+    transaction.on_commit(_flush)
+
+
+def rows_changed(queryset):
+    """For bulk ``update()`` callers, which send no signals: mark the affected patients stale."""
+    mark_stale(*queryset.order_by().values_list("patient_id", flat=True).distinct())
+
+
+def _flush():
+    # Every registration of this callback shares one set, so the first one
+    # to run after a commit does the work. Ids left behind by a rolled-back
+    # transaction are rebuilt at the next commit, which is harmless.
+    ids, _pending.ids = getattr(_pending, "ids", set()), set()
+    for patient_id in sorted(ids):
+        try:
+            refresh(patient_id)
+        except Exception:
+            # The write itself has committed; the chart catches up on the next change.
+            logger.exception("Chart refresh failed for patient %s", patient_id)
+
+
+# -----------------------------
+# Read
+# -----------------------------
+def get(patient_id):
+    """``(version, data)`` in one primary-key read, built on first use; None if no such patient."""
+    row = PatientChart.objects.filter(pk=patient_id).values_list("version", "data").first()
+    metrics.cache_lookup("charts", row is not None)
+    if row is None:
+        chart = refresh(patient_id)
+        if chart is None:
+            return None
+        row = (chart.version, chart.data)
+    return row
+
+
+def _age(date_of_birth, today):
+    born = parse_date(date_of_birth) if isinstance(date_of_birth, str) else date_of_birth
+    if born is None:
+        return None
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def _visible_to(rule, user, patient, item):
+    if rule in (policies.ALL, policies.NONE):
+        return rule == policies.ALL
+    for lookup in rule:
+        source, key = (patient, lookup[len("patient__"):]) if lookup.startswith("patient__") else (item, lookup)
+        if key in source and source[key] == user.pk:
+            return True
+    return False
+
+
+def view(data, user, today=None):
+    """The document as ``user`` may see it, with the patient's current age."""
+    patient = dict(data["patient"], age=_age(data["patient"]["date_of_birth"], today or date.today()))
+    result = {"patient": patient, "vitals": data["vitals"]}
+    role = getattr(user, "role", None)
+    for section, label in SECTION_MODELS.items():
+        rule = policies.compile_rule(apps.get_model(label), role)
+        if rule != policies.NONE:
+            result[section] = [item for item in data[section] if _visible_to(rule, user, data["patient"], item)]
+    if "outstanding_invoices" in result:
+        amounts = (Decimal(item["amount"]) for item in result["outstanding_invoices"])
+        result["outstanding_total"] = str(sum(amounts, Decimal(0)))
+    return result
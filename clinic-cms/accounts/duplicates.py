@@ -0,0 +1,245 @@
+"""
+Duplicate patient detection.
+
+Each patient gets a handful of blocking keys (phonetic name + date of birth,
+normalized phone, normalized next-of-kin phone) stored in
+``PatientBlockingKey``. A registration only has to be compared against the
+patients sharing at least one key, which is a single indexed lookup; those
+candidates are then scored field by field.
+"""
+import re
+from datetime import date
+
+from django.db.models import Count
+
+from .models import Patient, PatientBlockingKey
+
+PROBABLE = 0.9
+POSSIBLE = 0.75
+
+# Patient.date_of_birth defaults to 2000-01-01 when it was never captured, so
+# that value carries no information.
+PLACEHOLDER_DOB = date(2000, 1, 1)
+
+WEIGHTS = {"name": 0.5, "dob": 0.2, "phone": 0.2, "kin_phone": 0.1}
+
+NON_DIGIT_RE = re.compile(r"\D")
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+# -----------------------------
+# Normalization
+# -----------------------------
+def soundex(name):
+    letters = [c for c in name.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+        if c not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def normalize_phone(phone):
+    """Last nine digits, so 0712..., 254712... and +254 712... compare equal."""
+    digits = NON_DIGIT_RE.sub("", phone or "")
+    return digits[-9:] if len(digits) >= 7 else ""
+
+
+def features(first_name, last_name, date_of_birth, phone, next_of_kin_phone):
+    """Plain, picklable tuple used for both indexing and scoring."""
+    dob = date_of_birth if date_of_birth and date_of_birth != PLACEHOLDER_DOB else None
+    return (
+        (first_name or "").strip().lower(),
+        (last_name or "").strip().lower(),
+        dob.isoformat() if dob else "",
+        normalize_phone(phone),
+        normalize_phone(next_of_kin_phone),
+    )
+
+
+def patient_features(patient):
+    user = patient.user
+    return features(user.first_name, user.last_name, patient.date_of_birth, patient.phone, patient.next_of_kin_phone)
+
+
+def blocking_keys(feats):
+    first, last, dob, phone, kin_phone = feats
+    keys = set()
+    if first and last:
+        names = sorted([soundex(first), soundex(last)])  # tolerate swapped first/last
+        keys.add(f"name:{names[0]}{names[1]}:{dob or '-'}")
+    if phone:
+        keys.add(f"phone:{phone}")
+    if kin_phone:
+        keys.add(f"kin:{kin_phone}")
+    return keys
+
+
+# -----------------------------
+# Scoring
+# -----------------------------
+def jaro_winkler(a, b):
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    a_matched = [False] * len(a)
+    b_matched = [False] * len(b)
+    matches = 0
+    for i, c in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == c:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    a_seq = [c for c, m in zip(a, a_matched) if m]
+    b_seq = [c for c, m in zip(b, b_matched) if m]
+    transpositions = sum(x != y for x, y in zip(a_seq, b_seq)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def score(a, b):
+    """
+    Weighted agreement in [0, 1] over the fields both sides have, capped at
+    POSSIBLE unless the date of birth or a phone number agrees.
+    """
+    a_first, a_last, a_dob, a_phone, a_kin = a
+    b_first, b_last, b_dob, b_phone, b_kin = b
+    parts = {
+        "name": max(
+            (jaro_winkler(a_first, b_first) + jaro_winkler(a_last, b_last)) / 2,
+            (jaro_winkler(a_first, b_last) + jaro_winkler(a_last, b_first)) / 2,
+        ),
+    }
+    if a_dob and b_dob:
+        parts["dob"] = 1.0 if a_dob == b_dob else 0.0
+    if a_phone and b_phone:
+        parts["phone"] = 1.0 if a_phone == b_phone else 0.0
+    if a_kin and b_kin:
+        parts["kin_phone"] = 1.0 if a_kin == b_kin else 0.0
+    total_weight = sum(WEIGHTS[field] for field in parts)
+    value = sum(WEIGHTS[field] * value for field, value in parts.items()) / total_weight
+    if not any(agree == 1.0 for field, agree in parts.items() if field != "name"):
+        # Names alone (common ones especially) never make a probable match.
+        value = min(value, POSSIBLE)
+    return value
+
+
+# -----------------------------
+# Index maintenance
+# -----------------------------
+def index_patient(patient):
+    keys = blocking_keys(patient_features(patient))
+    PatientBlockingKey.objects.filter(patient=patient).delete()
+    PatientBlockingKey.objects.bulk_create(PatientBlockingKey(patient=patient, key=key) for key in keys)
+
+
+def rebuild(batch_size=1000):
+    """Recompute every patient's blocking keys. Returns the patient count."""
+    PatientBlockingKey.objects.all().delete()
+    pending = []
+    count = 0
+    for patient in Patient.objects.select_related("user").iterator(chunk_size=batch_size):
+        pending.extend(PatientBlockingKey(patient_id=patient.pk, key=key) for key in blocking_keys(patient_features(patient)))
+        count += 1
+        if len(pending) >= batch_size:
+            PatientBlockingKey.objects.bulk_create(pending)
+            pending = []
+    PatientBlockingKey.objects.bulk_create(pending)
+    return count
+
+
+# -----------------------------
+# Registration-time check
+# -----------------------------
+def find_candidates(first_name, last_name, date_of_birth, phone, next_of_kin_phone,
+                    threshold=POSSIBLE, exclude_id=None):
+    """Existing patients scoring >= ``threshold`` against the given details, best first."""
+    feats = features(first_name, last_name, date_of_birth, phone, next_of_kin_phone)
+    keys = blocking_keys(feats)
+    if not keys:
+        return []
+    candidates = Patient.objects.filter(blocking_keys__key__in=keys).select_related("user").distinct()
+    if exclude_id is not None:
+        candidates = candidates.exclude(pk=exclude_id)
+    matches = []
+    for patient in candidates:
+        value = score(feats, patient_features(patient))
+        if value >= threshold:
+            matches.append({
+                "id": patient.pk,
+                "full_name": f"{patient.user.first_name} {patient.user.last_name}".strip(),
+                "date_of_birth": patient.date_of_birth,
+                "phone": patient.phone,
+                "score": round(value, 3),
+                "probable": value >= PROBABLE,
+            })
+    matches.sort(key=lambda m: -m["score"])
+    return matches
+
+
+# -----------------------------
+# Batch scan
+# -----------------------------
+def scan_blocks(blocks, threshold):
+    """
+    Score every pair inside each block. ``blocks`` is a list of lists of
+    ``(patient_id, features)``; runs in worker processes, so no ORM access.
+    """
+    pairs = {}
+    for members in blocks:
+        for i, (a_id, a_feats) in enumerate(members):
+            for b_id, b_feats in members[i + 1:]:
+                pair = (min(a_id, b_id), max(a_id, b_id))
+                if pair in pairs:
+                    continue
+                value = score(a_feats, b_feats)
+                if value >= threshold:
+                    pairs[pair] = value
+    return pairs
+
+
+def iter_block_chunks(chunk_size=500, max_block_size=200):
+    """
+    Yield chunks of blocks (shared keys with more than one patient) as plain
+    data. Oversized blocks, e.g. a clinic phone entered for many patients,
+    are skipped because they say nothing about identity.
+    """
+    shared = (
+        PatientBlockingKey.objects.values("key")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1, n__lte=max_block_size)
+        .values_list("key", flat=True)
+        .order_by("key")
+    )
+    keys = list(shared)
+    for start in range(0, len(keys), chunk_size):
+        chunk_keys = keys[start:start + chunk_size]
+        members = {}
+        patient_ids = set()
+        for key, patient_id in PatientBlockingKey.objects.filter(key__in=chunk_keys).values_list("key", "patient_id"):
+            members.setdefault(key, []).append(patient_id)
+            patient_ids.add(patient_id)
+        feats = {
+            p.pk: patient_features(p)
+            for p in Patient.objects.filter(pk__in=patient_ids).select_related("user")
+        }
+        yield [[(pid, feats[pid]) for pid in ids if pid in feats] for ids in members.values()]
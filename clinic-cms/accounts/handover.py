@@ -0,0 +1,162 @@
+"""
+Shift handover digest.
+
+At shift change a nurse needs what happened during the shift and what is
+still open, not the whole history. The digest for a shift window holds:
+
+- handover notes written during the shift,
+- admissions and discharges during the shift (``PatientTransition``),
+- tasks not yet completed,
+- alerts not yet acknowledged (on the ward, if one is given),
+- medications due by the end of the shift, from ``rounds.due()``.
+
+Each section is one range scan on an index over ``created_at`` (or the
+open flag and ``created_at``), capped at ``MAX_ITEMS``.
+
+The first four sections are cached in-process per (shift, ward). Saving or
+deleting a note, task, alert or transition in this process, and the bulk
+paths that write them without signals, call ``changed()``, after which
+each digest is rebuilt on its next read. Writes made by other processes are
+picked up within ``MAX_AGE`` seconds. Medications are read on every request
+because the due window moves with the clock.
+"""
+import threading
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from . import metrics, rounds
+from .models import Alert, HandoverLog, PatientTransition, Task
+
+SHIFT_STARTS = (time(7), time(19))  # local time; shifts run from one start to the next
+MAX_AGE = 60.0              # seconds a cached digest may lag other processes' writes
+MAX_ITEMS = 100             # per section
+MAX_CACHED = 64             # digests kept, oldest dropped first
+
+
+def shift(at=None):
+    """``(start, end)`` of the shift containing ``at`` (now), as aware datetimes."""
+    at = timezone.localtime(at)
+    day = at.date()
+    starts = [
+        timezone.make_aware(datetime.combine(day + timedelta(days=offset), start))
+        for offset in (-1, 0, 1) for start in SHIFT_STARTS
+    ]
+    for start, end in zip(starts, starts[1:]):
+        if start <= at < end:
+            return start, end
+    raise AssertionError("unreachable: shifts cover the day")
+
+
+# -----------------------------
+# Build
+# -----------------------------
+def _name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def build(start, end, ward=None):
+    notes = HandoverLog.objects.filter(created_at__gte=start, created_at__lt=end).order_by("created_at", "id")
+    movements = PatientTransition.objects.filter(
+        created_at__gte=start, created_at__lt=end, action__in=["admit", "discharge"],
+    ).order_by("created_at", "id")
+    tasks = Task.objects.filter(completed=False, created_at__lt=end).order_by("created_at", "id")
+    alerts = Alert.objects.filter(acknowledged=False, created_at__lt=end).order_by("-created_at", "-id")
+    if ward:
+        movements = movements.filter(ward=ward)
+        alerts = alerts.filter(patient__ward=ward)
+
+    return {
+        "notes": [
+            {"id": pk, "note": note, "nurse": _name(*names), "created_at": at}
+            for pk, note, at, *names in notes.values_list(
+                "id", "note", "created_at", "nurse__first_name", "nurse__last_name", "nurse__username",
+            )[:MAX_ITEMS]
+        ],
+        "admissions_discharges": [
+            {"patient": patient_id, "patient_name": _name(*names), "action": action, "ward": movement_ward,
+             "bed": bed_id, "at": at}
+            for patient_id, action, movement_ward, bed_id, at, *names in movements.values_list(
+                "patient_id", "action", "ward", "bed_id", "created_at",
+                "patient__user__first_name", "patient__user__last_name", "patient__user__username",
+            )[:MAX_ITEMS]
+        ],
+        "open_tasks": [
+            {"id": pk, "description": description, "nurse": _name(*names), "created_at": at}
+            for pk, description, at, *names in tasks.values_list(
+                "id", "description", "created_at", "nurse__first_name", "nurse__last_name", "nurse__username",
+            )[:MAX_ITEMS]
+        ],
+        "unacknowledged_alerts": [
+            {"id": pk, "patient": patient_id, "patient_name": _name(*names), "message": message, "created_at": at}
+            for pk, patient_id, message, at, *names in alerts.values_list(
+                "id", "patient_id", "message", "created_at",
+                "patient__user__first_name", "patient__user__last_name", "patient__user__username",
+            )[:MAX_ITEMS]
+        ],
+    }
+
+
+# -----------------------------
+# Cache
+# -----------------------------
+class DigestCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.entries = {}
+
+    def changed(self):
+        with self._lock:
+            self.generation += 1
+
+    def get(self, key):
+        now = clock.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == self.generation and entry[1] > now:
+                return entry[2]
+            return None
+
+    def put(self, key, generation, data):
+        with self._lock:
+            if generation != self.generation:
+                return  # something changed while we were building; don't keep it
+            self.entries.pop(key, None)
+            while len(self.entries) >= MAX_CACHED:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (generation, clock.monotonic() + MAX_AGE, data)
+
+
+cache = DigestCache()
+
+
+def changed():
+    """A note, task, alert or admission/discharge was written: rebuild digests on next read."""
+    cache.changed()
+
+
+# -----------------------------
+# Read
+# -----------------------------
+def digest(at=None, ward=None, now=None):
+    """The handover digest for the shift containing ``at`` (now), optionally for one ward."""
+    now = now or timezone.now()
+    start, end = shift(at or now)
+    key = (start, ward or "")
+    data = cache.get(key)
+    metrics.cache_lookup("handover", data is not None)
+    if data is None:
+        generation = cache.generation
+        data = build(start, end, ward)
+        cache.put(key, generation, data)
+
+    # Missed doses stay listed as on a round; upcoming ones up to the end of the shift.
+    lookahead = (end - now).total_seconds() / 3600
+    return {
+        "shift": {"start": start, "end": end},
+        "ward": ward or None,
+        **data,
+        "due_medications": rounds.due(ward, now, rounds.LOOKBACK_HOURS, lookahead) if start <= now < end else [],
+    }
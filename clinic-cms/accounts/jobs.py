@@ -0,0 +1,229 @@
+"""
+Database-backed background jobs.
+
+Work is enqueued as a ``Job`` row and picked up by ``manage.py run_workers``.
+Because the queue is an ordinary table, ``enqueue()`` inside a request's
+transaction only becomes visible to workers if that transaction commits.
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent
+workers never block on, or double-claim, the same rows. Backends without
+row locks (SQLite in development) fall back to a compare-and-set UPDATE on
+``status``, which gives the same exactly-one-claimer guarantee.
+
+While a job runs, its worker refreshes ``locked_at`` every
+``HEARTBEAT_INTERVAL`` seconds. A running job whose heartbeat is older than
+``STALE_AFTER`` has lost its worker and is released by ``requeue_stale()``,
+however long the task itself takes.
+
+Task functions are registered with ``@task`` and receive the job payload
+as keyword arguments, so payloads must be JSON-serializable.
+"""
+import logging
+import random
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "default"
+BACKOFF_BASE = 10        # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 3600
+HEARTBEAT_INTERVAL = 60  # seconds between locked_at refreshes of a running job
+STALE_AFTER = timedelta(minutes=10)
+RETENTION = timedelta(days=7)
+
+registry = {}
+
+
+class UnknownTask(Exception):
+    """No task is registered under the given name."""
+
+
+# -----------------------------
+# Registration / enqueue
+# -----------------------------
+def task(name, queue=DEFAULT_QUEUE, max_attempts=3):
+    """
+    Register a function as a task. The function gains ``.delay(**payload)``
+    which enqueues it with these defaults.
+    """
+    def decorator(func):
+        registry[name] = func
+        func.task_name = name
+        func.delay = lambda run_after=None, priority=0, **payload: enqueue(
+            name, payload, queue=queue, run_after=run_after, priority=priority, max_attempts=max_attempts,
+        )
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, queue=DEFAULT_QUEUE, run_after=None, priority=0, max_attempts=3):
+    if name not in registry:
+        raise UnknownTask(name)
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        queue=queue,
+        run_after=run_after or timezone.now(),
+        priority=priority,
+        max_attempts=max_attempts,
+    )
+
+
+# -----------------------------
+# Claiming
+# -----------------------------
+def claim(worker_id, queues=(DEFAULT_QUEUE,), batch=1):
+    """Lock up to ``batch`` ready jobs for ``worker_id`` and mark them running."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, queue__in=queues, run_after__lte=now)
+            .order_by("-priority", "run_after", "id")
+            .values_list("id", flat=True)[:batch]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=worker_id, locked_at=now))
+
+
+def backoff(attempts):
+    """Exponential backoff with +/-10% jitter so retries don't stampede."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+# -----------------------------
+# Execution
+# -----------------------------
+@contextmanager
+def _heartbeat(job, interval=HEARTBEAT_INTERVAL):
+    """Keep ``job``'s lock fresh from a side thread while the body runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    # Guarded like _finish(): a lock that was taken over is not ours to refresh.
+                    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+                        locked_at=timezone.now(),
+                    )
+                except Exception:
+                    logger.exception("Heartbeat failed for job %s", job.pk)
+                    connection.close()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job):
+    """Execute a claimed job and record the outcome. Returns True on success."""
+    func = registry.get(job.name)
+    started = time.perf_counter()
+    try:
+        if func is None:
+            raise UnknownTask(job.name)
+        with _heartbeat(job):
+            func(**job.payload)
+    except Exception:
+        _finish(job, time.perf_counter() - started, error=traceback.format_exc(limit=20))
+        return False
+    _finish(job, time.perf_counter() - started)
+    return True
+
+
+def _finish(job, seconds, error=None):
+    now = timezone.now()
+    fields = {"duration_ms": int(seconds * 1000), "locked_by": "", "locked_at": None}
+    if error is None:
+        fields.update(status=Job.SUCCEEDED, finished_at=now, last_error="")
+    elif job.attempts < job.max_attempts:
+        fields.update(status=Job.QUEUED, run_after=now + backoff(job.attempts), last_error=error)
+    else:
+        fields.update(status=Job.FAILED, finished_at=now, last_error=error)
+    # Guarded on the lock so a job requeued as stale and claimed again
+    # elsewhere is not overwritten by this (late) worker.
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(**fields)
+
+
+# -----------------------------
+# Maintenance
+# -----------------------------
+def requeue_stale(older_than=STALE_AFTER):
+    """
+    Release jobs whose worker died mid-run, i.e. whose heartbeat stopped
+    more than ``older_than`` ago. The interrupted attempt still counts, so
+    a job that keeps killing its worker eventually fails.
+    """
+    cutoff = timezone.now() - older_than
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, finished_at=timezone.now(), locked_by="", locked_at=None,
+        last_error="Worker lost while running job",
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by="", locked_at=None, run_after=timezone.now())
+    return requeued + failed
+
+
+def purge(older_than=RETENTION):
+    """Delete succeeded jobs finished more than ``older_than`` ago."""
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status=Job.SUCCEEDED, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+def stats(since=None):
+    """Queue depth plus per-task outcome counts and timings, from the table itself."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    oldest = ready.order_by("run_after").values_list("run_after", flat=True).first()
+    finished = Job.objects.exclude(duration_ms=None)
+    if since is not None:
+        finished = finished.filter(Q(finished_at__gte=since) | Q(finished_at=None))
+    tasks = (
+        finished.values("name")
+        .annotate(
+            runs=Count("id"),
+            succeeded=Count("id", filter=Q(status=Job.SUCCEEDED)),
+            failed=Count("id", filter=Q(status=Job.FAILED)),
+            retrying=Count("id", filter=Q(status=Job.QUEUED)),
+            avg_ms=Avg("duration_ms"),
+            min_ms=Min("duration_ms"),
+            max_ms=Max("duration_ms"),
+        )
+        .order_by("name")
+    )
+    return {
+        "queued": ready.count(),
+        "scheduled": Job.objects.filter(status=Job.QUEUED, run_after__gt=now).count(),
+        "running": Job.objects.filter(status=Job.RUNNING).count(),
+        "oldest_wait_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        "tasks": [
+            {**row, "avg_ms": round(float(row["avg_ms"]), 1) if row["avg_ms"] is not None else None}
+            for row in tasks
+        ],
+    }
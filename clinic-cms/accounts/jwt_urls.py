@@ -5,8 +5,11 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
+from .views import LogoutView
+
 urlpatterns = [
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/logout/", LogoutView.as_view(), name="token_logout"),
 ]
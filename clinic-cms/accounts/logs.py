@@ -0,0 +1,180 @@
+"""
+Structured, sampled, non-blocking logging (wired up in ``settings.LOGGING``).
+
+* ``RequestContextMiddleware`` gives every request an id (a well-formed
+  incoming ``X-Request-ID`` or a fresh one, echoed back in the response)
+  and records its route name; ``ContextFilter`` stamps both onto every
+  record logged while the request is handled.
+* ``SamplingFilter`` keeps only a fraction of DEBUG/INFO records on the
+  routes listed in ``settings.LOG_SAMPLING``. Warnings and errors are
+  always kept.
+* ``BackgroundHandler`` puts records on a queue; a ``QueueListener`` thread
+  does the JSON formatting and the actual I/O, so a request never waits on
+  a stream or file. The message itself is rendered on the calling thread
+  when the record is queued. Call sites pass %-style arguments instead of
+  building f-strings, so records the filters drop are never rendered.
+* ``JsonFormatter`` writes one JSON object per line.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Attributes every LogRecord has; anything else was passed in ``extra``.
+RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_context = contextvars.ContextVar("log_context", default=None)
+
+
+# -----------------------------
+# Request context
+# -----------------------------
+def bind(request_id):
+    """Start a logging context; returns a token for ``unbind``."""
+    return _context.set({"request_id": request_id, "route": None})
+
+
+def unbind(token):
+    _context.reset(token)
+
+
+def set_route(route):
+    context = _context.get()
+    if context is not None:
+        context["route"] = route
+
+
+def current():
+    return _context.get() or {}
+
+
+def request_id_from(header):
+    """The caller's request id if it is safe to log and echo, else a new one."""
+    if header and REQUEST_ID_RE.match(header):
+        return header
+    return uuid.uuid4().hex
+
+
+# -----------------------------
+# Filters
+# -----------------------------
+class ContextFilter(logging.Filter):
+    """Adds ``request_id`` and ``route`` (None outside a request)."""
+
+    def filter(self, record):
+        context = current()
+        record.request_id = context.get("request_id")
+        record.route = context.get("route")
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops DEBUG/INFO records at random according to
+    ``settings.LOG_SAMPLING`` ({route name: rate}, with a "default" entry
+    for everything else). Kept records carry ``sample_rate`` so counts can
+    be scaled back up.
+    """
+
+    def __init__(self, name=""):
+        super().__init__(name)
+        self._rates = None
+
+    def rates(self):
+        if self._rates is None:
+            self._rates = dict(getattr(settings, "LOG_SAMPLING", {}))
+        return self._rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rates = self.rates()
+        rate = rates.get(current().get("route"), rates.get("default", 1.0))
+        if rate < 1.0:
+            if random.random() >= rate:
+                return False
+            record.sample_rate = rate
+        return True
+
+
+# -----------------------------
+# Formatting and output
+# -----------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Queues records for a listener thread that writes them as JSON lines to
+    ``filename`` if given, otherwise to ``stream`` (stderr by default).
+    """
+
+    def __init__(self, stream=None, filename=None):
+        super().__init__(queue.SimpleQueue())
+        if filename:
+            self.target = logging.FileHandler(filename, encoding="utf-8")
+        else:
+            self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JsonFormatter())
+        self._start()
+        # Threads do not survive fork (run_workers), so children get their own.
+        os.register_at_fork(after_in_child=self._restart)
+        atexit.register(self.close)
+
+    def _start(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def _restart(self):
+        if self.listener is None:
+            return
+        self.queue = queue.SimpleQueue()
+        self._start()
+
+    def prepare(self, record):
+        # Runs on the calling thread. As the stdlib version does, render
+        # msg % args now, while the args still hold what they held at the
+        # call, and the traceback too (it pins stack frames). The JSON
+        # formatting is left to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,89 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+
+from accounts import passwords
+
+PASSWORD = "correct horse battery staple"
+
+
+def _available(name):
+    hasher = get_hasher(name)
+    if hasher.library:
+        try:
+            hasher._load_library()
+        except ValueError:
+            return None
+    return hasher
+
+
+def _latency(hasher, encoded, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hasher.verify(PASSWORD, encoded)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def _throughput(hasher, encoded, threads, seconds):
+    """Verifications per second with ``threads`` concurrent verifiers."""
+    deadline = time.perf_counter() + seconds
+
+    def verify_until_deadline():
+        n = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(PASSWORD, encoded)
+            n += 1
+        return n
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(lambda _: verify_until_deadline(), range(threads)))
+    return total / (time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = "Measure password verification cost (logins/sec per core) and suggest hasher parameters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=5, help="Single-thread verifications to time.")
+        parser.add_argument("--seconds", type=float, default=3.0, help="Duration of the concurrent run.")
+        parser.add_argument("--threads", type=int, default=0, help="Concurrent verifiers (default: pool size).")
+        parser.add_argument("--target-ms", type=float, default=0,
+                            help="Suggest cost parameters for this single-login latency.")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        threads = options["threads"] or passwords.pool().workers
+        self.stdout.write(f"{cores} core(s), {threads} concurrent verifier(s); default hasher: {settings.PASSWORD_HASHER}")
+
+        for name in ("pbkdf2_sha256", "argon2"):
+            hasher = _available(name)
+            if hasher is None:
+                self.stdout.write(f"{name}: library not installed, skipped")
+                continue
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            latency = _latency(hasher, encoded, options["rounds"])
+            rate = _throughput(hasher, encoded, threads, options["seconds"])
+            self.stdout.write(
+                f"{name}: {latency * 1000:.1f} ms per login, {rate:.1f} logins/s with {threads} thread(s), "
+                f"{rate / min(threads, cores):.1f} logins/s per core"
+            )
+
+            target = options["target_ms"] / 1000
+            if not target:
+                continue
+            scale = target / latency
+            if name == "pbkdf2_sha256":
+                iterations = max(100_000, int(hasher.iterations * scale / 10_000) * 10_000)
+                self.stdout.write(f"  suggest PASSWORD_PBKDF2_ITERATIONS={iterations}")
+            else:
+                time_cost = max(1, round(hasher.time_cost * scale))
+                self.stdout.write(f"  suggest PASSWORD_ARGON2_TIME_COST={time_cost} "
+                                  f"(memory_cost={hasher.memory_cost} KiB, parallelism={hasher.parallelism})")
@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from accounts import duplicates
+from accounts.models import Patient
+
+
+class Command(BaseCommand):
+    help = "Scan all patients for probable duplicates using the blocking-key index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes used for scoring (1 = inline).")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Blocking keys handed to a worker at a time.")
+        parser.add_argument("--threshold", type=float, default=duplicates.POSSIBLE,
+                            help="Minimum similarity score to report.")
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Recompute every patient's blocking keys first.")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            count = duplicates.rebuild()
+            self.stdout.write(f"Rebuilt blocking keys for {count} patient(s).")
+
+        threshold = options["threshold"]
+        chunks = duplicates.iter_block_chunks(chunk_size=options["chunk_size"])
+        pairs = {}
+        if options["workers"] > 1:
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                futures = [pool.submit(duplicates.scan_blocks, chunk, threshold) for chunk in chunks]
+                for future in futures:
+                    pairs.update(future.result())
+        else:
+            for chunk in chunks:
+                pairs.update(duplicates.scan_blocks(chunk, threshold))
+
+        if not pairs:
+            self.stdout.write(self.style.SUCCESS("No probable duplicates found."))
+            return
+
+        ids = {pid for pair in pairs for pid in pair}
+        names = {
+            p.pk: f"{p.user.first_name} {p.user.last_name}".strip() or p.user.username
+            for p in Patient.objects.filter(pk__in=ids).select_related("user")
+        }
+        for (a, b), value in sorted(pairs.items(), key=lambda item: -item[1]):
+            label = "PROBABLE" if value >= duplicates.PROBABLE else "possible"
+            self.stdout.write(f"{value:.3f}  {label:8}  #{a} {names.get(a, '?')}  <->  #{b} {names.get(b, '?')}")
+        self.stdout.write(self.style.SUCCESS(f"{len(pairs)} candidate pair(s)."))
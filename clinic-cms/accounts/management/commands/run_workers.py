@@ -0,0 +1,132 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django import db
+from django.core.management.base import BaseCommand
+
+from accounts import jobs, revocation
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = 60  # seconds between stale-lock/purge/revocation sweeps
+
+
+def _worker_thread(worker_id, queues, poll_interval, stop, drain):
+    try:
+        while not stop.is_set():
+            db.close_old_connections()
+            try:
+                claimed = jobs.claim(worker_id, queues)
+                for job in claimed:
+                    jobs.run(job)
+            except Exception:
+                # Database hiccup: drop the connection and back off; a job
+                # left running is released later by requeue_stale().
+                logger.exception("Job worker %s error", worker_id)
+                db.connection.close()
+                stop.wait(poll_interval)
+                continue
+            if not claimed:
+                if drain:
+                    return
+                stop.wait(poll_interval)
+    finally:
+        db.connection.close()
+
+
+def _maintenance_thread(stop):
+    while not stop.wait(MAINTENANCE_INTERVAL):
+        try:
+            jobs.requeue_stale()
+            jobs.purge()
+            revocation.compact()
+        except Exception:
+            # Keep sweeping: a dead thread would leave stale locks held for good.
+            logger.exception("Job maintenance sweep failed")
+        finally:
+            db.connection.close()
+
+
+def _worker_process(index, threads, queues, poll_interval, drain):
+    """
+    Entry point of one worker process: ``threads`` polling threads sharing a
+    stop flag. Process 0 also sweeps stale locks and old jobs.
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    pool = [
+        threading.Thread(
+            target=_worker_thread,
+            args=(f"{prefix}:{n}", queues, poll_interval, stop, drain),
+            name=f"job-worker-{index}-{n}",
+        )
+        for n in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    if index == 0 and not drain:
+        threading.Thread(target=_maintenance_thread, args=(stop,), daemon=True).start()
+    for thread in pool:
+        thread.join()
+    stop.set()
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (processes x threads) against the database job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Worker processes; use more for CPU-bound tasks.")
+        parser.add_argument("--threads", type=int, default=4,
+                            help="Polling threads per process; use more for I/O-bound tasks.")
+        parser.add_argument("--queues", default=jobs.DEFAULT_QUEUE,
+                            help="Comma-separated queue names to consume.")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds an idle thread waits before polling again.")
+        parser.add_argument("--drain", action="store_true",
+                            help="Exit once no ready jobs are left instead of polling forever.")
+
+    def handle(self, *args, **options):
+        queues = [q.strip() for q in options["queues"].split(",") if q.strip()]
+        processes, threads = max(options["processes"], 1), max(options["threads"], 1)
+        worker_args = (threads, queues, options["poll_interval"], options["drain"])
+
+        released = jobs.requeue_stale()
+        if released:
+            self.stdout.write(f"Released {released} stale job(s).")
+        self.stdout.write(
+            f"Starting {processes} process(es) x {threads} thread(s) on queue(s): {', '.join(queues)}"
+        )
+
+        if processes == 1:
+            _worker_process(0, *worker_args)
+            self.stdout.write(self.style.SUCCESS("Workers stopped."))
+            return
+
+        # Children must not inherit this process's open database connection.
+        # They are forked so they start with Django already set up.
+        db.connections.close_all()
+        context = multiprocessing.get_context("fork")
+        children = [
+            context.Process(target=_worker_process, args=(i, *worker_args), name=f"job-worker-{i}")
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def shutdown(*_):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()  # SIGTERM: finish the current job, then exit
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,38 @@
+import logging
+import time
+
+from django import db
+from django.core.management.base import BaseCommand
+
+from accounts import reminders
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send appointment reminders that have come due (run from cron, or with --every to loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=int, default=0,
+                            help="Keep running, scanning every N seconds (0 = run once).")
+
+    def handle(self, *args, **options):
+        if not options["every"]:
+            self._scan()
+            return
+        while True:
+            try:
+                self._scan()
+            except Exception:
+                # Keep looping: one failed scan (e.g. a dropped connection)
+                # must not stop reminders for good. Due ones go out next scan.
+                logger.exception("Appointment reminder scan failed")
+            finally:
+                db.connection.close()
+            time.sleep(options["every"])
+
+    def _scan(self):
+        started = time.monotonic()
+        sent = reminders.run()
+        summary = ", ".join(f"{window}: {count}" for window, count in sent.items())
+        self.stdout.write(f"Reminders sent ({summary}) in {time.monotonic() - started:.2f}s")
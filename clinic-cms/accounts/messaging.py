@@ -0,0 +1,310 @@
+"""
+Outbound email and SMS.
+
+Messages are written to the ``OutboundMessage`` outbox and sent by the
+``messaging.dispatch`` background job (``run_workers --queues messaging``),
+never from the request that produced them.
+
+* Coalescing: with ``coalesce=True`` a message joins the recipient's still
+  pending message on the same channel if one is open, so a burst of
+  notifications becomes one email/SMS sent when the window closes.
+* Batching: due messages are claimed in bulk (``SKIP LOCKED`` where
+  supported) and split into chunks; each chunk is sent over a single
+  transport connection, with at most ``CONCURRENCY[channel]`` connections
+  open at once.
+* Failures retry with backoff; after ``max_attempts`` a message is left as
+  a dead letter for an admin to inspect and retry.
+
+Transports are pluggable per channel via ``settings.MESSAGING_TRANSPORTS``.
+"""
+import json
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import jobs
+from .models import Job, OutboundMessage, User
+
+CHANNELS = (OutboundMessage.EMAIL, OutboundMessage.SMS)
+COALESCE_WINDOW = timedelta(minutes=2)
+STALE_AFTER = timedelta(minutes=10)
+CLAIM_SIZE = 1000
+BATCH_SIZE = {OutboundMessage.EMAIL: 50, OutboundMessage.SMS: 100}
+CONCURRENCY = {OutboundMessage.EMAIL: 4, OutboundMessage.SMS: 8}
+
+DEFAULT_TRANSPORTS = {
+    OutboundMessage.EMAIL: "accounts.messaging.EmailTransport",
+    OutboundMessage.SMS: "accounts.messaging.ConsoleTransport",
+}
+
+
+# -----------------------------
+# Transports
+# -----------------------------
+class Transport:
+    """
+    One connection's worth of sending. ``send()`` gets a chunk of messages
+    and returns {message id: error} for the ones that failed. Transports run
+    in worker threads and must not touch the ORM.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class ConsoleTransport(Transport):
+    """Prints messages instead of sending them (development)."""
+    _lock = threading.Lock()
+
+    def send(self, messages):
+        with self._lock:
+            for m in messages:
+                sys.stdout.write(f"[{self.channel}] to {m.address}: {m.subject}\n{m.body}\n\n")
+            sys.stdout.flush()
+        return {}
+
+
+class FileTransport(Transport):
+    """Appends one JSON line per message to ``settings.MESSAGING_FILE_PATH`` (tests)."""
+    _lock = threading.Lock()
+
+    def send(self, messages):
+        path = getattr(settings, "MESSAGING_FILE_PATH", "outbox.jsonl")
+        lines = [
+            json.dumps({"id": m.pk, "channel": self.channel, "to": m.address, "subject": m.subject, "body": m.body})
+            for m in messages
+        ]
+        with self._lock, open(path, "a", encoding="utf-8") as outbox:
+            outbox.write("\n".join(lines) + "\n")
+        return {}
+
+
+class EmailTransport(Transport):
+    """Sends through Django's configured EMAIL_BACKEND, reusing one connection per chunk."""
+
+    def open(self):
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+
+    def close(self):
+        self.connection.close()
+
+    def send(self, messages):
+        failures = {}
+        for m in messages:
+            try:
+                EmailMessage(m.subject, m.body, None, [m.address], connection=self.connection).send()
+            except Exception as e:
+                failures[m.pk] = str(e)
+        return failures
+
+
+def transport_for(channel):
+    paths = {**DEFAULT_TRANSPORTS, **getattr(settings, "MESSAGING_TRANSPORTS", {})}
+    return import_string(paths[channel])
+
+
+# -----------------------------
+# Queueing
+# -----------------------------
+def addresses_for(user_ids):
+    """{user_id: {channel: address}}; the phone comes from the patient or nurse profile."""
+    rows = User.objects.filter(id__in=user_ids, is_active=True).values_list(
+        "id", "email", "patient_profile__phone", "nurse__phone"
+    )
+    addresses = {}
+    for user_id, email, patient_phone, nurse_phone in rows:
+        addresses[user_id] = {OutboundMessage.EMAIL: email, OutboundMessage.SMS: patient_phone or nurse_phone}
+    return addresses
+
+
+def subject_for(parts):
+    return "AfyaCare notification" if parts == 1 else f"AfyaCare: {parts} new notifications"
+
+
+def queue(entries, coalesce=True, subject=None):
+    """
+    Queue ``(user_id, channel, text)`` entries. Recipients without an
+    address on that channel are skipped. Returns the number of entries
+    queued (merged or new).
+    """
+    addresses = addresses_for({user_id for user_id, _, _ in entries})
+    grouped = defaultdict(list)
+    for user_id, channel, text in entries:
+        if addresses.get(user_id, {}).get(channel):
+            grouped[(user_id, channel)].append(text)
+    if not grouped:
+        return 0
+
+    now = timezone.now()
+    open_messages = {}
+    if coalesce:
+        pending = OutboundMessage.objects.filter(
+            status=OutboundMessage.PENDING, send_after__gt=now,
+            user_id__in={user_id for user_id, _ in grouped}, channel__in={channel for _, channel in grouped},
+        ).order_by("-send_after").values_list("user_id", "channel", "pk")
+        open_messages = {(user_id, channel): pk for user_id, channel, pk in pending}
+
+    new_messages = []
+    for (user_id, channel), texts in grouped.items():
+        pk = open_messages.get((user_id, channel))
+        # Conditional on still being pending, so text never lands on a
+        # message the dispatcher has already claimed.
+        if pk and OutboundMessage.objects.filter(pk=pk, status=OutboundMessage.PENDING).update(
+            body=Concat(F("body"), Value("\n" + "\n".join(texts))), parts=F("parts") + len(texts),
+        ):
+            continue
+        new_messages.append(OutboundMessage(
+            user_id=user_id,
+            channel=channel,
+            address=addresses[user_id][channel],
+            subject=subject or "",
+            body="\n".join(texts),
+            parts=len(texts),
+            send_after=now + COALESCE_WINDOW if coalesce else now,
+        ))
+    OutboundMessage.objects.bulk_create(new_messages, batch_size=1000)
+    if new_messages:
+        schedule_dispatch(min(m.send_after for m in new_messages))
+    return sum(len(texts) for texts in grouped.values())
+
+
+def queue_notifications(messages):
+    """Receiver side of ``notifications.notifications_dispatched``."""
+    return queue([(m["user_id"], channel, m["message"]) for m in messages for channel in m["channels"]])
+
+
+def schedule_dispatch(when):
+    """Enqueue a dispatch job unless one is already due by ``when``."""
+    already = Job.objects.filter(
+        name="messaging.dispatch", status=Job.QUEUED, run_after__lte=when
+    ).exists()
+    if not already:
+        jobs.enqueue("messaging.dispatch", queue="messaging", run_after=when, max_attempts=1)
+
+
+# -----------------------------
+# Dispatch
+# -----------------------------
+def claim(channel, limit=CLAIM_SIZE):
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundMessage.PENDING, channel=channel, send_after__lte=now)
+            .order_by("send_after", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundMessage.objects.filter(pk__in=ids, status=OutboundMessage.PENDING).update(
+            status=OutboundMessage.SENDING, locked_at=now, attempts=F("attempts") + 1,
+        )
+    return list(OutboundMessage.objects.filter(pk__in=ids, status=OutboundMessage.SENDING, locked_at=now))
+
+
+def _send_chunk(transport_class, channel, chunk):
+    transport = transport_class(channel)
+    try:
+        transport.open()
+        return transport.send(chunk)
+    except Exception as e:
+        return {m.pk: str(e) for m in chunk}
+    finally:
+        try:
+            transport.close()
+        except Exception:
+            pass
+
+
+def send_messages(channel, messages):
+    """Send claimed messages in chunks over pooled connections. Returns {id: error}."""
+    for m in messages:
+        if not m.subject:
+            m.subject = subject_for(m.parts)
+    size = BATCH_SIZE[channel]
+    chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+    transport_class = transport_for(channel)
+    failures = {}
+    with ThreadPoolExecutor(max_workers=min(CONCURRENCY[channel], len(chunks))) as pool:
+        for result in pool.map(lambda chunk: _send_chunk(transport_class, channel, chunk), chunks):
+            failures.update(result)
+    return failures
+
+
+def _record(messages, failures):
+    now = timezone.now()
+    sent = [m.pk for m in messages if m.pk not in failures]
+    OutboundMessage.objects.filter(pk__in=sent).update(
+        status=OutboundMessage.SENT, sent_at=now, locked_at=None, last_error="",
+    )
+    retry_at = None
+    for m in messages:
+        if m.pk not in failures:
+            continue
+        fields = {"locked_at": None, "last_error": failures[m.pk]}
+        if m.attempts >= m.max_attempts:
+            fields["status"] = OutboundMessage.DEAD
+        else:
+            fields.update(status=OutboundMessage.PENDING, send_after=now + jobs.backoff(m.attempts))
+            retry_at = min(retry_at or fields["send_after"], fields["send_after"])
+        OutboundMessage.objects.filter(pk=m.pk).update(**fields)
+    if retry_at:
+        schedule_dispatch(retry_at)
+    return len(sent)
+
+
+def release_stale(older_than=STALE_AFTER):
+    """Return messages stuck in 'sending' (worker died) to the queue."""
+    cutoff = timezone.now() - older_than
+    return OutboundMessage.objects.filter(status=OutboundMessage.SENDING, locked_at__lt=cutoff).update(
+        status=OutboundMessage.PENDING, locked_at=None,
+    )
+
+
+def dispatch(channels=CHANNELS, limit=CLAIM_SIZE):
+    """Send everything that is due. Returns {channel: {"sent": n, "failed": n}}."""
+    release_stale()
+    totals = {}
+    for channel in channels:
+        sent = failed = 0
+        while True:
+            messages = claim(channel, limit)
+            if not messages:
+                break
+            failures = send_messages(channel, messages)
+            sent += _record(messages, failures)
+            failed += len(failures)
+        totals[channel] = {"sent": sent, "failed": failed}
+    return totals
+
+
+def retry_dead(ids=None):
+    """Put dead letters back in the queue with a fresh attempt budget."""
+    qs = OutboundMessage.objects.filter(status=OutboundMessage.DEAD)
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    now = timezone.now()
+    count = qs.update(status=OutboundMessage.PENDING, attempts=0, send_after=now, last_error="")
+    if count:
+        schedule_dispatch(now)
+    return count
@@ -0,0 +1,239 @@
+"""
+Prometheus metrics, served at ``/metrics`` in the text exposition format.
+
+Each process (gunicorn worker, job worker) keeps its counters and
+histograms in memory; a background thread writes them every
+``FLUSH_INTERVAL`` seconds to ``METRICS_DIR/<pid>-<token>.json`` with an
+atomic rename, so recording a sample never touches the filesystem. The
+random token is new in every process, so a recycled worker that gets a
+dead one's pid starts a file of its own. A scrape merges every file in the
+directory, so totals add up across workers no matter which one answers;
+files of exited workers are kept so counters never go backwards. Clear the
+directory on deploy.
+
+Domain gauges (pending appointments, unpaid invoices, ...) are read from
+the database at scrape time rather than tracked.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0
+
+# name -> (type, help)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "API request latency by route name."),
+    "db_queries_total": ("counter", "Database queries issued while handling requests, by route name."),
+    "auth_duration_seconds": ("histogram", "Time spent authenticating requests, by authenticator."),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)."),
+    "password_hash_seconds": ("histogram", "Password hashing time by operation (hash/verify/rehash)."),
+    "password_hash_rejected_total": ("counter", "Logins turned away because the hashing pool was full."),
+    "prescriptions_processed_total": ("counter", "Prescriptions claimed, released and dispensed, by pharmacist."),
+    "appointments_pending": ("gauge", "Appointments awaiting a doctor's decision."),
+    "prescriptions_queued": ("gauge", "Prescriptions waiting to be dispensed."),
+    "invoices_unpaid": ("gauge", "Number of unpaid invoices."),
+    "invoices_unpaid_amount": ("gauge", "Total amount of unpaid invoices (Ksh)."),
+    "alerts_unacknowledged": ("gauge", "Patient alerts not yet acknowledged."),
+    "jobs_queued": ("gauge", "Background jobs waiting to run."),
+    "outbound_messages_pending": ("gauge", "Email/SMS messages waiting to be sent."),
+}
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", None) or os.path.join(tempfile.gettempdir(), "clinic-metrics")
+
+
+# -----------------------------
+# Per-process registry
+# -----------------------------
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self._flusher_pid = None
+        self.filename = self._new_filename()
+        # A forked worker starts from zero in its own file; the samples it
+        # inherited are already counted in the parent's.
+        os.register_at_fork(after_in_child=self._forked)
+
+    @staticmethod
+    def _new_filename():
+        return f"{os.getpid()}-{uuid.uuid4().hex}.json"
+
+    def _forked(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.filename = self._new_filename()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+        self._ensure_flusher()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            index = bisect_left(hist["buckets"], value)
+            if index < len(hist["counts"]):
+                hist["counts"][index] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+        self._ensure_flusher()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, dict(h, counts=list(h["counts"]))] for (name, labels), h in self.histograms.items()],
+            }
+
+    def _ensure_flusher(self):
+        # Checked by pid because a forked worker does not inherit the thread.
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        directory = metrics_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.filename)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as out:
+                json.dump(self.snapshot(), out)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # metrics must never take the process down
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def cache_lookup(cache, hit):
+    registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+# -----------------------------
+# Collection
+# -----------------------------
+def collect():
+    """Merge every process's file into ({key: value}, {key: histogram})."""
+    registry.flush()
+    counters = defaultdict(float)
+    histograms = {}
+    directory = metrics_dir()
+    filenames = os.listdir(directory) if os.path.isdir(directory) else []
+    for filename in filenames:
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced or truncated; picked up next scrape
+        for name, labels, value in data["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, hist in data["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = hist
+                continue
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], hist["counts"])]
+            merged["sum"] += hist["sum"]
+            merged["count"] += hist["count"]
+    return counters, histograms
+
+
+def domain_gauges():
+    from billing.models import Invoice
+    from .models import Alert, Appointment, Job, OutboundMessage, Prescription
+    from .transitions import spellings
+
+    unpaid = Invoice.objects.filter(status="unpaid").aggregate(n=Count("id"), total=Sum("amount"))
+    return {
+        "appointments_pending": Appointment.objects.filter(status__in=spellings("REQUESTED")).count(),
+        "prescriptions_queued": Prescription.objects.filter(status__in=[Prescription.PENDING, Prescription.CLAIMED]).count(),
+        "invoices_unpaid": unpaid["n"],
+        "invoices_unpaid_amount": float(unpaid["total"] or 0),
+        "alerts_unacknowledged": Alert.objects.filter(acknowledged=False).count(),
+        "jobs_queued": Job.objects.filter(status=Job.QUEUED).count(),
+        "outbound_messages_pending": OutboundMessage.objects.filter(status=OutboundMessage.PENDING).count(),
+    }
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    counters, histograms = collect()
+    samples = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        samples[name].append(f"{name}{_labels(labels)} {_number(value)}")
+    for (name, labels), hist in sorted(histograms.items(), key=lambda item: item[0]):
+        cumulative = 0
+        for bound, count in zip(hist["buckets"], hist["counts"]):
+            cumulative += count
+            samples[name].append(f"{name}_bucket{_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+        samples[name].append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        samples[name].append(f"{name}_sum{_labels(labels)} {hist['sum']:.6f}")
+        samples[name].append(f"{name}_count{_labels(labels)} {hist['count']}")
+    for name, value in domain_gauges().items():
+        samples[name].append(f"{name} {_number(value)}")
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        if name not in samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
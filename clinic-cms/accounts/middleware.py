@@ -0,0 +1,124 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import logs, metrics, notifications, profiling
+
+perf_logger = logging.getLogger("accounts.perf")
+
+
+class RequestContextMiddleware:
+    """Request id and route name for log correlation (see accounts/logs.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = logs.request_id_from(request.headers.get("X-Request-ID"))
+        token = logs.bind(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            logs.unbind(token)
+        response["X-Request-ID"] = request_id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        logs.set_route(match.view_name or match.route)
+
+
+class NotificationBatchMiddleware:
+    """Deliver all notifications raised while handling a request in one batch."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with notifications.batch():
+            return self.get_response(request)
+
+
+class QueryProfilingMiddleware:
+    """
+    Per-request query/DB/serializer timings as ``Server-Timing`` headers, logs
+    and the ``/api/_perf/`` report. Removed from the stack unless
+    ``settings.QUERY_PROFILING`` is on.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_PROFILING", False):
+            raise MiddlewareNotUsed
+        profiling.install_serializer_timing()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = profiling.RequestProfile()
+        started = time.perf_counter()
+        with profiling.profiling(profile):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "route": (match.view_name or match.route) if match else "unresolved",
+            "path": request.path,
+            "status": response.status_code,
+            "queries": profile.queries,
+            "db_ms": round(profile.db_seconds * 1000, 1),
+            "serializer_ms": round(profile.serializer_seconds * 1000, 1),
+            "total_ms": round(total_ms, 1),
+            "response_bytes": 0 if response.streaming else len(response.content),
+            "duplicates": profile.duplicates(),
+        }
+        profiling.perf_log.add(record)
+        response["Server-Timing"] = (
+            f'db;dur={record["db_ms"]};desc="{profile.queries} queries", '
+            f'serialize;dur={record["serializer_ms"]}, total;dur={record["total_ms"]}'
+        )
+
+        flagged = (
+            total_ms >= profiling.SLOW_MS or profile.queries >= profiling.MANY_QUERIES or record["duplicates"]
+        )
+        perf_logger.log(
+            logging.WARNING if flagged else logging.DEBUG,
+            "%s %s: %d queries (%d repeated shapes), db %.1fms, serialize %.1fms, total %.1fms",
+            record["method"], record["route"], record["queries"], len(record["duplicates"]),
+            record["db_ms"], record["serializer_ms"], record["total_ms"],
+            extra={"perf": record},
+        )
+        return response
+
+
+class MetricsMiddleware:
+    """Request latency and query counts per route name, exported at /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else "unmatched"
+        metrics.observe(
+            "http_request_duration_seconds", elapsed,
+            route=route, method=request.method, status=str(response.status_code),
+        )
+        if queries:
+            metrics.inc("db_queries_total", queries, route=route)
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_search_vector(apps, schema_editor):
+    """PostgreSQL only: generated tsvector column + GIN index."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "ALTER TABLE accounts_searchdocument ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(body, '')), 'B')"
+        ") STORED"
+    )
+    schema_editor.execute(
+        "CREATE INDEX accounts_searchdocument_vector_gin "
+        "ON accounts_searchdocument USING gin (search_vector)"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS accounts_searchdocument_vector_gin")
+    schema_editor.execute("ALTER TABLE accounts_searchdocument DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_appointmenttransition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('patient', 'Patient'), ('medical_record', 'Medical Record'), ('lab_result', 'Lab Result'), ('prescription', 'Prescription')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='accounts.patient')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='uniq_searchdocument_kind_object')],
+            },
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
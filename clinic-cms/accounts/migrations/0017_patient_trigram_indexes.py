@@ -0,0 +1,37 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ("accounts_user_first_name_trgm", "accounts_user", "first_name"),
+    ("accounts_user_last_name_trgm", "accounts_user", "last_name"),
+    ("accounts_user_username_trgm", "accounts_user", "username"),
+    ("accounts_patient_phone_trgm", "accounts_patient", "phone"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """PostgreSQL only: pg_trgm GIN indexes backing the patient typeahead."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_searchdocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_patient_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=64)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='accounts.patient')),
+            ],
+        ),
+    ]
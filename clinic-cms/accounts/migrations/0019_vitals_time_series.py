@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_patientblockingkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestVitals',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_vitals', serialize=False, to='accounts.patient')),
+                ('observed_at', models.DateTimeField()),
+                ('temperature', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('systolic', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('diastolic', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('heart_rate', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respiratory_rate', models.PositiveSmallIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VitalsObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('observed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('temperature', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('systolic', models.PositiveSmallIntegerField(blank=True, help_text='mmHg', null=True)),
+                ('diastolic', models.PositiveSmallIntegerField(blank=True, help_text='mmHg', null=True)),
+                ('heart_rate', models.PositiveSmallIntegerField(blank=True, help_text='Beats per minute', null=True)),
+                ('respiratory_rate', models.PositiveSmallIntegerField(blank=True, help_text='Breaths per minute', null=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vitals_observations', to='accounts.patient')),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-observed_at'],
+                'indexes': [models.Index(fields=['patient', 'observed_at'], name='accounts_vi_patient_c1e40f_idx')],
+            },
+        ),
+    ]
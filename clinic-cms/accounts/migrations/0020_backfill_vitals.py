@@ -0,0 +1,44 @@
+import re
+
+from django.db import migrations
+
+BP_RE = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$")
+
+
+def backfill_vitals(apps, schema_editor):
+    """Seed one observation (and the latest row) from each patient's current vitals."""
+    Patient = apps.get_model("accounts", "Patient")
+    VitalsObservation = apps.get_model("accounts", "VitalsObservation")
+    LatestVitals = apps.get_model("accounts", "LatestVitals")
+
+    observations, latest = [], []
+    patients = Patient.objects.values_list(
+        "id", "updated_at", "temperature", "blood_pressure", "heart_rate", "respiratory_rate"
+    )
+    for pk, updated_at, temperature, blood_pressure, heart_rate, respiratory_rate in patients.iterator():
+        match = BP_RE.match(blood_pressure or "")
+        values = {
+            "temperature": temperature,
+            "systolic": int(match.group(1)) if match else None,
+            "diastolic": int(match.group(2)) if match else None,
+            "heart_rate": heart_rate if heart_rate and heart_rate > 0 else None,
+            "respiratory_rate": respiratory_rate if respiratory_rate and respiratory_rate > 0 else None,
+        }
+        if all(v is None for v in values.values()):
+            continue
+        observations.append(VitalsObservation(patient_id=pk, observed_at=updated_at, **values))
+        latest.append(LatestVitals(patient_id=pk, observed_at=updated_at, **values))
+
+    VitalsObservation.objects.bulk_create(observations, batch_size=1000)
+    LatestVitals.objects.bulk_create(latest, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_vitals_time_series'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vitals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_backfill_vitals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='ward',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='VitalsThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ward', models.CharField(blank=True, default='', max_length=50)),
+                ('vital', models.CharField(choices=[('temperature', 'Temperature'), ('systolic', 'Systolic BP'), ('diastolic', 'Diastolic BP'), ('heart_rate', 'Heart Rate'), ('respiratory_rate', 'Respiratory Rate')], max_length=20)),
+                ('low', models.DecimalField(blank=True, decimal_places=1, max_digits=5, null=True)),
+                ('high', models.DecimalField(blank=True, decimal_places=1, max_digits=5, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vitals_thresholds', to='accounts.patient')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_counters(apps, schema_editor):
+    """Start each user's counter at their current unread total."""
+    Notification = apps.get_model("accounts", "Notification")
+    NotificationCounter = apps.get_model("accounts", "NotificationCounter")
+    totals = Notification.objects.filter(read=False).values("user_id").annotate(n=Count("id"))
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row["user_id"], unread=row["n"]) for row in totals], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, help_text='Event that produced it, e.g. appointment_requested', max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', '-created_at'], name='accounts_notif_user_read_idx'),
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
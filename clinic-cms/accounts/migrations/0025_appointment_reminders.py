@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(help_text='Reminder window, e.g. 24h', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReminderCursor',
+            fields=[
+                ('window', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('scanned_until', models.DateTimeField(help_text='Appointments starting up to here have been scanned')),
+                ('last_run_at', models.DateTimeField()),
+                ('last_batch', models.PositiveIntegerField(default=0)),
+                ('max_lag_seconds', models.FloatField(default=0)),
+                ('avg_lag_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['ACCEPTED', 'APPROVED'])), fields=['date', 'time'], name='accounts_appt_slot_idx'),
+        ),
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='appointment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='accounts.appointment'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentreminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'window'), name='uniq_appointment_reminder_window'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model("accounts", "RevocationCounter").objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_appointment_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True)),
+                ('token_type', models.CharField(max_length=20)),
+                ('version', models.PositiveBigIntegerField(help_text='RevocationCounter.version this revocation produced')),
+                ('expires_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='revoked_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['version'], name='accounts_revoked_version_idx'), models.Index(fields=['expires_at'], name='accounts_revoked_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
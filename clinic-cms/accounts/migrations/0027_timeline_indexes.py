@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_token_revocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='accounts_appt_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='accounts_lab_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='accounts_record_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='accounts_rx_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:38
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientChart',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chart', serialize=False, to='accounts.patient')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_patient_chart'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['administered', 'scheduled_time'], name='accounts_med_round_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_medication_round_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bedstatus',
+            name='ward',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='pendingadmission',
+            name='ward',
+            field=models.CharField(blank=True, default='', help_text='Ward the patient is expected on', max_length=50),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_bed_wards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingadmission',
+            name='patient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pending_admissions', to='accounts.patient'),
+        ),
+        migrations.CreateModel(
+            name='PatientTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=20)),
+                ('from_status', models.CharField(max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('ward', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='patient_transitions', to=settings.AUTH_USER_MODEL)),
+                ('bed', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.bedstatus')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='accounts.patient')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['patient', 'created_at'], name='accounts_pt_patient_idx'), models.Index(fields=['ward', 'created_at'], name='accounts_pt_ward_idx')],
+            },
+        ),
+    ]
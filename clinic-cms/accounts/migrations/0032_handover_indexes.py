@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_patient_transitions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['acknowledged', 'created_at'], name='accounts_alert_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='handoverlog',
+            index=models.Index(fields=['created_at'], name='accounts_handover_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patienttransition',
+            index=models.Index(fields=['created_at'], name='accounts_pt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed', 'created_at'], name='accounts_task_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['nurse', 'completed', 'created_at'], name='accounts_task_nurse_idx'),
+        ),
+    ]
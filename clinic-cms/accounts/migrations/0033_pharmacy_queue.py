@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def normalise_status(apps, schema_editor):
+    """The list filter used to match status case-insensitively; store the canonical spelling."""
+    Prescription = apps.get_model("accounts", "Prescription")
+    Prescription.objects.exclude(status__in=["PENDING", "DISPENSED", "CANCELLED"]).update(status=Upper("status"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0032_handover_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_prescriptions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='dispensed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='dispensed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dispensed_prescriptions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Routine'), (1, 'Urgent'), (2, 'Stat')], default=0),
+        ),
+        migrations.AlterField(
+            model_name='prescription',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('CLAIMED', 'Being dispensed'), ('DISPENSED', 'Dispensed'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', '-priority', 'created_at'], name='accounts_rx_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['dispensed_at'], name='accounts_rx_dispensed_idx'),
+        ),
+        migrations.RunPython(normalise_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 08:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+VITAL_FIELDS = ("temperature", "systolic", "diastolic", "heart_rate", "respiratory_rate")
+
+
+def backfill_reading_times(apps, schema_editor):
+    """Existing rows only know their newest observation time; use it for every value they hold."""
+    LatestVitals = apps.get_model("accounts", "LatestVitals")
+    for field in VITAL_FIELDS:
+        LatestVitals.objects.filter(**{f"{field}__isnull": False}).update(**{f"{field}_at": F("observed_at")})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0033_pharmacy_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestvitals',
+            name='diastolic_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='latestvitals',
+            name='heart_rate_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='latestvitals',
+            name='respiratory_rate_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='latestvitals',
+            name='systolic_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='latestvitals',
+            name='temperature_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_reading_times, migrations.RunPython.noop),
+    ]
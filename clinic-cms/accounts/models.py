@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from datetime import date
 
 # -----------------------------
@@ -65,6 +67,16 @@ class User(AbstractUser):
             return f"Dr. {self.get_full_name()} - {self.get_specialization_display()}"
         return f"{self.username} ({self.role})"
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user built from token claims (accounts/authentication.py) loads
+        # the rest of its row in one query the first time a view reads a
+        # deferred field, instead of one query per field.
+        if fields is not None and getattr(self, "_from_claims", False):
+            deferred = self.get_deferred_fields()
+            if deferred and set(fields) <= deferred:
+                fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 class Patient(models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
@@ -105,6 +117,8 @@ class Patient(models.Model):
     heart_rate = models.IntegerField(null=True, blank=True, help_text="Beats per minute")
     respiratory_rate = models.IntegerField(null=True, blank=True, help_text="Breaths per minute")
     
+    ward = models.CharField(max_length=50, default="", blank=True, db_index=True)
+
     # Status & reason
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     reason = models.TextField(default="No reason provided")
@@ -117,6 +131,127 @@ class Patient(models.Model):
         return f"{self.user.get_full_name()} ({self.status})"
 
 
+# -----------------------------
+# Patient Transition model (append-only admission/discharge history)
+# -----------------------------
+class PatientTransition(models.Model):
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='transitions')
+    action = models.CharField(max_length=20)
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    ward = models.CharField(max_length=50, default="", blank=True)
+    bed = models.ForeignKey("BedStatus", on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='patient_transitions')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["patient", "created_at"], name="accounts_pt_patient_idx"),
+            models.Index(fields=["ward", "created_at"], name="accounts_pt_ward_idx"),
+            models.Index(fields=["created_at"], name="accounts_pt_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Patient {self.patient_id}: {self.from_status} -> {self.to_status}"
+
+# -----------------------------
+# Vitals Observation model (append-only time series)
+# -----------------------------
+class VitalsObservation(models.Model):
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='vitals_observations')
+    observed_at = models.DateTimeField(default=timezone.now)
+    temperature = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    systolic = models.PositiveSmallIntegerField(null=True, blank=True, help_text="mmHg")
+    diastolic = models.PositiveSmallIntegerField(null=True, blank=True, help_text="mmHg")
+    heart_rate = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Beats per minute")
+    respiratory_rate = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Breaths per minute")
+    recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ["-observed_at"]
+        indexes = [models.Index(fields=["patient", "observed_at"])]
+
+    def __str__(self):
+        return f"Vitals for patient {self.patient_id} at {self.observed_at}"
+
+# -----------------------------
+# Latest Vitals model (one row per patient, newest observation)
+# -----------------------------
+class LatestVitals(models.Model):
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='latest_vitals')
+    observed_at = models.DateTimeField()
+    temperature = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    systolic = models.PositiveSmallIntegerField(null=True, blank=True)
+    diastolic = models.PositiveSmallIntegerField(null=True, blank=True)
+    heart_rate = models.PositiveSmallIntegerField(null=True, blank=True)
+    respiratory_rate = models.PositiveSmallIntegerField(null=True, blank=True)
+    # When each value above was observed; a reading only replaces an older one.
+    temperature_at = models.DateTimeField(null=True, blank=True)
+    systolic_at = models.DateTimeField(null=True, blank=True)
+    diastolic_at = models.DateTimeField(null=True, blank=True)
+    heart_rate_at = models.DateTimeField(null=True, blank=True)
+    respiratory_rate_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Latest vitals for patient {self.patient_id}"
+
+# -----------------------------
+# Patient chart snapshot (see accounts/charts.py)
+# -----------------------------
+class PatientChart(models.Model):
+    """Denormalized chart summary, rewritten whenever a row it is built from changes."""
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='chart')
+    version = models.PositiveIntegerField(default=1)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chart for patient {self.patient_id} (v{self.version})"
+
+# -----------------------------
+# Vitals Threshold model (alert rules)
+# -----------------------------
+class VitalsThreshold(models.Model):
+    VITAL_CHOICES = [
+        ("temperature", "Temperature"),
+        ("systolic", "Systolic BP"),
+        ("diastolic", "Diastolic BP"),
+        ("heart_rate", "Heart Rate"),
+        ("respiratory_rate", "Respiratory Rate"),
+    ]
+
+    # Scope: a patient-specific rule beats a ward rule, which beats a global
+    # rule (blank ward, no patient).
+    ward = models.CharField(max_length=50, default="", blank=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True, blank=True, related_name='vitals_thresholds')
+    vital = models.CharField(max_length=20, choices=VITAL_CHOICES)
+    low = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True)
+    high = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        if self.low is None and self.high is None:
+            raise ValidationError("Set at least one of low/high.")
+        if self.low is not None and self.high is not None and self.low > self.high:
+            raise ValidationError("low must not exceed high.")
+
+    def __str__(self):
+        scope = f"patient {self.patient_id}" if self.patient_id else (self.ward or "global")
+        return f"{self.get_vital_display()} [{self.low}, {self.high}] ({scope})"
+
+# -----------------------------
+# Patient Blocking Key model (duplicate detection)
+# -----------------------------
+class PatientBlockingKey(models.Model):
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='blocking_keys')
+    key = models.CharField(max_length=64, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> patient {self.patient_id}"
+
+
 # -----------------------------
 # Appointment model
 # -----------------------------
@@ -142,8 +277,68 @@ class Appointment(models.Model):
     requested_by_patient = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["patient", "created_at", "id"], name="accounts_appt_timeline_idx"),
+            # Range scans by the reminder scheduler only look at accepted slots.
+            models.Index(
+                fields=["date", "time"],
+                condition=models.Q(status__in=["ACCEPTED", "APPROVED"]),
+                name="accounts_appt_slot_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Appointment: {self.patient} with Dr. {self.doctor} on {self.date}"
+
+# -----------------------------
+# Appointment Transition model (append-only status history)
+# -----------------------------
+class AppointmentTransition(models.Model):
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='transitions')
+    action = models.CharField(max_length=20)
+    from_status = models.CharField(max_length=20, help_text="Canonical source state")
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='appointment_transitions')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["appointment", "created_at"])]
+
+    def __str__(self):
+        return f"Appointment {self.appointment_id}: {self.from_status} -> {self.to_status}"
+
+# -----------------------------
+# Appointment Reminder models (see accounts/reminders.py)
+# -----------------------------
+class AppointmentReminder(models.Model):
+    """Marker that the ``window`` reminder for an appointment has been sent."""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name="reminders")
+    window = models.CharField(max_length=10, help_text="Reminder window, e.g. 24h")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["appointment", "window"], name="uniq_appointment_reminder_window"),
+        ]
+
+    def __str__(self):
+        return f"Appointment {self.appointment_id}: {self.window} reminder"
+
+
+class ReminderCursor(models.Model):
+    """Per-window scheduler watermark and the metrics of its last run."""
+    window = models.CharField(max_length=10, primary_key=True)
+    scanned_until = models.DateTimeField(help_text="Appointments starting up to here have been scanned")
+    last_run_at = models.DateTimeField()
+    last_batch = models.PositiveIntegerField(default=0)
+    max_lag_seconds = models.FloatField(default=0)
+    avg_lag_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.window} reminders scanned until {self.scanned_until}"
+
 # -----------------------------
 # Medical Record model
 # -----------------------------
@@ -176,6 +371,7 @@ class MedicalRecord(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["patient", "created_at", "id"], name="accounts_record_timeline_idx")]
 
     def __str__(self):
         return f"Record for {self.patient.user.get_full_name()} on {self.created_at.date()}"
@@ -214,22 +410,49 @@ class Prescription(models.Model):
     notes = models.TextField(blank=True)
 
     PENDING = "PENDING"
+    CLAIMED = "CLAIMED"
     DISPENSED = "DISPENSED"
     CANCELLED = "CANCELLED"
     STATUS_CHOICES = [
         (PENDING, "Pending"),
+        (CLAIMED, "Being dispensed"),
         (DISPENSED, "Dispensed"),
         (CANCELLED, "Cancelled"),
     ]
 
+    ROUTINE = 0
+    URGENT = 1
+    STAT = 2
+    PRIORITY_CHOICES = [
+        (ROUTINE, "Routine"),
+        (URGENT, "Urgent"),
+        (STAT, "Stat"),
+    ]
+
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
         default=PENDING,
     )
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=ROUTINE)
+    claimed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="claimed_prescriptions"
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    dispensed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="dispensed_prescriptions"
+    )
+    dispensed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["patient", "created_at", "id"], name="accounts_rx_timeline_idx"),
+            models.Index(fields=["status", "-priority", "created_at"], name="accounts_rx_queue_idx"),
+            models.Index(fields=["dispensed_at"], name="accounts_rx_dispensed_idx"),
+        ]
+
     def __str__(self):
         return f"{self.medication_name} for {self.patient.user.get_full_name()} [{self.status}]"
 
@@ -243,7 +466,9 @@ class LabResult(models.Model):
     result = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        indexes = [models.Index(fields=["patient", "created_at", "id"], name="accounts_lab_timeline_idx")]
 
     def __str__(self):
         return f"{self.test_name} for {self.patient}"
@@ -278,6 +503,9 @@ class HandoverLog(models.Model):
     note = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["created_at"], name="accounts_handover_created_idx")]
+
     def __str__(self):
         return f"Handover by {self.nurse.username} at {self.created_at}"
 
@@ -286,13 +514,26 @@ class HandoverLog(models.Model):
 # -----------------------------
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    kind = models.CharField(max_length=40, blank=True, help_text="Event that produced it, e.g. appointment_requested")
     message = models.TextField()
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "read", "-created_at"], name="accounts_notif_user_read_idx")]
+
     def __str__(self):
         return f"Notification for {self.user.username} - {'Read' if self.read else 'Unread'}"
 
+
+class NotificationCounter(models.Model):
+    """Per-user unread total, maintained alongside Notification writes (see accounts/notifications.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter")
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
 # -----------------------------
 # Alert model
 # -----------------------------
@@ -303,6 +544,9 @@ class Alert(models.Model):
     read = models.BooleanField(default=False)  
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["acknowledged", "created_at"], name="accounts_alert_open_idx")]
+
     def __str__(self):
         return f"Alert for {self.patient}: {self.message[:50]}..."
 
@@ -316,6 +560,12 @@ class Task(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["completed", "created_at"], name="accounts_task_open_idx"),
+            models.Index(fields=["nurse", "completed", "created_at"], name="accounts_task_nurse_idx"),
+        ]
+
     def __str__(self):
         return f"Task: {self.description[:50]}..."
 
@@ -323,6 +573,7 @@ class Task(models.Model):
 # Bed Status model
 # -----------------------------
 class BedStatus(models.Model):
+    ward = models.CharField(max_length=50, default="", blank=True, db_index=True)
     bed_number = models.CharField(max_length=10)
     occupied = models.BooleanField(default=False)
     patient = models.ForeignKey(Patient, null=True, blank=True, on_delete=models.SET_NULL)
@@ -342,6 +593,9 @@ class Medication(models.Model):
     administered_at = models.DateTimeField(null=True, blank=True)
     scheduled_time = models.DateTimeField()
 
+    class Meta:
+        indexes = [models.Index(fields=["administered", "scheduled_time"], name="accounts_med_round_idx")]
+
     def __str__(self):
         status = "Administered" if self.administered else "Pending"
         return f"{self.name} for {self.patient.user.username} - {status}"
@@ -350,11 +604,15 @@ class Medication(models.Model):
 # Pending Admission model
 # -----------------------------
 class PendingAdmission(models.Model):
+    patient = models.ForeignKey(
+        Patient, on_delete=models.SET_NULL, null=True, blank=True, related_name="pending_admissions"
+    )
     patient_name = models.CharField(max_length=100)
     age = models.PositiveIntegerField()
     gender = models.CharField(max_length=10, choices=[("M", "Male"), ("F", "Female")])
     diagnosis = models.TextField(blank=True)
     assigned_room = models.CharField(max_length=10, blank=True)
+    ward = models.CharField(max_length=50, default="", blank=True, help_text="Ward the patient is expected on")
     processed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -416,4 +674,168 @@ class PrescribedMedication(models.Model):
     date_prescribed = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.medication_name} for {self.patient_name}"
\ No newline at end of file
+        return f"{self.medication_name} for {self.patient_name}"
+# -----------------------------
+# Search Document model (denormalized full-text index)
+# -----------------------------
+class SearchDocument(models.Model):
+    KIND_PATIENT = "patient"
+    KIND_RECORD = "medical_record"
+    KIND_LAB = "lab_result"
+    KIND_PRESCRIPTION = "prescription"
+    KIND_CHOICES = [
+        (KIND_PATIENT, "Patient"),
+        (KIND_RECORD, "Medical Record"),
+        (KIND_LAB, "Lab Result"),
+        (KIND_PRESCRIPTION, "Prescription"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="search_documents")
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # On PostgreSQL the table also carries a generated ``search_vector``
+    # tsvector column with a GIN index (see migration 0016). It is not
+    # declared here so the model stays portable to SQLite.
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uniq_searchdocument_kind_object"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}: {self.title}"
+
+
+# -----------------------------
+# Background Job model (database-backed queue, see accounts/jobs.py)
+# -----------------------------
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Registered task name")
+    queue = models.CharField(max_length=50, default="default")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Runtime of the last attempt")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only queued rows are ever polled, so keep the index to those.
+            models.Index(
+                fields=["queue", "-priority", "run_after"],
+                condition=models.Q(status="queued"),
+                name="accounts_job_ready_idx",
+            ),
+            models.Index(fields=["status", "locked_at"], name="accounts_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.name} ({self.status})"
+
+
+# -----------------------------
+# Outbound Message model (email/SMS outbox, see accounts/messaging.py)
+# -----------------------------
+class OutboundMessage(models.Model):
+    EMAIL = "email"
+    SMS = "sms"
+    CHANNEL_CHOICES = [
+        (EMAIL, "Email"),
+        (SMS, "SMS"),
+    ]
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead letter"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbound_messages")
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    address = models.CharField(max_length=254, help_text="Email address or phone number")
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    parts = models.PositiveSmallIntegerField(default=1, help_text="Notifications coalesced into this message")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    send_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["channel", "send_after"],
+                condition=models.Q(status="pending"),
+                name="accounts_outbound_due_idx",
+            ),
+            models.Index(
+                fields=["user", "channel"],
+                condition=models.Q(status="pending"),
+                name="accounts_outbound_open_idx",
+            ),
+            models.Index(fields=["status", "created_at"], name="accounts_outbound_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.address} ({self.status})"
+
+# -----------------------------
+# Token revocation (see accounts/revocation.py)
+# -----------------------------
+class RevokedToken(models.Model):
+    """A revoked JWT, kept until it would have expired anyway."""
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="revoked_tokens")
+    token_type = models.CharField(max_length=20)
+    version = models.PositiveBigIntegerField(help_text="RevocationCounter.version this revocation produced")
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["version"], name="accounts_revoked_version_idx"),
+            models.Index(fields=["expires_at"], name="accounts_revoked_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.token_type} {self.jti} (until {self.expires_at})"
+
+
+class RevocationCounter(models.Model):
+    """Single row, bumped by every revocation so other processes know to sync."""
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"revocation version {self.version}"
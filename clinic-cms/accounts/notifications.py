@@ -0,0 +1,160 @@
+"""
+Notification fan-out.
+
+Domain events (appointment requested, lab result created, prescription
+pending, ...) call ``emit()`` with recipient user ids. An event is only
+accepted once the transaction that raised it commits, and inside a
+``batch()`` block (every API request runs in one, see
+``NotificationBatchMiddleware``) accepted events are held and delivered
+together: one ``UserSettings`` lookup, one ``bulk_create`` and a few
+counter UPDATEs however many events the request produced.
+
+Each user's unread total lives in ``NotificationCounter`` and is moved by
+the same code that creates and reads notifications, so the badge count is a
+primary-key read instead of a COUNT over the notifications table.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
+
+from .models import Notification, NotificationCounter, UserSettings
+
+IN_APP = "in_app"
+EMAIL = "email"
+SMS = "sms"
+
+# Channels for users without a UserSettings row (the model defaults).
+DEFAULT_CHANNELS = frozenset({IN_APP, EMAIL})
+
+# Sent after delivery with ``messages``: [{"user_id", "kind", "message",
+# "channels"}] for recipients who also want email and/or SMS.
+notifications_dispatched = Signal()
+
+_state = threading.local()
+
+
+# -----------------------------
+# Emitting
+# -----------------------------
+def emit(kind, user_ids, message, exclude=None):
+    """Queue ``message`` for each of ``user_ids`` (minus ``exclude``, usually the actor)."""
+    recipients = frozenset(uid for uid in user_ids if uid and uid != exclude)
+    if recipients:
+        transaction.on_commit(lambda: _accept((kind, recipients, message)))
+
+
+def _accept(event):
+    if getattr(_state, "depth", 0):
+        _state.events.append(event)
+    else:
+        deliver([event])
+
+
+@contextmanager
+def batch():
+    """Hold committed events until the outermost ``batch()`` exits, then deliver them together."""
+    if not getattr(_state, "depth", 0):
+        _state.depth, _state.events = 0, []
+    _state.depth += 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+        if not _state.depth:
+            events, _state.events = _state.events, []
+            if events:
+                deliver(events)
+
+
+# -----------------------------
+# Delivery
+# -----------------------------
+def channels_for(user_ids):
+    """{user_id: frozenset of channels} honouring each user's settings."""
+    channels = dict.fromkeys(user_ids, DEFAULT_CHANNELS)
+    rows = UserSettings.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "notifications_enabled", "email_notifications", "sms_notifications"
+    )
+    for user_id, in_app, email, sms in rows:
+        channels[user_id] = frozenset(
+            channel for channel, wanted in ((IN_APP, in_app), (EMAIL, email), (SMS, sms)) if wanted
+        )
+    return channels
+
+
+def deliver(events):
+    """Write ``(kind, recipients, message)`` events as notifications. Returns the rows created."""
+    channels = channels_for(set().union(*(recipients for _, recipients, _ in events)))
+    rows, outbound = [], []
+    for kind, recipients, message in events:
+        for user_id in recipients:
+            wanted = channels[user_id]
+            if IN_APP in wanted:
+                rows.append(Notification(user_id=user_id, kind=kind, message=message))
+            if wanted - {IN_APP}:
+                outbound.append({
+                    "user_id": user_id, "kind": kind, "message": message,
+                    "channels": sorted(wanted - {IN_APP}),
+                })
+
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(rows, batch_size=500)
+        _increment(Counter(row.user_id for row in rows))
+    if outbound:
+        notifications_dispatched.send(sender=Notification, messages=outbound)
+    return created
+
+
+def _increment(counts):
+    if not counts:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in counts], ignore_conflicts=True
+    )
+    # One UPDATE per distinct increment rather than per user.
+    by_amount = defaultdict(list)
+    for user_id, n in counts.items():
+        by_amount[n].append(user_id)
+    for n, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F("unread") + n)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list("unread", flat=True).first() or 0
+
+
+def mark_read(user, ids=None):
+    """Mark the user's unread notifications (optionally only ``ids``) read. Returns how many changed."""
+    qs = Notification.objects.filter(user=user, read=False)
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    with transaction.atomic():
+        changed = qs.update(read=True)
+        if changed:
+            NotificationCounter.objects.filter(user=user).update(unread=Greatest(F("unread") - changed, 0))
+    return changed
+
+
+def discount(user_id, n=1):
+    """Drop ``n`` from a user's unread total (an unread notification was deleted)."""
+    NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F("unread") - n, 0))
+
+
+def recount(user_ids=None):
+    """Rebuild counters from the notifications table, e.g. after manual edits."""
+    qs = Notification.objects.filter(read=False)
+    counters = NotificationCounter.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        counters.update(unread=0)
+        _increment(Counter(qs.values_list("user_id", flat=True)))
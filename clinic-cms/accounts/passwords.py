@@ -0,0 +1,159 @@
+"""
+Password hashing off the request threads, with admission control.
+
+Hashing and verifying run on a bounded per-process thread pool
+(PBKDF2 and Argon2 both release the GIL, so threads use every core). At
+most ``PASSWORD_HASH_WORKERS`` hashes run at once and at most
+``PASSWORD_HASH_QUEUE`` more wait; a login that cannot get a slot within
+``ADMISSION_WAIT`` seconds is turned away with 429 and ``Retry-After``
+instead of piling onto a saturated CPU during a login spike.
+
+The hasher for new hashes is ``settings.PASSWORD_HASHER`` ("pbkdf2" or
+"argon2", which needs argon2-cffi) with cost parameters from settings;
+``manage.py benchmark_passwords`` measures logins/sec per core and
+suggests parameters for a target latency. A password stored with another
+hasher or older parameters is rehashed after a successful login, on the
+pool and after the response is produced, so the login does not pay for
+the upgrade.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.backends import ModelBackend
+from django.db import close_old_connections
+from rest_framework.exceptions import Throttled
+
+from . import metrics
+from .models import User
+
+ADMISSION_WAIT = 2.0       # seconds a login waits for a hashing slot
+RETRY_AFTER = 1            # seconds suggested to a rejected client
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with ``settings.PASSWORD_PBKDF2_ITERATIONS``."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with ``settings.PASSWORD_ARGON2`` {time_cost, memory_cost, parallelism}."""
+
+    def _param(self, name):
+        return getattr(settings, "PASSWORD_ARGON2", {}).get(name, getattr(hashers.Argon2PasswordHasher, name))
+
+    time_cost = property(lambda self: self._param("time_cost"))
+    memory_cost = property(lambda self: self._param("memory_cost"))
+    parallelism = property(lambda self: self._param("parallelism"))
+
+
+class HashPoolBusy(Throttled):
+    default_detail = "Too many sign-ins in progress, please retry shortly."
+
+
+# -----------------------------
+# Pool
+# -----------------------------
+class HashPool:
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _submit(self, fn, args):
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, fn, *args, wait=ADMISSION_WAIT):
+        """Run ``fn(*args)`` on the pool and return its result, or raise HashPoolBusy."""
+        if not self.slots.acquire(timeout=wait):
+            metrics.inc("password_hash_rejected_total")
+            raise HashPoolBusy(wait=RETRY_AFTER)
+        return self._submit(fn, args).result()
+
+    def submit(self, fn, *args):
+        """Fire and forget; dropped when the pool is full (a rehash is retried at the next login)."""
+        if self.slots.acquire(blocking=False):
+            self._submit(fn, args)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    """The process's pool, created lazily (and again after a fork)."""
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                workers = getattr(settings, "PASSWORD_HASH_WORKERS", 0) or os.cpu_count() or 1
+                _pool = HashPool(workers, getattr(settings, "PASSWORD_HASH_QUEUE", 4 * workers))
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _timed(operation, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        metrics.observe("password_hash_seconds", time.perf_counter() - started, operation=operation)
+
+
+# -----------------------------
+# API
+# -----------------------------
+def make_password(raw_password):
+    return pool().run(_timed, "hash", hashers.make_password, raw_password)
+
+
+def set_password(user, raw_password):
+    """``user.set_password()`` with the hashing done on the pool."""
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """Verify ``raw_password`` for ``user``; an outdated hash is upgraded in the background."""
+    encoded = user.password
+    correct, must_update = pool().run(_timed, "verify", hashers.verify_password, raw_password, encoded)
+    if correct and must_update:
+        pool().submit(_rehash, user.pk, raw_password, encoded)
+    return correct
+
+
+def _rehash(user_id, raw_password, old_encoded):
+    try:
+        new_encoded = _timed("rehash", hashers.make_password, raw_password)
+        # Only if the password was not changed in the meantime.
+        User.objects.filter(pk=user_id, password=old_encoded).update(password=new_encoded)
+    finally:
+        close_old_connections()
+
+
+class PooledModelBackend(ModelBackend):
+    """``ModelBackend`` whose password check runs on the hashing pool."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway so a missing user is not told apart by timing.
+            make_password(password)
+            return None
+        if check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
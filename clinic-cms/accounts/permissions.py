@@ -92,6 +92,20 @@ class IsLab(BasePermission):
             and request.user.role == Roles.LAB
         )
 
+# =========================================================
+# Clinic staff (any non-patient role)
+# =========================================================
+class IsClinicStaff(BasePermission):
+    """
+    Allows access to every staff role, i.e. anyone who is not a PATIENT.
+    """
+    def has_permission(self, request, view):
+        return (
+            request.user
+            and request.user.is_authenticated
+            and request.user.role != Roles.PATIENT
+        )
+
 # =========================================================
 # Read-only permission (safe methods only)
 # =========================================================
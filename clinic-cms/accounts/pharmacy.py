@@ -0,0 +1,165 @@
+"""
+Pharmacy dispensing queue.
+
+The queue is every prescription still to be dispensed, most urgent first
+and oldest first within a priority. It is read in one query: a range scan
+on the ``(status, priority, created_at)`` index joined to the patient,
+the prescriber and the claimant.
+
+A pharmacist claims a batch before preparing it so two pharmacists don't
+prepare the same prescription, then dispenses it. Both are compare-and-set
+UPDATEs whose WHERE clause repeats the state the rows must be in, the
+same approach as the appointment transitions. Rows that changed in the
+meantime are not touched and are reported back as skipped. A claim
+older than ``CLAIM_TIMEOUT`` is treated as abandoned, and anyone may take
+it over or dispense it.
+
+Each claim, release and dispense is counted per pharmacist in /metrics,
+and ``throughput()`` reports dispensed counts and turnaround per
+pharmacist from the ``dispensed_at`` index.
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+
+from . import charts, metrics
+from .models import Prescription
+
+CLAIM_TIMEOUT = timedelta(minutes=30)
+QUEUE_LIMIT = 200
+THROUGHPUT_HOURS = 8
+
+OPEN = [Prescription.PENDING, Prescription.CLAIMED]
+
+FIELDS = (
+    "id", "status", "priority", "medication_name", "dosage", "duration", "notes", "created_at",
+    "claimed_by_id", "claimed_by__username", "claimed_at",
+    "patient_id", "patient__ward", "patient__user__first_name", "patient__user__last_name",
+    "patient__user__username",
+    "prescribed_by__first_name", "prescribed_by__last_name", "prescribed_by__username",
+)
+
+
+def _name(first_name, last_name, username):
+    return f"{first_name or ''} {last_name or ''}".strip() or username
+
+
+def _claimable(now):
+    return Q(status=Prescription.PENDING) | Q(status=Prescription.CLAIMED, claimed_at__lt=now - CLAIM_TIMEOUT)
+
+
+# -----------------------------
+# Queue
+# -----------------------------
+def queue(now=None, limit=QUEUE_LIMIT):
+    """Open prescriptions by priority then age, with who (if anyone) is working on each."""
+    now = now or timezone.now()
+    rows = (
+        Prescription.objects.filter(status__in=OPEN)
+        .order_by("-priority", "created_at", "id")
+        .values_list(*FIELDS)[:limit]
+    )
+    items = []
+    for (pk, status, priority, medication, dosage, duration, notes, created_at,
+         claimed_by, claimed_by_username, claimed_at,
+         patient_id, ward, patient_first, patient_last, patient_username, *prescriber) in rows:
+        claimed = status == Prescription.CLAIMED and claimed_at >= now - CLAIM_TIMEOUT
+        items.append({
+            "id": pk,
+            "priority": priority,
+            "medication_name": medication,
+            "dosage": dosage,
+            "duration": duration,
+            "notes": notes,
+            "created_at": created_at,
+            "waiting_minutes": int((now - created_at).total_seconds() // 60),
+            "patient": patient_id,
+            "patient_name": _name(patient_first, patient_last, patient_username),
+            "ward": ward,
+            "prescribed_by": _name(*prescriber) if prescriber[2] else None,
+            "claimed_by": claimed_by if claimed else None,
+            "claimed_by_username": claimed_by_username if claimed else None,
+            "claimed_at": claimed_at if claimed else None,
+        })
+    return items
+
+
+# -----------------------------
+# Transitions
+# -----------------------------
+def _changed(ids, action, pharmacist, **marker):
+    """Ids among ``ids`` that the update just made (identified by ``marker``)."""
+    done = list(Prescription.objects.filter(pk__in=ids, **marker).values_list("pk", flat=True))
+    if done:
+        metrics.inc("prescriptions_processed_total", len(done), action=action, pharmacist=pharmacist.username)
+    return done
+
+
+def claim(ids, pharmacist, now=None):
+    """Claim the pending (or abandoned) prescriptions among ``ids``; returns the ids claimed."""
+    now = now or timezone.now()
+    Prescription.objects.filter(_claimable(now), pk__in=ids).update(
+        status=Prescription.CLAIMED, claimed_by=pharmacist, claimed_at=now, updated_at=now,
+    )
+    return _changed(ids, "claim", pharmacist, status=Prescription.CLAIMED, claimed_by=pharmacist, claimed_at=now)
+
+
+def release(ids, pharmacist, now=None):
+    """Put ``pharmacist``'s claims among ``ids`` back in the queue; returns the ids released."""
+    now = now or timezone.now()
+    mine = Prescription.objects.filter(pk__in=ids, status=Prescription.CLAIMED, claimed_by=pharmacist)
+    released = list(mine.values_list("pk", flat=True))
+    if released:
+        # Only the claimant changes a live claim, so these are still ours.
+        mine.filter(pk__in=released).update(
+            status=Prescription.PENDING, claimed_by=None, claimed_at=None, updated_at=now,
+        )
+        metrics.inc("prescriptions_processed_total", len(released), action="release", pharmacist=pharmacist.username)
+    return released
+
+
+def dispense(ids, pharmacist, now=None):
+    """
+    Dispense the prescriptions among ``ids`` that are pending, claimed by
+    ``pharmacist`` or abandoned; returns the ids dispensed.
+    """
+    now = now or timezone.now()
+    updated = Prescription.objects.filter(
+        _claimable(now) | Q(status=Prescription.CLAIMED, claimed_by=pharmacist), pk__in=ids,
+    ).update(status=Prescription.DISPENSED, dispensed_by=pharmacist, dispensed_at=now, updated_at=now)
+    if not updated:
+        return []
+    done = _changed(ids, "dispense", pharmacist, status=Prescription.DISPENSED, dispensed_by=pharmacist, dispensed_at=now)
+    # Dispensed prescriptions drop off the chart's active list.
+    charts.rows_changed(Prescription.objects.filter(pk__in=done))
+    return done
+
+
+# -----------------------------
+# Throughput
+# -----------------------------
+def throughput(hours=THROUGHPUT_HOURS, now=None):
+    """Per pharmacist over the last ``hours``: prescriptions dispensed and mean minutes since prescribing."""
+    now = now or timezone.now()
+    rows = (
+        Prescription.objects.filter(dispensed_at__gte=now - timedelta(hours=hours), dispensed_at__lte=now)
+        .values("dispensed_by_id", "dispensed_by__username")
+        .annotate(dispensed=Count("id"), turnaround=Avg(F("dispensed_at") - F("created_at")))
+        .order_by("-dispensed", "dispensed_by__username")
+    )
+    return {
+        "hours": hours,
+        "pharmacists": [
+            {
+                "pharmacist": row["dispensed_by_id"],
+                "username": row["dispensed_by__username"],
+                "dispensed": row["dispensed"],
+                "per_hour": round(row["dispensed"] / hours, 2),
+                "avg_turnaround_minutes": (
+                    round(row["turnaround"].total_seconds() / 60, 1) if row["turnaround"] is not None else None
+                ),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,232 @@
+"""
+Row-level policies: which rows of a model each role may see, and which of
+those it may act on.
+
+``POLICIES`` maps a model label to {role: rule}. A rule is ``ALL`` (every
+row), ``NONE`` (no rows) or a tuple of lookup paths that each lead,
+through forward foreign keys only, to a ``User``; a row is visible when
+any of them is the requesting user. Paths are applied as joins in the
+list query itself (``patient__user=<id>``), so no profile row is fetched
+first. Roles left out get ``NONE``.
+
+``OWNERSHIP`` adds, per viewset action, a rule of the same form that must
+also hold for the row (a doctor approves only their own appointments).
+It is folded into the fetch as well: ``fetch()`` loads the row with the
+predicate as a computed column, so one query tells a missing or hidden
+row (404) from one the user may see but not act on (403), and
+``owned()`` narrows a queryset for compare-and-set UPDATEs.
+
+Each rule is checked and compiled once per process, on first use.
+``PolicyQuerysetMixin`` applies both to a viewset.
+"""
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ObjectDoesNotExist, PermissionDenied
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.http import Http404
+from rest_framework.generics import get_object_or_404
+
+from .models import Roles
+
+ALL = "all"
+NONE = "none"
+
+EVERYONE = {role: ALL for role in Roles.values}
+STAFF = {role: ALL for role in Roles.values if role != Roles.PATIENT}
+
+POLICIES = {
+    "accounts.Appointment": {
+        Roles.PATIENT: ("patient__user",),
+        Roles.DOCTOR: ("doctor",),
+        Roles.ADMIN: ALL,
+        Roles.RECEPTIONIST: ALL,
+        Roles.NURSE: ALL,
+    },
+    "accounts.MedicalRecord": {
+        **EVERYONE,
+        Roles.PATIENT: ("patient__user",),
+        Roles.DOCTOR: ("patient__assigned_doctor",),
+        Roles.LAB: ("created_by",),
+        Roles.RECEPTIONIST: NONE,
+    },
+    "accounts.Prescription": {
+        **EVERYONE,
+        Roles.PATIENT: ("patient__user",),
+        Roles.DOCTOR: ("patient__assigned_doctor",),
+    },
+    "accounts.LabResult": {
+        **EVERYONE,
+        Roles.PATIENT: ("patient__user",),
+        Roles.LAB: ("created_by",),
+        Roles.RECEPTIONIST: NONE,
+    },
+    "accounts.Patient": EVERYONE,
+    "billing.Invoice": {
+        Roles.PATIENT: ("patient__user",),
+        Roles.DOCTOR: ("doctor",),
+        Roles.ADMIN: ALL,
+        Roles.RECEPTIONIST: ALL,
+    },
+}
+
+# model label -> {viewset action: {role: rule}}. Actions not listed only
+# need the row to be visible.
+OWNERSHIP = {
+    "accounts.Appointment": {
+        action: {Roles.DOCTOR: ("doctor",)} for action in ("approve", "decline", "complete")
+    },
+    "accounts.MedicalRecord": {
+        "create": {
+            Roles.DOCTOR: ("patient__assigned_doctor",),
+            Roles.LAB: ALL,
+            Roles.ADMIN: ALL,
+            Roles.NURSE: ALL,
+        },
+        **{
+            action: {**EVERYONE, Roles.DOCTOR: ("patient__assigned_doctor",)}
+            for action in ("update", "partial_update")
+        },
+    },
+    "accounts.Patient": {action: STAFF for action in ("admit", "discharge", "attend")},
+    "billing.Invoice": {"mark_as_paid": {Roles.ADMIN: ALL, Roles.RECEPTIONIST: ALL}},
+}
+
+_compiled = {}
+
+
+def _check_path(model, path):
+    """A path must follow single-valued forward relations and end at the user model."""
+    User = apps.get_model("accounts", "User")
+    current = model
+    for name in path.split("__"):
+        try:
+            field = current._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"Policy path {path!r} on {model.__name__}: no field {name!r}")
+        if not (field.many_to_one or field.one_to_one) or field.auto_created:
+            raise ImproperlyConfigured(f"Policy path {path!r} on {model.__name__}: {name!r} is not a forward FK")
+        current = field.related_model
+    if current is not User:
+        raise ImproperlyConfigured(f"Policy path {path!r} on {model.__name__} does not end at User")
+
+
+def compile_rule(model, role, action=None):
+    """
+    ALL, NONE, or a tuple of lookups ``"<path>_id"`` to compare with the
+    user's id: the visibility rule, or with ``action`` the ownership rule.
+    """
+    key = (model._meta.label, role, action)
+    rule = _compiled.get(key)
+    if rule is None:
+        if action is None:
+            rules = POLICIES.get(model._meta.label)
+            if rules is None:
+                raise ImproperlyConfigured(f"No row-level policy for {model._meta.label}")
+        else:
+            rules = OWNERSHIP.get(model._meta.label, {}).get(action, EVERYONE)
+        rule = rules.get(role, NONE)
+        if rule not in (ALL, NONE):
+            for path in rule:
+                _check_path(model, path)
+            rule = tuple(f"{path}_id" for path in rule)
+        _compiled[key] = rule
+    return rule
+
+
+def _as_q(rule, user):
+    if rule == ALL:
+        return Q()
+    if rule == NONE:
+        return Q(pk__in=[])
+    q = Q()
+    for lookup in rule:
+        q |= Q(**{lookup: user.pk})
+    return q
+
+
+def visible(model, user, action=None):
+    """
+    Q for the ``model`` rows ``user`` may see (empty Q when all are visible),
+    or with ``action`` the rows it may apply that action to.
+    """
+    return _as_q(compile_rule(model, getattr(user, "role", None), action), user)
+
+
+def scope(queryset, user):
+    return queryset.filter(visible(queryset.model, user))
+
+
+# -----------------------------
+# Ownership checks
+# -----------------------------
+def pk_or_404(value):
+    """A URL's pk as an int; Http404 for anything else, as get_object_or_404 would."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def owned(queryset, user, action):
+    """``queryset`` narrowed to the rows ``user`` may apply ``action`` to."""
+    return queryset.filter(visible(queryset.model, user, action))
+
+
+def fetch(queryset, user, action, **lookup):
+    """
+    The row matching ``lookup`` in ``queryset``, loaded in one query that
+    also evaluates the ownership rule for ``action``. Raises Http404 when
+    there is no such row and PermissionDenied when the rule does not hold.
+    """
+    rule = compile_rule(queryset.model, getattr(user, "role", None), action)
+    if rule in (ALL, NONE):
+        is_owner = Value(rule == ALL)
+    else:
+        is_owner = ExpressionWrapper(_as_q(rule, user), output_field=BooleanField())
+    obj = get_object_or_404(queryset.annotate(policy_owner=is_owner), **lookup)
+    if not obj.policy_owner:
+        raise PermissionDenied("You do not have permission to perform this action.")
+    return obj
+
+
+def _owner_id(obj, lookup):
+    *hops, attname = lookup.split("__")
+    for name in hops:
+        try:
+            obj = getattr(obj, name)
+        except ObjectDoesNotExist:
+            return None
+        if obj is None:
+            return None
+    return getattr(obj, attname)
+
+
+def permits(obj, user, action):
+    """
+    Whether ``user`` may apply ``action`` to the in-memory ``obj``, e.g. a
+    row about to be created. Follows relations already set on ``obj``, so a
+    one-hop rule compares a foreign key id without a query.
+    """
+    rule = compile_rule(type(obj), getattr(user, "role", None), action)
+    if rule in (ALL, NONE):
+        return rule == ALL
+    return any(_owner_id(obj, lookup) == user.pk for lookup in rule)
+
+
+class PolicyQuerysetMixin:
+    """
+    ``get_queryset()`` narrowed to the rows the requesting user's role may
+    see; ``get_object()`` also enforces the ``OWNERSHIP`` rule of the action.
+    """
+
+    def get_queryset(self):
+        return scope(super().get_queryset(), self.request.user)
+
+    def get_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if compile_rule(queryset.model, getattr(self.request.user, "role", None), self.action) == ALL:
+            return super().get_object()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = fetch(queryset, self.request.user, self.action,
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,164 @@
+"""
+Per-request query profiling (opt-in via ``settings.QUERY_PROFILING``).
+
+``QueryProfilingMiddleware`` wraps every database call made while a request
+is handled and records the query count, total DB time, repeated query
+fingerprints (the signature of an N+1 loop), time spent producing
+``serializer.data`` and the response size. Each record is returned to the
+client as a ``Server-Timing`` header, logged, and kept in a per-process ring
+buffer that ``/api/_perf/`` aggregates into a worst-endpoints report.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+BUFFER_SIZE = 2000
+SLOW_MS = 500
+MANY_QUERIES = 50
+DUPLICATE_MIN = 3          # the same fingerprint this often in one request is reported
+SORT_KEYS = ("queries", "time", "db")
+
+IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def fingerprint(sql):
+    """Query shape without parameters; IN lists of any length collapse together."""
+    return IN_LIST_RE.sub("IN (...)", sql)
+
+
+# -----------------------------
+# Per-request collection
+# -----------------------------
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [(sql, n) for sql, n in self.fingerprints.most_common(5) if n >= DUPLICATE_MIN]
+
+
+_local = threading.local()
+
+
+def current():
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def profiling(profile):
+    _local.profile = profile
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield profile
+    finally:
+        _local.profile = None
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """
+    Time the outermost ``serializer.data`` evaluation in each request.
+    Patched onto DRF's BaseSerializer once, and only when profiling is on.
+    """
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data.fget
+
+    def timed_data(self):
+        profile = current()
+        if profile is None or profile.serializer_depth:
+            return original(self)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            profile.serializer_seconds += time.perf_counter() - started
+            profile.serializer_depth -= 1
+
+    BaseSerializer.data = property(timed_data)
+    _serializer_timing_installed = True
+
+
+# -----------------------------
+# Ring buffer and report
+# -----------------------------
+class PerfLog:
+    """The last ``size`` request records of this process."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self.records = deque(maxlen=size)
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def report(self, sort="queries", limit=20):
+        with self._lock:
+            records = list(self.records)
+        by_route = defaultdict(list)
+        for record in records:
+            by_route[(record["method"], record["route"])].append(record)
+
+        rows = []
+        for (method, route), group in by_route.items():
+            totals = sorted(r["total_ms"] for r in group)
+            worst = max(group, key=lambda r: r["queries"])
+            duplicates = Counter()
+            for r in group:
+                for sql, n in r["duplicates"]:
+                    duplicates[sql] = max(duplicates[sql], n)
+            rows.append({
+                "method": method,
+                "route": route,
+                "requests": len(group),
+                "avg_queries": round(sum(r["queries"] for r in group) / len(group), 1),
+                "max_queries": worst["queries"],
+                "worst_path": worst["path"],
+                "avg_db_ms": round(sum(r["db_ms"] for r in group) / len(group), 1),
+                "avg_serializer_ms": round(sum(r["serializer_ms"] for r in group) / len(group), 1),
+                "p50_ms": totals[len(totals) // 2],
+                "p95_ms": totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+                "avg_response_bytes": int(sum(r["response_bytes"] for r in group) / len(group)),
+                "duplicate_queries": [{"sql": sql, "count": n} for sql, n in duplicates.most_common(3)],
+            })
+        key = {
+            "queries": lambda row: row["avg_queries"],
+            "time": lambda row: row["p95_ms"],
+            "db": lambda row: row["avg_db_ms"],
+        }[sort]
+        rows.sort(key=key, reverse=True)
+        return {"requests_sampled": len(records), "endpoints": rows[:limit]}
+
+
+perf_log = PerfLog()
@@ -0,0 +1,150 @@
+"""
+Appointment reminders.
+
+Each configured window (``settings.APPOINTMENT_REMINDER_WINDOWS``, e.g. 24h
+and 2h before the slot) keeps a ``ReminderCursor`` watermark. A run only
+range-scans accepted appointments whose ``(date, time)`` falls between the
+watermark and ``now + window`` (served by the partial ``(date, time)``
+index), so each appointment is read roughly once per window however often
+the scheduler runs. Appointments that became eligible behind the watermark
+(booked or accepted since the last run) are picked up by a second, narrow
+query.
+
+``AppointmentReminder`` marks what has been sent; the cursor row is locked
+for the duration of a run, so concurrent schedulers cannot double-send.
+Reminders go out through the notification pipeline, which honours each
+patient's channel preferences.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import notifications
+from .models import Appointment, AppointmentReminder, ReminderCursor
+from .transitions import spellings
+
+DEFAULT_WINDOWS = {"24h": 24, "2h": 2}
+# Rows committed just after a run can carry a timestamp from before it, so
+# the "changed since last run" check looks back a little further; the sent
+# markers make the overlap harmless.
+LATE_GRACE = timedelta(minutes=5)
+FIELDS = (
+    "id", "date", "time", "patient__user_id", "doctor__first_name", "doctor__last_name", "doctor__username",
+)
+
+
+def windows():
+    """{name: timedelta}, largest first."""
+    hours = getattr(settings, "APPOINTMENT_REMINDER_WINDOWS", DEFAULT_WINDOWS)
+    return dict(sorted(((name, timedelta(hours=h)) for name, h in hours.items()), key=lambda item: -item[1]))
+
+
+def _local(moment):
+    """Appointment date/time columns are naive clinic-local time."""
+    return timezone.localtime(moment).replace(tzinfo=None)
+
+
+def slot_range(start, end):
+    """Q for appointments whose (date, time) is in (start, end], as an index range."""
+    start, end = _local(start), _local(end)
+    if start >= end:
+        return Q(pk__in=[])
+    d0, t0, d1, t1 = start.date(), start.time(), end.date(), end.time()
+    if d0 == d1:
+        return Q(date=d0, time__gt=t0, time__lte=t1)
+    return Q(date=d0, time__gt=t0) | Q(date__gt=d0, date__lt=d1) | Q(date=d1, time__lte=t1)
+
+
+def starts_at(date, time):
+    return timezone.make_aware(datetime.combine(date, time))
+
+
+# -----------------------------
+# Scheduling
+# -----------------------------
+def run(now=None):
+    """Send every reminder that has come due. Returns {window: reminders sent}."""
+    now = now or timezone.now()
+    spans = list(windows().items())
+    results = {}
+    with notifications.batch():
+        for i, (name, window) in enumerate(spans):
+            # A slot already inside the next smaller window only gets that
+            # window's reminder, not both at once.
+            floor = now + spans[i + 1][1] if i + 1 < len(spans) else now
+            results[name] = _run_window(name, window, now, floor)
+    return results
+
+
+def _run_window(name, window, now, floor):
+    ReminderCursor.objects.get_or_create(window=name, defaults={"scanned_until": now, "last_run_at": now})
+    with transaction.atomic():
+        cursor = ReminderCursor.objects.select_for_update().get(pk=name)
+        lower, upper = max(cursor.scanned_until, floor), now + window
+        accepted = Appointment.objects.filter(status__in=spellings("ACCEPTED"))
+
+        rows = {row[0]: row for row in accepted.filter(slot_range(lower, upper)).values_list(*FIELDS)}
+        changed_since = cursor.last_run_at - LATE_GRACE
+        late = accepted.filter(slot_range(floor, lower)).filter(
+            Q(created_at__gte=changed_since)
+            | Q(transitions__created_at__gte=changed_since, transitions__to_status="ACCEPTED")
+        )
+        rows.update((row[0], row) for row in late.values_list(*FIELDS).distinct())
+
+        sent = set(
+            AppointmentReminder.objects.filter(window=name, appointment_id__in=rows)
+            .values_list("appointment_id", flat=True)
+        )
+        due = [row for pk, row in rows.items() if pk not in sent]
+        AppointmentReminder.objects.bulk_create(
+            [AppointmentReminder(appointment_id=row[0], window=name) for row in due], batch_size=1000
+        )
+        lags = []
+        for pk, date, time, patient_user_id, first_name, last_name, username in due:
+            doctor = f"{first_name} {last_name}".strip() or username
+            notifications.emit(
+                "appointment_reminder", [patient_user_id],
+                f"Reminder: your appointment with Dr. {doctor} is on {date} at {time:%H:%M}",
+            )
+            lags.append(max((now - (starts_at(date, time) - window)).total_seconds(), 0.0))
+
+        cursor.scanned_until = max(cursor.scanned_until, upper)
+        cursor.last_run_at = now
+        cursor.last_batch = len(due)
+        cursor.max_lag_seconds = round(max(lags, default=0.0), 1)
+        cursor.avg_lag_seconds = round(sum(lags) / len(lags), 1) if lags else 0.0
+        cursor.save()
+    return len(due)
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+def stats():
+    """
+    Per-window scheduler health. ``seconds_since_run`` shows a stalled
+    scheduler; the lag figures are how long after the ideal moment
+    (slot start minus window) the last batch of reminders went out.
+    """
+    now = timezone.now()
+    since = now - timedelta(days=1)
+    sent_today = dict(
+        AppointmentReminder.objects.filter(created_at__gte=since).values_list("window")
+        .annotate(n=Count("id"))
+    )
+    return [
+        {
+            "window": cursor.window,
+            "last_run_at": cursor.last_run_at,
+            "seconds_since_run": round((now - cursor.last_run_at).total_seconds(), 1),
+            "scanned_until": cursor.scanned_until,
+            "last_batch": cursor.last_batch,
+            "max_lag_seconds": cursor.max_lag_seconds,
+            "avg_lag_seconds": cursor.avg_lag_seconds,
+            "sent_last_24h": sent_today.get(cursor.window, 0),
+        }
+        for cursor in ReminderCursor.objects.order_by("window")
+    ]
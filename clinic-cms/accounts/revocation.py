@@ -0,0 +1,178 @@
+"""
+JWT revocation (logout, refresh-token rotation).
+
+Revoked token ids are stored in ``RevokedToken`` until the token would have
+expired anyway. Every process mirrors the live ones in memory, so
+``is_revoked()`` is a dictionary lookup rather than a database round trip:
+
+* Sync: each revocation bumps ``RevocationCounter.version`` and stamps its
+  row with the new value in the same transaction. A process reads the
+  counter at most every ``SYNC_INTERVAL`` seconds and, when it has moved,
+  loads only the rows newer than the version it has seen. The counter row
+  stays locked until commit, so versions become visible in order and no
+  revocation is skipped.
+* Size: past ``MAX_EXACT`` live entries a process stops keeping the exact
+  set and keeps only a Bloom filter (a few bytes per entry). A lookup
+  that hits the filter, i.e. a revoked token or a rare false positive, is
+  confirmed against the table.
+* Compaction: expired entries are dropped from memory every
+  ``COMPACT_INTERVAL`` seconds, rebuilding the filter, and deleted from the
+  table by ``compact()``, which the worker maintenance loop runs.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevocationCounter, RevokedToken
+
+SYNC_INTERVAL = 1.0        # seconds between counter reads per process
+COMPACT_INTERVAL = 300     # seconds between in-memory compactions
+MAX_EXACT = 200_000        # live entries kept as an exact set
+BLOOM_CAPACITY = 10_000    # minimum filter size, in entries
+BLOOM_ERROR = 0.001
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=BLOOM_ERROR):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+# -----------------------------
+# Per-process mirror
+# -----------------------------
+class RevocationList:
+    def __init__(self):
+        self._sync_lock = threading.Lock()
+        self._lock = threading.RLock()     # guards entries/bloom; lookups read without it
+        self.reset()
+
+    def reset(self):
+        self.version = 0
+        self.entries = {}          # jti -> expiry (epoch seconds); None once over MAX_EXACT
+        self.bloom = BloomFilter(BLOOM_CAPACITY)
+        self.next_sync = 0.0
+        self.next_compact = time.monotonic() + COMPACT_INTERVAL
+
+    def is_revoked(self, jti):
+        self.sync()
+        entries = self.entries
+        if entries is not None:
+            return jti in entries
+        return jti in self.bloom and RevokedToken.objects.filter(jti=jti).exists()
+
+    def add(self, jti, expires):
+        with self._lock:
+            if self.entries is not None:
+                if len(self.entries) >= MAX_EXACT:
+                    self.entries = None
+                else:
+                    self.entries[jti] = expires
+            if self.bloom.count >= self.bloom.capacity:
+                self._rebuild()
+            else:
+                self.bloom.add(jti)
+
+    def sync(self):
+        now = time.monotonic()
+        if now < self.next_sync or not self._sync_lock.acquire(blocking=False):
+            return  # recently synced, or another thread is syncing right now
+        try:
+            self.next_sync = now + SYNC_INTERVAL
+            version = RevocationCounter.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+            if version < self.version:
+                with self._lock:
+                    self.reset()  # table was reset (tests, restore)
+            if version > self.version:
+                rows = RevokedToken.objects.filter(
+                    version__gt=self.version, version__lte=version, expires_at__gt=timezone.now(),
+                ).values_list("jti", "expires_at")
+                for jti, expires_at in rows.iterator():
+                    self.add(jti, expires_at.timestamp())
+                self.version = version
+            if now >= self.next_compact:
+                self.next_compact = now + COMPACT_INTERVAL
+                with self._lock:
+                    self._rebuild()
+        finally:
+            self._sync_lock.release()
+
+    def _rebuild(self):
+        """Drop expired entries and size a fresh filter for what is left."""
+        now = time.time()
+        if self.entries is not None:
+            self.entries = {jti: exp for jti, exp in self.entries.items() if exp > now}
+            live = list(self.entries)
+        else:
+            live = list(RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list("jti", flat=True))
+            if len(live) < MAX_EXACT // 2:
+                expiry = RevokedToken.objects.filter(jti__in=live).values_list("jti", "expires_at")
+                self.entries = {jti: exp.timestamp() for jti, exp in expiry.iterator()}
+        bloom = BloomFilter(max(BLOOM_CAPACITY, 2 * len(live)))
+        for jti in live:
+            bloom.add(jti)
+        self.bloom = bloom
+
+
+revocation_list = RevocationList()
+
+
+# -----------------------------
+# API
+# -----------------------------
+def is_revoked(token):
+    return revocation_list.is_revoked(token.get(api_settings.JTI_CLAIM))
+
+
+def revoke(*tokens):
+    """Revoke validated simplejwt tokens. Takes effect in this process at once, elsewhere within SYNC_INTERVAL."""
+    if not tokens:
+        return
+    with transaction.atomic():
+        RevocationCounter.objects.filter(pk=1).update(version=F("version") + 1)
+        version = RevocationCounter.objects.values_list("version", flat=True).get(pk=1)
+        RevokedToken.objects.bulk_create(
+            [
+                RevokedToken(
+                    jti=token[api_settings.JTI_CLAIM],
+                    user_id=token.get(api_settings.USER_ID_CLAIM),
+                    token_type=token.get(api_settings.TOKEN_TYPE_CLAIM, ""),
+                    version=version,
+                    expires_at=datetime_from_epoch(token["exp"]),
+                )
+                for token in tokens
+            ],
+            ignore_conflicts=True,
+        )
+        entries = [(token[api_settings.JTI_CLAIM], token["exp"]) for token in tokens]
+        transaction.on_commit(lambda: [revocation_list.add(jti, exp) for jti, exp in entries])
+
+
+def compact():
+    """Delete revocations of tokens that have expired anyway. Returns the number removed."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
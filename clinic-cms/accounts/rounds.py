@@ -0,0 +1,82 @@
+"""
+Medication rounds.
+
+A round is the medications not yet given whose ``scheduled_time`` falls
+in a window around now, optionally for one ward. It is a range scan on the
+``(administered, scheduled_time)`` index, joined to the patient for the
+ward, so a nurse loads the few dozen doses that matter rather than every
+dose ever scheduled. The window reaches back ``LOOKBACK_HOURS`` so missed
+doses stay on the list for a shift; doses more than ``GRACE`` past their
+time are overdue.
+
+``administer()`` marks a batch given in one conditional UPDATE. Doses
+already given (by another nurse, a moment earlier) are left untouched and
+reported as skipped.
+
+The plain medication list uses ``recent()``, a rolling window of
+``LIST_WINDOW`` either side of now, for the same reason.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Medication
+
+LOOKBACK_HOURS = 12
+LOOKAHEAD_HOURS = 2
+GRACE = timedelta(minutes=30)
+MAX_HOURS = 24
+LIST_WINDOW = timedelta(hours=24)
+
+FIELDS = (
+    "id", "name", "dosage", "scheduled_time", "patient_id", "patient__ward",
+    "patient__user__first_name", "patient__user__last_name", "patient__user__username",
+)
+
+
+def state(scheduled_time, now):
+    if scheduled_time < now - GRACE:
+        return "overdue"
+    if scheduled_time <= now + GRACE:
+        return "due"
+    return "upcoming"
+
+
+def due(ward=None, now=None, lookback_hours=LOOKBACK_HOURS, lookahead_hours=LOOKAHEAD_HOURS):
+    """Doses not yet given, scheduled in [now - lookback, now + lookahead), oldest first."""
+    now = now or timezone.now()
+    qs = Medication.objects.filter(
+        administered=False,
+        scheduled_time__gte=now - timedelta(hours=lookback_hours),
+        scheduled_time__lt=now + timedelta(hours=lookahead_hours),
+    )
+    if ward:
+        qs = qs.filter(patient__ward=ward)
+    doses = []
+    for pk, name, dosage, at, patient_id, patient_ward, first_name, last_name, username in (
+        qs.order_by("scheduled_time", "id").values_list(*FIELDS)
+    ):
+        doses.append({
+            "id": pk,
+            "name": name,
+            "dosage": dosage,
+            "scheduled_time": at,
+            "state": state(at, now),
+            "patient": patient_id,
+            "patient_name": f"{first_name} {last_name}".strip() or username,
+            "ward": patient_ward,
+        })
+    return doses
+
+
+def administer(ids, at=None):
+    """Mark the doses ``ids`` as given at ``at`` (now). Returns how many were marked."""
+    return Medication.objects.filter(pk__in=ids, administered=False).update(
+        administered=True, administered_at=at or timezone.now(),
+    )
+
+
+def recent(queryset, now=None):
+    """``queryset`` limited to doses scheduled within LIST_WINDOW of now."""
+    now = now or timezone.now()
+    return queryset.filter(scheduled_time__gte=now - LIST_WINDOW, scheduled_time__lt=now + LIST_WINDOW)
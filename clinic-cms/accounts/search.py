@@ -0,0 +1,286 @@
+"""
+Full-text search over patients and clinical records.
+
+Searchable rows are denormalized into ``SearchDocument`` (kept current by the
+signal handlers in ``accounts.signals``). On PostgreSQL the table carries a
+generated ``tsvector`` column with a GIN index and ranking is done with
+``ts_rank``. On other backends (SQLite in development) an in-process inverted
+index with BM25 ranking is used instead; it syncs incrementally from
+``SearchDocument.updated_at`` so it never rescans the whole table.
+"""
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+
+from . import policies
+from .models import (
+    Patient, MedicalRecord, LabResult, Prescription, SearchDocument,
+)
+
+# -----------------------------
+# Documents
+# -----------------------------
+def _full_name(user):
+    return f"{user.first_name} {user.last_name}".strip() or user.username
+
+
+def document_for(instance):
+    """Return the SearchDocument fields for a model instance, or None."""
+    if isinstance(instance, Patient):
+        user = instance.user
+        return {
+            "kind": SearchDocument.KIND_PATIENT,
+            "patient_id": instance.pk,
+            "author_id": None,
+            "title": _full_name(user),
+            "body": " ".join([user.first_name, user.last_name, user.username, instance.phone]),
+        }
+    if isinstance(instance, MedicalRecord):
+        return {
+            "kind": SearchDocument.KIND_RECORD,
+            "patient_id": instance.patient_id,
+            "author_id": instance.created_by_id,
+            "title": (instance.diagnosis or "Medical record")[:255],
+            "body": " ".join([instance.symptoms, instance.diagnosis, instance.notes]),
+        }
+    if isinstance(instance, LabResult):
+        return {
+            "kind": SearchDocument.KIND_LAB,
+            "patient_id": instance.patient_id,
+            "author_id": instance.created_by_id,
+            "title": instance.test_name[:255],
+            "body": " ".join([instance.test_name, instance.result]),
+        }
+    if isinstance(instance, Prescription):
+        return {
+            "kind": SearchDocument.KIND_PRESCRIPTION,
+            "patient_id": instance.patient_id,
+            "author_id": instance.prescribed_by_id,
+            "title": instance.medication_name[:255],
+            "body": " ".join([instance.medication_name, instance.dosage]),
+        }
+    return None
+
+
+def index_instance(instance):
+    fields = document_for(instance)
+    if fields is None:
+        return
+    kind = fields.pop("kind")
+    SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=fields)
+
+
+def unindex_instance(instance):
+    fields = document_for(instance)
+    if fields is None:
+        return
+    SearchDocument.objects.filter(kind=fields["kind"], object_id=instance.pk).delete()
+
+
+# -----------------------------
+# Role scoping
+# -----------------------------
+# kind -> (source model, its field copied into SearchDocument.author)
+KIND_MODELS = {
+    SearchDocument.KIND_PATIENT: (Patient, None),
+    SearchDocument.KIND_RECORD: (MedicalRecord, "created_by"),
+    SearchDocument.KIND_LAB: (LabResult, "created_by"),
+    SearchDocument.KIND_PRESCRIPTION: (Prescription, "prescribed_by"),
+}
+
+
+def _document_lookup(model, author, lookup):
+    """A compiled policy lookup on ``model`` rewritten onto the denormalized patient/author columns."""
+    if model is Patient:
+        return f"patient__{lookup}"
+    if lookup.startswith("patient__"):
+        return lookup
+    if author is not None and lookup == f"{author}_id":
+        return "author_id"
+    raise ImproperlyConfigured(f"Policy lookup {lookup!r} on {model.__name__} has no SearchDocument column")
+
+
+def scope_for(user):
+    """
+    Q filter on SearchDocument restricting results to what ``user`` may
+    see: each kind of document under its source model's row-level policy,
+    so search finds exactly the rows the list endpoints show.
+    """
+    role = getattr(user, "role", None)
+    rules = {kind: policies.compile_rule(model, role) for kind, (model, _) in KIND_MODELS.items()}
+    if all(rule == policies.ALL for rule in rules.values()):
+        return Q()
+    scope = Q(pk__in=[])
+    for kind, rule in rules.items():
+        if rule == policies.NONE:
+            continue
+        kind_q = Q(kind=kind)
+        if rule != policies.ALL:
+            model, author = KIND_MODELS[kind]
+            owner = Q()
+            for lookup in rule:
+                owner |= Q(**{_document_lookup(model, author, lookup): user.pk})
+            kind_q &= owner
+        scope |= kind_q
+    return scope
+
+
+# -----------------------------
+# Pure-Python fallback index
+# -----------------------------
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOP_WORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """
+    term -> {document id: term frequency}, ranked with BM25.
+
+    ``sync()`` pulls only documents changed since the last watermark. Deleted
+    documents are not removed eagerly; results are always re-filtered through
+    the database (for role scoping), which drops them.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.total_length = 0
+        self.watermark = None
+
+    def add(self, doc_id, text):
+        terms = tokenize(text)
+        with self._lock:
+            self._remove(doc_id)
+            counts = defaultdict(int)
+            for term in terms:
+                counts[term] += 1
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            self.doc_terms[doc_id] = (tuple(counts), len(terms))
+            self.total_length += len(terms)
+
+    def _remove(self, doc_id):
+        previous = self.doc_terms.pop(doc_id, None)
+        if previous is None:
+            return
+        terms, length = previous
+        self.total_length -= length
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def sync(self):
+        qs = SearchDocument.objects.order_by("updated_at")
+        if self.watermark is not None:
+            qs = qs.filter(updated_at__gte=self.watermark)
+        for doc_id, title, body, updated_at in qs.values_list("id", "title", "body", "updated_at").iterator():
+            self.add(doc_id, f"{title} {body}")
+            self.watermark = updated_at
+
+    def search(self, query):
+        """Return [(doc_id, score)] for documents containing every query term."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = len(self.doc_terms)
+            if not n_docs:
+                return []
+            avg_len = self.total_length / n_docs
+            postings = [self.postings.get(t, {}) for t in terms]
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for docs in postings[1:]:
+                candidates &= docs.keys()
+                if not candidates:
+                    return []
+            scores = {}
+            for docs in postings:
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id in candidates:
+                    tf = docs[doc_id]
+                    length = self.doc_terms[doc_id][1]
+                    norm = tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / avg_len))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+fallback_index = InvertedIndex()
+
+
+# -----------------------------
+# Query
+# -----------------------------
+RESULT_FIELDS = ("id", "kind", "object_id", "patient_id", "title", "updated_at")
+
+# The fallback ranks in Python and then scopes through the database, so cap
+# how many candidates are sent back in the ``id IN (...)`` filter.
+FALLBACK_MAX_RESULTS = 1000
+
+
+def search(user, query, kind=None):
+    """
+    Run ``query`` for ``user``.
+
+    On PostgreSQL returns a queryset of dicts (so the paginator can LIMIT and
+    COUNT in SQL); otherwise a ranked list of dicts.
+    """
+    qs = SearchDocument.objects.filter(scope_for(user))
+    if kind:
+        qs = qs.filter(kind=kind)
+
+    if connection.vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return (
+            qs.extra(
+                select={"rank": f"ts_rank(accounts_searchdocument.search_vector, {tsquery})"},
+                select_params=[query],
+                where=[f"accounts_searchdocument.search_vector @@ {tsquery}"],
+                params=[query],
+            )
+            .order_by("-rank", "-id")
+            .values(*RESULT_FIELDS, "rank")
+        )
+
+    fallback_index.sync()
+    ranked = fallback_index.search(query)[:FALLBACK_MAX_RESULTS]
+    if not ranked:
+        return []
+    rows = {row["id"]: row for row in qs.filter(id__in=[doc_id for doc_id, _ in ranked]).values(*RESULT_FIELDS)}
+    results = []
+    for doc_id, score in ranked:
+        row = rows.get(doc_id)
+        if row is not None:
+            row["rank"] = round(score, 4)
+            results.append(row)
+    return results
+
+
+def rebuild():
+    """Reindex every searchable row. Returns the number of documents written."""
+    count = 0
+    for model, related in [
+        (Patient, ["user"]),
+        (MedicalRecord, []),
+        (LabResult, []),
+        (Prescription, []),
+    ]:
+        for instance in model.objects.select_related(*related).iterator():
+            index_instance(instance)
+            count += 1
+    return count
@@ -1,10 +1,14 @@
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from .models import (
     User, Roles, Patient, Appointment, MedicalRecord,
     Prescription, LabResult, UserSettings, Task, Alert, Notification,
-    BedStatus, Medication, HandoverLog, PendingAdmission, PlannedDischarge, PrescribedMedication
+    BedStatus, Medication, HandoverLog, PendingAdmission, PlannedDischarge, PrescribedMedication,
+    VitalsObservation, LatestVitals, VitalsThreshold, OutboundMessage,
 )
+from . import duplicates, passwords, vitals
 import random
+import secrets
 import string
 
 # =========================================================
@@ -66,7 +70,7 @@ class SignupSerializer(serializers.ModelSerializer):
             role=Roles.PATIENT,
             is_staff=False,
         )
-        user.set_password(validated_data["password"])
+        passwords.set_password(user, validated_data["password"])
         user.save()
         return user
 
@@ -96,7 +100,7 @@ class CreateDoctorSerializer(serializers.ModelSerializer):
             role=Roles.DOCTOR,
             is_staff=True,
         )
-        user.set_password(validated_data["password"])
+        passwords.set_password(user, validated_data["password"])
         user.save()
         return user
 
@@ -116,7 +120,7 @@ class CreateLabTechnicianSerializer(serializers.ModelSerializer):
             role=Roles.LAB,
             is_staff=False,
         )
-        user.set_password(validated_data["password"])
+        passwords.set_password(user, validated_data["password"])
         user.save()
         return user
 
@@ -136,7 +140,7 @@ class CreatePharmacistSerializer(serializers.ModelSerializer):
             role=Roles.PHARMACIST,
             is_staff=False,
         )
-        user.set_password(validated_data["password"])
+        passwords.set_password(user, validated_data["password"])
         user.save()
         return user
 
@@ -199,7 +203,7 @@ class AdminCreateUserSerializer(serializers.ModelSerializer):
             )
 
         user = User(**validated_data)
-        user.set_password(password)
+        passwords.set_password(user, password)
         user.save()
         return user
 
@@ -227,7 +231,7 @@ class PatientSerializer(serializers.ModelSerializer):
             "date_joined", "date_of_birth", "gender", "phone", "address", 
             "next_of_kin_name", "next_of_kin_phone", "notes_for_doctor", 
             "temperature", "blood_pressure", "heart_rate", "respiratory_rate",
-            "status", "created_at",
+            "ward", "status", "created_at",
         ]
         read_only_fields = ["id", "created_at", "date_joined", "username", "email", "full_name", "name", "first_name", "last_name", "age"]
 
@@ -248,37 +252,153 @@ class PatientSerializer(serializers.ModelSerializer):
             age -= 1
         return age
 
+class DuplicatePatient(APIException):
+    """
+    409 listing the probable matches. The detail is set after __init__ so
+    ids, scores and flags keep their types instead of becoming ErrorDetail
+    strings, as a ValidationError's would.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_code = "duplicate_patient"
+
+    def __init__(self, matches):
+        super().__init__()
+        self.detail = {
+            "duplicates": matches,
+            "detail": "This patient appears to be registered already. Resubmit with allow_duplicate=true to register anyway.",
+        }
+
+
 class CreatePatientSerializer(serializers.ModelSerializer):
     username = serializers.CharField(write_only=True, required=False)
     email = serializers.EmailField(write_only=True, required=False)
     first_name = serializers.CharField(write_only=True, required=False)
     last_name = serializers.CharField(write_only=True, required=False)
     password = serializers.CharField(write_only=True, required=False)
+    allow_duplicate = serializers.BooleanField(write_only=True, required=False, default=False)
 
     class Meta:
         model = Patient
         fields = [
             "id", "date_of_birth", "gender", "phone", "address", "next_of_kin_name", "next_of_kin_phone",
-            "temperature", "blood_pressure", "heart_rate", "respiratory_rate",
-            "created_at", "username", "email", "first_name", "last_name", "password",
+            "temperature", "blood_pressure", "heart_rate", "respiratory_rate", "ward",
+            "created_at", "username", "email", "first_name", "last_name", "password", "allow_duplicate",
         ]
         read_only_fields = ["id", "created_at"]
 
+    def validate(self, data):
+        """
+        Reject probable duplicates of an existing patient unless the caller
+        explicitly confirms with allow_duplicate=true.
+        """
+        if data.get("allow_duplicate"):
+            return data
+        matches = duplicates.find_candidates(
+            data.get("first_name", ""),
+            data.get("last_name", ""),
+            data.get("date_of_birth"),
+            data.get("phone", ""),
+            data.get("next_of_kin_phone", ""),
+            threshold=duplicates.PROBABLE,
+        )
+        if matches:
+            raise DuplicatePatient(matches)
+        return data
+
+    @staticmethod
+    def generate_username():
+        # 32 random bits; the loop only matters on the rare collision.
+        while True:
+            username = f"user_{secrets.token_hex(4)}"
+            if not User.objects.filter(username=username).exists():
+                return username
+
     def create(self, validated_data):
-        username = validated_data.pop("username", f"user_{random.randint(1000,9999)}")
+        validated_data.pop("allow_duplicate", None)
+        username = validated_data.pop("username", None) or self.generate_username()
         email = validated_data.pop("email", "")
         first_name = validated_data.pop("first_name", "")
         last_name = validated_data.pop("last_name", "")
         password = validated_data.pop("password", "".join(random.choices(string.ascii_letters + string.digits, k=10)))
 
         user = User(username=username, email=email, first_name=first_name, last_name=last_name, role=Roles.PATIENT, is_staff=False)
-        user.set_password(password)
+        passwords.set_password(user, password)
         user.save()
 
         patient = Patient.objects.create(user=user, **validated_data)
         patient.generated_password = password
         return patient
 
+# =========================================================
+# VITALS SERIALIZERS
+# =========================================================
+class VitalsObservationSerializer(serializers.ModelSerializer):
+    blood_pressure = serializers.CharField(required=False, allow_blank=True, help_text="e.g., 120/80")
+
+    class Meta:
+        model = VitalsObservation
+        fields = [
+            "id", "patient", "observed_at", "temperature", "systolic", "diastolic", "blood_pressure",
+            "heart_rate", "respiratory_rate", "recorded_by",
+        ]
+        read_only_fields = ["id", "patient", "recorded_by"]
+
+    def validate(self, data):
+        blood_pressure = data.pop("blood_pressure", "")
+        if blood_pressure:
+            systolic, diastolic = vitals.parse_blood_pressure(blood_pressure)
+            if systolic is None:
+                raise serializers.ValidationError({"blood_pressure": "Expected systolic/diastolic, e.g. 120/80."})
+            data["systolic"], data["diastolic"] = systolic, diastolic
+        if (data.get("systolic") is None) != (data.get("diastolic") is None):
+            raise serializers.ValidationError("Systolic and diastolic must be given together.")
+        if all(data.get(f) is None for f in vitals.VITAL_FIELDS):
+            raise serializers.ValidationError("At least one vital sign is required.")
+        return data
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["blood_pressure"] = vitals.format_blood_pressure(instance.systolic, instance.diastolic)
+        return data
+
+class LatestVitalsSerializer(serializers.ModelSerializer):
+    blood_pressure = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LatestVitals
+        fields = [
+            "patient", "observed_at", "temperature", "systolic", "diastolic", "blood_pressure",
+            "heart_rate", "respiratory_rate",
+        ]
+
+    def get_blood_pressure(self, obj):
+        return vitals.format_blood_pressure(obj.systolic, obj.diastolic)
+
+class BulkVitalsSerializer(VitalsObservationSerializer):
+    """
+    One reading in a ward-wide upload. ``patient`` is a plain id here; the
+    view checks all ids with a single query instead of one per row.
+    """
+    patient = serializers.IntegerField()
+
+    class Meta(VitalsObservationSerializer.Meta):
+        read_only_fields = ["id", "recorded_by"]
+
+class VitalsThresholdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VitalsThreshold
+        fields = ["id", "ward", "patient", "vital", "low", "high", "active", "created_at"]
+        read_only_fields = ["id", "created_at"]
+
+    def validate(self, data):
+        low = data.get("low", getattr(self.instance, "low", None))
+        high = data.get("high", getattr(self.instance, "high", None))
+        if low is None and high is None:
+            raise serializers.ValidationError("Set at least one of low/high.")
+        if low is not None and high is not None and low > high:
+            raise serializers.ValidationError("low must not exceed high.")
+        return data
+
 # =========================================================
 # DOCTOR-PATIENT RELATIONSHIP SERIALIZER
 # =========================================================
@@ -386,8 +506,9 @@ class PrescriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prescription
         fields = ["id", "patient", "patient_name", "medical_record", "appointment", "prescribed_by",
-                  "medication_name", "dosage", "duration", "notes", "status", "created_at", "updated_at"]
-        read_only_fields = ["id", "created_at", "updated_at"]
+                  "medication_name", "dosage", "duration", "notes", "status", "priority",
+                  "dispensed_by", "dispensed_at", "created_at", "updated_at"]
+        read_only_fields = ["id", "dispensed_by", "dispensed_at", "created_at", "updated_at"]
 
     def get_patient_name(self, obj):
         return f"{obj.patient.user.first_name} {obj.patient.user.last_name}".strip() if obj.patient and obj.patient.user else ""
@@ -443,19 +564,29 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ["id", "user", "user_name", "message", "read", "created_at"]
+        fields = ["id", "user", "user_name", "kind", "message", "read", "created_at"]
         read_only_fields = ["id", "created_at"]
 
     def get_user_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip()
 
+class OutboundMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboundMessage
+        fields = [
+            "id", "user", "channel", "address", "subject", "body", "parts", "status",
+            "attempts", "max_attempts", "send_after", "last_error", "created_at", "sent_at",
+        ]
+        read_only_fields = fields
+
 class BedStatusSerializer(serializers.ModelSerializer):
     patient_name = serializers.SerializerMethodField()
 
     class Meta:
         model = BedStatus
-        fields = ["id", "bed_number", "occupied", "patient", "patient_name", "updated_at"]
-        read_only_fields = ["id", "updated_at"]
+        fields = ["id", "ward", "bed_number", "occupied", "patient", "patient_name", "updated_at"]
+        # Occupancy changes only through beds.assign/release/allocate, which lock the row.
+        read_only_fields = ["id", "occupied", "patient", "updated_at"]
 
     def get_patient_name(self, obj):
         return obj.patient.user.get_full_name() if obj.patient else None
@@ -488,7 +619,10 @@ class HandoverLogSerializer(serializers.ModelSerializer):
 class PendingAdmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = PendingAdmission
-        fields = ["id", "patient_name", "age", "gender", "diagnosis", "assigned_room", "processed", "created_at"]
+        fields = [
+            "id", "patient", "patient_name", "age", "gender", "diagnosis", "assigned_room", "ward", "processed",
+            "created_at",
+        ]
         read_only_fields = ["id", "created_at"]
 
 class PlannedDischargeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,231 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Roles, User, Patient, Appointment, MedicalRecord, LabResult, Prescription, Notification, BedStatus,
+    HandoverLog, Task, Alert, PatientTransition,
+)
+from . import beds, charts, handover, search, typeahead, duplicates, vitals, vitals_rules, notifications, transitions, messaging
+from .authentication import user_cache
+
+# =========================================================
+# AUTHENTICATION USER CACHE
+# =========================================================
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    # A login only touches last_login, which no token claim depends on.
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+# =========================================================
+# SEARCH INDEX
+# =========================================================
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_save, sender=LabResult)
+@receiver(post_save, sender=Prescription)
+def index_searchable(sender, instance, update_fields=None, **kwargs):
+    # A patient's document holds only the user's names and the phone.
+    if sender is Patient and update_fields and "phone" not in update_fields:
+        return
+    search.index_instance(instance)
+
+
+@receiver(post_delete, sender=MedicalRecord)
+@receiver(post_delete, sender=LabResult)
+@receiver(post_delete, sender=Prescription)
+def unindex_searchable(sender, instance, **kwargs):
+    # Patient documents go away with the patient row (FK cascade).
+    search.unindex_instance(instance)
+
+
+@receiver(post_delete, sender=Patient)
+def unindex_patient_typeahead(sender, instance, **kwargs):
+    typeahead.fallback_index.discard(instance.pk)
+
+# =========================================================
+# DUPLICATE DETECTION
+# =========================================================
+@receiver(post_save, sender=Patient)
+def index_patient_blocking_keys(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"date_of_birth", "phone", "next_of_kin_phone"} & set(update_fields):
+        return
+    duplicates.index_patient(instance)
+
+
+@receiver(post_save, sender=User)
+def reindex_patient_user(sender, instance, created, update_fields=None, **kwargs):
+    """Names live on User, so a rename must refresh the patient's document."""
+    if created or instance.role != Roles.PATIENT:
+        return
+    if update_fields and not {"first_name", "last_name", "username"} & set(update_fields):
+        return  # e.g. the last_login update on every token obtain
+    patient = Patient.objects.filter(user=instance).first()
+    if patient is not None:
+        patient.user = instance
+        search.index_instance(patient)
+        duplicates.index_patient(patient)
+
+# =========================================================
+# VITALS ALERTS
+# =========================================================
+@receiver(vitals.vitals_recorded)
+def evaluate_vitals(sender, observations, **kwargs):
+    if any(result["findings"] for result in vitals_rules.evaluate(observations)):
+        transaction.on_commit(handover.changed)  # alerts are bulk-created
+
+# =========================================================
+# NOTIFICATIONS
+# =========================================================
+def _patient_contacts(patient_id):
+    """(patient user id, display name, assigned doctor id) in one query."""
+    row = Patient.objects.filter(pk=patient_id).values_list(
+        "user_id", "user__first_name", "user__last_name", "user__username", "assigned_doctor_id"
+    ).first()
+    if row is None:
+        return None, "", None
+    user_id, first_name, last_name, username, doctor_id = row
+    return user_id, f"{first_name} {last_name}".strip() or username, doctor_id
+
+
+@receiver(post_save, sender=Appointment)
+def notify_appointment_requested(sender, instance, created, **kwargs):
+    if not created:
+        return
+    _, name, _ = _patient_contacts(instance.patient_id)
+    notifications.emit(
+        "appointment_requested", [instance.doctor_id],
+        f"New appointment request from {name} for {instance.date} at {instance.time}",
+    )
+
+
+@receiver(transitions.appointment_transitioned)
+def notify_appointment_decision(sender, appointment_id, action, actor=None, **kwargs):
+    if action not in ("approve", "decline"):
+        return
+    row = Appointment.objects.filter(pk=appointment_id).values_list("patient__user_id", "date", "time").first()
+    if row is None:
+        return
+    patient_user_id, date, time = row
+    verdict = "approved" if action == "approve" else "declined"
+    notifications.emit(
+        f"appointment_{verdict}", [patient_user_id],
+        f"Your appointment on {date} at {time} was {verdict}",
+        exclude=actor.pk if actor else None,
+    )
+
+
+@receiver(post_save, sender=LabResult)
+def notify_lab_result(sender, instance, created, **kwargs):
+    if not created:
+        return
+    patient_user_id, name, doctor_id = _patient_contacts(instance.patient_id)
+    notifications.emit(
+        "lab_result_created", [doctor_id], f"New lab result for {name}: {instance.test_name}",
+        exclude=instance.created_by_id,
+    )
+    notifications.emit(
+        "lab_result_created", [patient_user_id], f"Your {instance.test_name} result is available",
+        exclude=instance.created_by_id,
+    )
+
+
+@receiver(post_save, sender=MedicalRecord)
+def notify_medical_record(sender, instance, created, **kwargs):
+    if not created:
+        return
+    _, name, doctor_id = _patient_contacts(instance.patient_id)
+    notifications.emit(
+        "medical_record_created", [doctor_id], f"New medical record for {name}",
+        exclude=instance.created_by_id,
+    )
+
+
+@receiver(post_save, sender=Prescription)
+def notify_prescription_pending(sender, instance, created, **kwargs):
+    if not created or instance.status != Prescription.PENDING:
+        return
+    pharmacists = User.objects.filter(role=Roles.PHARMACIST, is_active=True).values_list("id", flat=True)
+    notifications.emit(
+        "prescription_pending", list(pharmacists),
+        f"Prescription pending: {instance.medication_name} {instance.dosage}",
+    )
+
+
+@receiver(post_delete, sender=Notification)
+def discount_deleted_notification(sender, instance, **kwargs):
+    if not instance.read:
+        notifications.discount(instance.user_id)
+
+
+@receiver(notifications.notifications_dispatched)
+def queue_outbound_messages(sender, messages, **kwargs):
+    """Email/SMS copies for recipients who opted in; sent later by the messaging worker."""
+    messaging.queue_notifications(messages)
+
+# =========================================================
+# CHART SNAPSHOTS
+# =========================================================
+@receiver(post_save, sender=Patient)
+def refresh_chart_for_patient(sender, instance, **kwargs):
+    charts.mark_stale(instance.pk)
+
+
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+@receiver(post_save, sender=LabResult)
+@receiver(post_delete, sender=LabResult)
+@receiver(post_save, sender="billing.Invoice")
+@receiver(post_delete, sender="billing.Invoice")
+def refresh_chart_for_row(sender, instance, **kwargs):
+    charts.mark_stale(instance.patient_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_chart_for_user(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.role != Roles.PATIENT:
+        return
+    if update_fields and not {"first_name", "last_name", "username"} & set(update_fields):
+        return
+    charts.mark_stale(*Patient.objects.filter(user=instance).values_list("pk", flat=True))
+
+
+@receiver(vitals.vitals_recorded)
+def refresh_chart_for_vitals(sender, observations, **kwargs):
+    charts.mark_stale(*{obs.patient_id for obs in observations})
+
+# =========================================================
+# BED BOARD
+# =========================================================
+@receiver(post_save, sender=BedStatus)
+def update_bed_board(sender, instance, **kwargs):
+    values = (instance.pk, instance.ward, instance.bed_number, instance.occupied, instance.patient_id)
+    transaction.on_commit(lambda: beds.board.changed(*values))
+
+
+@receiver(post_delete, sender=BedStatus)
+def drop_bed_from_board(sender, instance, **kwargs):
+    bed_id = instance.pk
+    transaction.on_commit(lambda: beds.board.removed(bed_id))
+
+
+# =========================================================
+# HANDOVER DIGEST
+# =========================================================
+@receiver(post_save, sender=HandoverLog)
+@receiver(post_delete, sender=HandoverLog)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+@receiver(post_save, sender=PatientTransition)
+def refresh_handover_digests(sender, instance, **kwargs):
+    transaction.on_commit(handover.changed)
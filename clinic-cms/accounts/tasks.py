@@ -0,0 +1,34 @@
+"""
+Background tasks run by ``manage.py run_workers`` (see accounts/jobs.py).
+
+Imported from ``AccountsConfig.ready`` so the registry is populated in both
+the web and worker processes.
+"""
+from datetime import timedelta
+
+from . import duplicates, jobs, messaging, revocation, search
+
+
+@jobs.task("search.rebuild", queue="maintenance", max_attempts=1)
+def rebuild_search_index():
+    search.rebuild()
+
+
+@jobs.task("duplicates.rebuild", queue="maintenance", max_attempts=1)
+def rebuild_blocking_keys():
+    duplicates.rebuild()
+
+
+@jobs.task("jobs.purge", queue="maintenance")
+def purge_jobs(days=None):
+    jobs.purge(jobs.RETENTION if days is None else timedelta(days=days))
+
+
+@jobs.task("messaging.dispatch", queue="messaging", max_attempts=1)
+def dispatch_messages():
+    messaging.dispatch()
+
+
+@jobs.task("revocation.compact", queue="maintenance")
+def compact_revocations():
+    revocation.compact()
@@ -1,3 +1,267 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import beds, pharmacy, policies, revocation, timeline, transitions, vitals
+from .models import (
+    Appointment, AppointmentTransition, BedStatus, LabResult, LatestVitals, MedicalRecord, Patient,
+    Prescription, Roles, User,
+)
+
+
+def make_user(username, role, **extra):
+    user = User.objects.create(username=username, role=role, first_name=username.title(), **extra)
+    user.set_password("pass12345")
+    user.save()
+    return user
+
+
+def make_patient(username, doctor=None):
+    return Patient.objects.create(user=make_user(username, Roles.PATIENT), gender="F", assigned_doctor=doctor)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+# -----------------------------
+# Appointment transitions
+# -----------------------------
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user("doctor", Roles.DOCTOR, specialization="General")
+        self.other = make_user("other", Roles.DOCTOR, specialization="General")
+        self.patient = make_patient("patient", self.doctor)
+
+    def appointment(self, status="REQUESTED", doctor=None):
+        return Appointment.objects.create(
+            patient=self.patient, doctor=doctor or self.doctor, date=date.today(), time=time(9), status=status,
+        )
+
+    def test_approve_records_history(self):
+        appointment = self.appointment()
+        self.assertEqual(transitions.transition(Appointment.objects.all(), appointment.pk, "approve"), "ACCEPTED")
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, "ACCEPTED")
+        history = AppointmentTransition.objects.get(appointment=appointment)
+        self.assertEqual((history.from_status, history.to_status), ("REQUESTED", "ACCEPTED"))
+
+    def test_legacy_spellings_are_the_same_state(self):
+        pending, approved = self.appointment("PENDING"), self.appointment("APPROVED")
+        transitions.transition(Appointment.objects.all(), pending.pk, "decline")
+        transitions.transition(Appointment.objects.all(), approved.pk, "complete")
+        self.assertEqual(Appointment.objects.get(pk=pending.pk).status, "DECLINED")
+        self.assertEqual(Appointment.objects.get(pk=approved.pk).status, "COMPLETED")
+
+    def test_stale_status_is_rejected(self):
+        appointment = self.appointment()
+        transitions.transition(Appointment.objects.all(), appointment.pk, "approve")
+        with self.assertRaises(transitions.InvalidTransition) as raised:
+            transitions.transition(Appointment.objects.all(), appointment.pk, "decline")
+        self.assertEqual(raised.exception.current_status, "ACCEPTED")
+        self.assertEqual(AppointmentTransition.objects.filter(appointment=appointment).count(), 1)
+
+    def test_row_outside_queryset_is_not_found(self):
+        appointment = self.appointment()
+        with self.assertRaises(transitions.TransitionNotFound):
+            transitions.transition(Appointment.objects.filter(doctor=self.other), appointment.pk, "approve")
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, "REQUESTED")
+
+    def test_endpoint_not_found(self):
+        client = client_for(self.other)
+        appointment = self.appointment()
+        self.assertEqual(client.patch(f"/api/appointments/{appointment.pk}/approve/").status_code, 404)
+        self.assertEqual(client.patch("/api/appointments/999999/approve/").status_code, 404)
+        self.assertEqual(client.patch("/api/appointments/abc/approve/").status_code, 404)
+
+    def test_endpoint_visible_but_not_owned_is_forbidden(self):
+        appointment = self.appointment()
+        # Let doctors see every appointment while approving stays with its own doctor.
+        rules = {**policies.POLICIES["accounts.Appointment"], Roles.DOCTOR: policies.ALL}
+        with mock.patch.dict(policies.POLICIES, {"accounts.Appointment": rules}), \
+                mock.patch.dict(policies._compiled, clear=True):
+            response = client_for(self.other).patch(f"/api/appointments/{appointment.pk}/approve/")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, "REQUESTED")
+
+    def test_endpoint_conflict(self):
+        appointment = self.appointment("COMPLETED")
+        response = client_for(self.doctor).patch(f"/api/appointments/{appointment.pk}/approve/")
+        self.assertEqual(response.status_code, 400)
+
+
+# -----------------------------
+# Beds
+# -----------------------------
+class BedTests(TestCase):
+    def setUp(self):
+        self.first = BedStatus.objects.create(ward="A", bed_number="A1")
+        self.second = BedStatus.objects.create(ward="A", bed_number="A2")
+        self.patient = make_patient("patient")
+        self.other = make_patient("other")
+
+    def test_occupied_bed_conflicts(self):
+        beds.assign(self.first.pk, self.patient.pk)
+        with self.assertRaises(beds.BedConflict):
+            beds.assign(self.first.pk, self.other.pk)
+
+    def test_patient_in_one_bed_only(self):
+        beds.assign(self.first.pk, self.patient.pk)
+        with self.assertRaises(beds.BedConflict):
+            beds.assign(self.second.pk, self.patient.pk)
+        beds.release(self.first.pk)
+        self.assertEqual(beds.assign(self.second.pk, self.patient.pk).patient_id, self.patient.pk)
+
+    def test_missing_bed(self):
+        with self.assertRaises(BedStatus.DoesNotExist):
+            beds.assign(999999, self.patient.pk)
+
+    def test_occupancy_not_writable_through_update(self):
+        beds.assign(self.first.pk, self.patient.pk)
+        response = client_for(make_user("nurse", Roles.NURSE)).patch(
+            f"/api/beds/{self.second.pk}/", {"occupied": True, "patient": self.patient.pk}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.occupied, self.second.patient_id), (False, None))
+
+
+# -----------------------------
+# Pharmacy
+# -----------------------------
+class PharmacyTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user("doctor", Roles.DOCTOR, specialization="General")
+        self.alice = make_user("alice", Roles.PHARMACIST)
+        self.bob = make_user("bob", Roles.PHARMACIST)
+        patient = make_patient("patient", self.doctor)
+        record = MedicalRecord.objects.create(patient=patient, created_by=self.doctor, diagnosis="flu")
+        self.ids = [
+            Prescription.objects.create(
+                patient=patient, medical_record=record, prescribed_by=self.doctor,
+                medication_name=f"drug {n}", dosage="1", duration="2d",
+            ).pk
+            for n in range(3)
+        ]
+
+    def test_claim_skips_claimed(self):
+        self.assertEqual(pharmacy.claim(self.ids[:1], self.alice), self.ids[:1])
+        self.assertEqual(sorted(pharmacy.claim(self.ids, self.bob)), self.ids[1:])
+        self.assertEqual(Prescription.objects.get(pk=self.ids[0]).claimed_by, self.alice)
+
+    def test_abandoned_claim_can_be_taken_over(self):
+        pharmacy.claim(self.ids[:1], self.alice, now=timezone.now() - pharmacy.CLAIM_TIMEOUT - timedelta(minutes=1))
+        self.assertEqual(pharmacy.claim(self.ids[:1], self.bob), self.ids[:1])
+
+    def test_dispense_skips_others_claims_and_dispensed(self):
+        pharmacy.claim(self.ids[:1], self.alice)
+        self.assertEqual(sorted(pharmacy.dispense(self.ids, self.bob)), self.ids[1:])
+        self.assertEqual(pharmacy.dispense(self.ids, self.bob), [])
+        self.assertEqual(pharmacy.dispense(self.ids, self.alice), self.ids[:1])
+
+    def test_release_only_own_claims(self):
+        pharmacy.claim(self.ids[:1], self.alice)
+        self.assertEqual(pharmacy.release(self.ids[:1], self.bob), [])
+        self.assertEqual(pharmacy.release(self.ids[:1], self.alice), self.ids[:1])
+        self.assertEqual(Prescription.objects.get(pk=self.ids[0]).status, Prescription.PENDING)
+
+
+# -----------------------------
+# Timeline
+# -----------------------------
+class TimelineTests(TestCase):
+    def test_cursor_pages_through_equal_timestamps(self):
+        doctor = make_user("doctor", Roles.DOCTOR, specialization="General")
+        patient = make_patient("patient", doctor)
+        for n in range(3):
+            MedicalRecord.objects.create(patient=patient, created_by=doctor, diagnosis=f"d{n}")
+            LabResult.objects.create(patient=patient, created_by=doctor, test_name=f"t{n}", result="ok")
+            Appointment.objects.create(patient=patient, doctor=doctor, date=date.today(), time=time(9))
+        at = timezone.now().replace(microsecond=0)
+        for model in (MedicalRecord, LabResult, Appointment):
+            model.objects.filter(patient=patient).update(created_at=at)
+        LabResult.objects.create(patient=patient, created_by=doctor, test_name="newest", result="ok")
+
+        seen, cursor = [], None
+        while True:
+            events, cursor = timeline.page(patient.pk, doctor, cursor=cursor, limit=2)
+            seen.extend((event["type"], event["id"]) for event in events)
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        self.assertEqual(seen[0][0], "lab_result")
+        everything, _ = timeline.page(patient.pk, doctor, limit=50)
+        self.assertEqual(seen, [(event["type"], event["id"]) for event in everything])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(timeline.InvalidCursor):
+            timeline.decode_cursor("not a cursor")
+
+
+# -----------------------------
+# Token revocation
+# -----------------------------
+class RevocationTests(TestCase):
+    def setUp(self):
+        revocation.revocation_list.reset()
+        self.addCleanup(revocation.revocation_list.reset)
+        self.user = make_user("nurse", Roles.NURSE)
+
+    def test_logout_revokes_access_and_refresh(self):
+        client = APIClient()
+        tokens = client.post("/api/token/", {"username": "nurse", "password": "pass12345"}, format="json").data
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertFalse(revocation.is_revoked(AccessToken(tokens["access"])))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post("/api/token/logout/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(revocation.is_revoked(AccessToken(tokens["access"])))
+        self.assertEqual(client.post("/api/token/logout/").status_code, 401)
+        refreshed = APIClient().post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(refreshed.status_code, 401)
+
+    def test_other_processes_pick_up_revocations(self):
+        token = AccessToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=False):
+            revocation.revoke(token)  # recorded in the table, not yet in this process's memory
+        revocation.revocation_list.reset()
+        self.assertTrue(revocation.is_revoked(token))
+
+
+# -----------------------------
+# Vitals
+# -----------------------------
+class LatestVitalsTests(TestCase):
+    def setUp(self):
+        self.patient = make_patient("patient")
+        self.now = timezone.now()
+
+    def ago(self, minutes):
+        return self.now - timedelta(minutes=minutes)
+
+    def test_partial_readings_in_one_batch_merge(self):
+        vitals.record_many([
+            {"patient_id": self.patient.pk, "temperature": 38.2, "observed_at": self.ago(10)},
+            {"patient_id": self.patient.pk, "heart_rate": 95, "observed_at": self.ago(5)},
+        ])
+        latest = LatestVitals.objects.get(pk=self.patient.pk)
+        self.assertEqual((float(latest.temperature), latest.heart_rate), (38.2, 95))
+        self.assertEqual(latest.observed_at, self.ago(5))
 
-# Create your tests here.
+    def test_older_reading_fills_only_missing_or_older_fields(self):
+        vitals.record(self.patient.pk, {"heart_rate": 95, "temperature": 38.2}, observed_at=self.ago(5))
+        vitals.record(self.patient.pk, {"respiratory_rate": 22, "heart_rate": 70}, observed_at=self.ago(8))
+        vitals.record(self.patient.pk, {"temperature": 37.0}, observed_at=self.ago(3))
+        latest = LatestVitals.objects.get(pk=self.patient.pk)
+        self.assertEqual((latest.heart_rate, latest.respiratory_rate, float(latest.temperature)), (95, 22, 37.0))
+        self.assertEqual(latest.observed_at, self.ago(3))
+        self.patient.refresh_from_db()
+        self.assertEqual((self.patient.heart_rate, self.patient.respiratory_rate), (95, 22))
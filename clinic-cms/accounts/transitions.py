@@ -0,0 +1,150 @@
+"""
+Appointment state machine.
+
+Every status change goes through ``transition()``, which performs a single
+compare-and-set ``UPDATE ... WHERE id = ? AND status IN (...)`` instead of
+reading the row first. Two concurrent requests can therefore never both pass
+the "is this appointment still pending?" check: the database lets exactly one
+UPDATE match and the other sees zero affected rows.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Appointment, AppointmentTransition
+
+# -----------------------------
+# States
+# -----------------------------
+# APPROVED/DONE/PENDING are legacy spellings still present in old rows and in
+# the frontend; they are treated as the same state as their canonical form.
+ALIASES = {
+    "PENDING": "REQUESTED",
+    "APPROVED": "ACCEPTED",
+    "DONE": "COMPLETED",
+}
+
+
+def canonical(status):
+    return ALIASES.get(status, status)
+
+
+def spellings(*states):
+    """All stored spellings of the given canonical states."""
+    return [s for s, _ in Appointment.STATUS_CHOICES if canonical(s) in states]
+
+
+# action -> (canonical source state, target state)
+TRANSITIONS = {
+    "approve": ("REQUESTED", "ACCEPTED"),
+    "decline": ("REQUESTED", "DECLINED"),
+    "complete": ("ACCEPTED", "COMPLETED"),
+}
+
+
+# Sent after a successful transition with ``appointment_id``, ``action`` and ``actor``.
+appointment_transitioned = Signal()
+
+
+class TransitionNotFound(Exception):
+    """The appointment does not exist (or is outside the caller's queryset)."""
+
+
+class InvalidTransition(Exception):
+    """The appointment exists but is not in a state the action applies to."""
+
+    def __init__(self, action, current_status):
+        self.action = action
+        self.current_status = current_status
+        super().__init__(f"Cannot {action} appointment with status: {current_status}")
+
+
+# -----------------------------
+# Throughput metrics
+# -----------------------------
+class TransitionStats:
+    """Per-process counters for transition outcomes and latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.counts = {}
+            self.total_seconds = {}
+
+    def record(self, action, outcome, seconds):
+        key = (action, outcome)
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.total_seconds[key] = self.total_seconds.get(key, 0.0) + seconds
+
+    def snapshot(self):
+        with self._lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            rows = []
+            for (action, outcome), count in sorted(self.counts.items()):
+                total = self.total_seconds[(action, outcome)]
+                rows.append({
+                    "action": action,
+                    "outcome": outcome,
+                    "count": count,
+                    "per_second": round(count / uptime, 4),
+                    "avg_ms": round(total * 1000 / count, 3),
+                })
+            return {"uptime_seconds": round(uptime, 1), "transitions": rows}
+
+
+stats = TransitionStats()
+
+
+# -----------------------------
+# Engine
+# -----------------------------
+def transition(queryset, pk, action, actor=None):
+    """
+    Apply ``action`` to the appointment ``pk`` within ``queryset``.
+
+    ``queryset`` is the caller's visibility scope (e.g. the viewset's
+    role-filtered queryset), so rows the caller cannot see behave as missing.
+    The happy path costs one UPDATE plus one history INSERT; only a failed
+    compare-and-set issues a SELECT, to report why it failed.
+    """
+    source, target = TRANSITIONS[action]
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        with transaction.atomic():
+            updated = (
+                queryset.order_by()
+                .filter(pk=pk, status__in=spellings(source))
+                .update(status=target)
+            )
+            if updated:
+                AppointmentTransition.objects.create(
+                    appointment_id=pk,
+                    action=action,
+                    from_status=source,
+                    to_status=target,
+                    actor=actor,
+                )
+        if updated:
+            appointment_transitioned.send(sender=Appointment, appointment_id=pk, action=action, actor=actor)
+            return target
+
+        current = queryset.order_by().filter(pk=pk).values_list("status", flat=True).first()
+        if current is None:
+            outcome = "not_found"
+            raise TransitionNotFound(pk)
+        outcome = "conflict"
+        raise InvalidTransition(action, current)
+    except Exception:
+        if outcome == "ok":
+            outcome = "error"
+        raise
+    finally:
+        stats.record(action, outcome, time.perf_counter() - started)
@@ -0,0 +1,242 @@
+"""
+As-you-type patient lookup on first/last name, username and phone.
+
+On PostgreSQL matching uses ``pg_trgm`` GIN indexes (migration 0017): a
+prefix ``ILIKE 'q%'`` on every field plus the trigram ``%`` operator on
+first/last name for typos, both of which the indexes serve. Other backends use ``PatientIndex``, an in-memory
+sorted-key prefix index plus trigram postings, warmed at startup from
+``clinic/wsgi.py`` and synced incrementally from the patient
+``SearchDocument`` rows (so renames on ``User`` are picked up too).
+"""
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+
+from .models import Patient, SearchDocument
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+MIN_SIMILARITY = 0.3
+RESULT_FIELDS = ("id", "user__first_name", "user__last_name", "user__username", "phone")
+
+NON_DIGIT_RE = re.compile(r"\D")
+PHONE_QUERY_RE = re.compile(r"^[\d\s+()-]+$")
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading blanks and one trailing."""
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# -----------------------------
+# In-memory fallback
+# -----------------------------
+class PatientIndex:
+    """
+    Keys are stored once however many patients share them (names repeat a
+    lot), each mapping to its patient ids. Prefix lookups bisect the sorted
+    list of distinct keys (a flattened trie). Fuzzy lookups only cover
+    first/last names: candidates come from trigram postings over distinct
+    name keys and are scored with Jaccard similarity, the measure ``pg_trgm``
+    uses. Usernames and phones are unique, so they are prefix-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sorted_keys = []
+        self.key_patients = {}
+        self.grams = defaultdict(set)
+        self.patient_keys = {}
+        self.loaded = False
+        self.watermark = None
+
+    @staticmethod
+    def keys_for(first_name, last_name, username, phone):
+        """Return ({all prefix keys}, {fuzzy name keys})."""
+        names = {k.lower() for k in (first_name, last_name) if k}
+        keys = set(names)
+        if username:
+            keys.add(username.lower())
+        digits = NON_DIGIT_RE.sub("", phone or "")
+        if digits:
+            keys.add(digits)
+        return keys, names
+
+    def _add(self, patient_id, row, sort_later=False):
+        keys, names = self.keys_for(*row)
+        for key in keys:
+            patients = self.key_patients.get(key)
+            if patients is None:
+                patients = self.key_patients[key] = set()
+                if sort_later:
+                    self.sorted_keys.append(key)
+                else:
+                    bisect.insort(self.sorted_keys, key)
+            patients.add(patient_id)
+        for name in names:
+            for gram in trigrams(name):
+                self.grams[gram].add(name)
+        self.patient_keys[patient_id] = keys
+
+    def _drop(self, patient_id):
+        for key in self.patient_keys.pop(patient_id, ()):
+            patients = self.key_patients.get(key)
+            if patients is None:
+                continue
+            patients.discard(patient_id)
+            if patients:
+                continue
+            del self.key_patients[key]
+            i = bisect.bisect_left(self.sorted_keys, key)
+            if i < len(self.sorted_keys) and self.sorted_keys[i] == key:
+                del self.sorted_keys[i]
+            for gram in trigrams(key):
+                names = self.grams.get(gram)
+                if names is not None:
+                    names.discard(key)
+                    if not names:
+                        del self.grams[gram]
+
+    def put(self, patient_id, *row):
+        with self._lock:
+            self._drop(patient_id)
+            self._add(patient_id, row)
+
+    def discard(self, patient_id):
+        with self._lock:
+            self._drop(patient_id)
+
+    def load(self, rows):
+        """Bulk load ``RESULT_FIELDS`` rows; sorts once instead of per insert."""
+        with self._lock:
+            for patient_id, *row in rows:
+                self._drop(patient_id)
+                self._add(patient_id, row, sort_later=True)
+            self.sorted_keys = sorted(set(self.sorted_keys))
+
+    def sync(self):
+        docs = SearchDocument.objects.filter(kind=SearchDocument.KIND_PATIENT).order_by("updated_at")
+        if not self.loaded:
+            latest = docs.values_list("updated_at", flat=True).last()
+            self.load(Patient.objects.values_list(*RESULT_FIELDS).iterator())
+            self.watermark = latest
+            self.loaded = True
+            return
+        if self.watermark is not None:
+            docs = docs.filter(updated_at__gte=self.watermark)
+        changed = list(docs.values_list("patient_id", "updated_at"))
+        if not changed:
+            return
+        rows = Patient.objects.filter(id__in=[pid for pid, _ in changed]).values_list(*RESULT_FIELDS)
+        for row in rows:
+            self.put(*row)
+        self.watermark = changed[-1][1]
+
+    def lookup(self, query, limit):
+        """Return [(patient_id, score)], prefix matches (score 1.0) first."""
+        q = query.lower()
+        needles = {q}
+        if PHONE_QUERY_RE.match(q):
+            needles.add(NON_DIGIT_RE.sub("", q))
+        scores = {}
+        with self._lock:
+            for needle in needles:
+                i = bisect.bisect_left(self.sorted_keys, needle)
+                while len(scores) < limit and i < len(self.sorted_keys) and self.sorted_keys[i].startswith(needle):
+                    for patient_id in self.key_patients[self.sorted_keys[i]]:
+                        scores[patient_id] = 1.0
+                    i += 1
+
+            if len(scores) < limit and len(q) >= 3:
+                query_grams = trigrams(q)
+                postings = sorted((self.grams.get(g, set()) for g in query_grams), key=len)
+                # Jaccard >= t needs at least t * |query grams| shared grams, so
+                # every match must appear in one of the rarest
+                # (|query grams| - needed + 1) postings: only probe those.
+                needed = math.ceil(MIN_SIMILARITY * len(query_grams))
+                for name in set().union(*postings[:len(postings) - needed + 1]):
+                    if sum(name in names for names in postings) < needed:
+                        continue
+                    score = similarity(query_grams, trigrams(name))
+                    if score < MIN_SIMILARITY:
+                        continue
+                    for patient_id in self.key_patients.get(name, ()):
+                        if score > scores.get(patient_id, 0.0):
+                            scores[patient_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+fallback_index = PatientIndex()
+
+
+def warm():
+    """Build the in-memory index up front (no-op on PostgreSQL)."""
+    if connection.vendor != "postgresql":
+        fallback_index.sync()
+
+
+# -----------------------------
+# Query
+# -----------------------------
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def lookup(query, limit=DEFAULT_LIMIT):
+    """Top ``limit`` patients matching ``query`` as dicts with a ``score``."""
+    query = query.strip()
+    if not query:
+        return []
+
+    if connection.vendor == "postgresql":
+        prefix = _escape_like(query) + "%"
+        columns = ["accounts_user.first_name", "accounts_user.last_name", "accounts_user.username", "accounts_patient.phone"]
+        prefix_match = " OR ".join(f"{c} ILIKE %s" for c in columns)
+        fuzzy_match = " OR ".join(f"{c} %% %s" for c in columns[:2])
+        score = "GREATEST({})".format(", ".join(f"similarity({c}, %s)" for c in columns))
+        qs = (
+            Patient.objects.select_related("user")
+            .extra(
+                select={"prefix": f"({prefix_match})", "score": score},
+                select_params=[prefix] * 4 + [query] * 4,
+                where=[f"({prefix_match} OR {fuzzy_match})"],
+                params=[prefix] * 4 + [query] * 2,
+            )
+            .order_by("-prefix", "-score", "id")
+            .values(*RESULT_FIELDS, "prefix", "score")[:limit]
+        )
+        return [_result(row, 1.0 if row["prefix"] else row["score"]) for row in qs]
+
+    fallback_index.sync()
+    ranked = fallback_index.lookup(query, limit)
+    rows = {row["id"]: row for row in Patient.objects.filter(id__in=[pid for pid, _ in ranked]).values(*RESULT_FIELDS)}
+    return [_result(rows[pid], score) for pid, score in ranked if pid in rows]
+
+
+def _result(row, score):
+    first_name, last_name = row["user__first_name"], row["user__last_name"]
+    return {
+        "id": row["id"],
+        "first_name": first_name,
+        "last_name": last_name,
+        "full_name": f"{first_name} {last_name}".strip(),
+        "username": row["user__username"],
+        "phone": row["phone"],
+        "score": round(float(score), 3),
+    }
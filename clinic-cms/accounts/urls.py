@@ -7,6 +7,7 @@ from rest_framework_simplejwt.views import (
 from rest_framework_nested import routers
 from .views import (
     MeView,
+    LogoutView,
     SignupView,
     UserViewSet,
     PatientViewSet,
@@ -24,6 +25,17 @@ from .views import (
     NurseMedicationsViewSet,
     NurseAlertsViewSet,
     NurseHandoversViewSet,
+    SearchView,
+    VitalsThresholdViewSet,
+    BulkVitalsUploadView,
+    JobStatsView,
+    NotificationViewSet,
+    OutboundMessageViewSet,
+    PerfReportView,
+    BedViewSet,
+    PendingAdmissionViewSet,
+    PlannedDischargeViewSet,
+    PharmacyQueueViewSet,
 )
 
 # -------------------------
@@ -39,6 +51,13 @@ router.register(r"appointments", AppointmentViewSet, basename="appointment")
 router.register(r"medical-records", MedicalRecordViewSet, basename="medicalrecord")
 router.register(r"prescriptions", PrescriptionViewSet, basename="prescription")
 router.register(r"lab-results", LabResultViewSet, basename="labresult")
+router.register(r"vitals-thresholds", VitalsThresholdViewSet, basename="vitals-threshold")
+router.register(r"notifications", NotificationViewSet, basename="notification")
+router.register(r"outbound-messages", OutboundMessageViewSet, basename="outbound-message")
+router.register(r"beds", BedViewSet, basename="bed")
+router.register(r"pending-admissions", PendingAdmissionViewSet, basename="pending-admission")
+router.register(r"planned-discharges", PlannedDischargeViewSet, basename="planned-discharge")
+router.register(r"pharmacy/queue", PharmacyQueueViewSet, basename="pharmacy-queue")
 
 # -------------------------
 # NURSE DASHBOARD ROUTER
@@ -67,6 +86,7 @@ urlpatterns = [
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/logout/", LogoutView.as_view(), name="token_logout"),
 
     # Prescribed Medications (shared endpoint)
     path("prescribed-medications/", PrescribedMedicationList.as_view(), name="prescribed-medications"),
@@ -76,6 +96,10 @@ urlpatterns = [
     path("me/", MeView.as_view(), name="me"),
     path("settings/", UserSettingsView.as_view(), name="user-settings"),
     path("nurse/me/", nurse_me, name="nurse-me"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("vitals/bulk/", BulkVitalsUploadView.as_view(), name="vitals-bulk"),
+    path("jobs/stats/", JobStatsView.as_view(), name="job-stats"),
+    path("_perf/", PerfReportView.as_view(), name="perf-report"),
 
     # Include routers
     path("", include(router.urls)),
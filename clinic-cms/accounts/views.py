@@ -4,13 +4,18 @@ from rest_framework.response import Response
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.generics import CreateAPIView
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from rest_framework.viewsets import ModelViewSet
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_datetime, parse_date
+from datetime import timedelta, datetime, time
 from django.utils import timezone
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +23,9 @@ logger = logging.getLogger(__name__)
 # Import models
 from .models import (
     User, Roles, Patient, Appointment, MedicalRecord, Prescription,
-    LabResult, Task, Medication, Alert, HandoverLog, PrescribedMedication
+    LabResult, Task, Medication, Alert, HandoverLog, PrescribedMedication,
+    SearchDocument, VitalsThreshold, Notification, OutboundMessage,
+    BedStatus, PendingAdmission, PlannedDischarge,
 )
 
 # Import serializers
@@ -31,11 +38,19 @@ from .serializers import (
     AdminCreateUserSerializer, UserSettingsSerializer,
     PrescriptionSerializer, LabResultSerializer,
     TaskSerializer, MedicationSerializer, AlertSerializer,
-    HandoverLogSerializer, NurseSerializer, PrescribedMedicationSerializer
+    HandoverLogSerializer, NurseSerializer, PrescribedMedicationSerializer,
+    VitalsObservationSerializer, LatestVitalsSerializer, BulkVitalsSerializer,
+    VitalsThresholdSerializer, NotificationSerializer, OutboundMessageSerializer,
+    BedStatusSerializer, PendingAdmissionSerializer, PlannedDischargeSerializer,
 )
 
 # Import permissions
-from .permissions import IsAdmin, IsDoctor, IsPatient, IsReceptionist, IsPharmacist, IsNurse
+from .policies import PolicyQuerysetMixin
+from .permissions import IsAdmin, IsDoctor, IsPatient, IsReceptionist, IsPharmacist, IsNurse, IsClinicStaff
+
+from . import admissions, beds, charts, handover, pharmacy, policies, rounds, timeline, transitions, search, typeahead, duplicates, vitals, jobs, notifications, messaging, reminders, profiling, metrics, revocation
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 
 # =========================================================
 # SIGNUP VIEW
@@ -55,6 +70,31 @@ class MeView(APIView):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
 
+# =========================================================
+# LOGOUT (token revocation)
+# =========================================================
+class LogoutView(APIView):
+    """
+    POST /api/token/logout/ {"refresh": "<refresh token>"}
+    Revokes the access token used for this request and, if given, the
+    refresh token, so neither can be used or refreshed again.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        tokens = [request.auth] if request.auth is not None else []
+        raw_refresh = request.data.get("refresh")
+        if raw_refresh:
+            try:
+                refresh = RefreshToken(raw_refresh)
+            except TokenError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh.get("user_id")) != str(request.user.pk):
+                return Response({"error": "Refresh token belongs to another user"}, status=status.HTTP_400_BAD_REQUEST)
+            tokens.append(refresh)
+        revocation.revoke(*tokens)
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
+
 # =========================================================
 # USERS (Admins only)
 # =========================================================
@@ -110,57 +150,47 @@ class DoctorViewSet(viewsets.ModelViewSet):
             return User.objects.filter(role=Roles.DOCTOR)
         return User.objects.none()
 
+    # summary type -> message template
+    NOTIFICATION_SUMMARY = {
+        "appointment": "You have {count} pending appointment(s) requiring approval",
+        "lab_result": "{count} new lab result(s) available for review",
+        "medical_record": "{count} new medical record(s) created",
+    }
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsDoctor])
     def notifications(self, request):
         """
-        Get notifications for the current doctor
+        Get notifications for the current doctor: appointments awaiting a
+        decision, lab results of the last 7 days and medical records of the
+        last 24 hours for their patients
         """
         try:
-            # Get pending appointments
-            pending_appointments = Appointment.objects.filter(
-                doctor=request.user,
-                status__in=['REQUESTED', 'PENDING']
-            ).count()
-            
-            # Get lab results ready for review (last 7 days)
-            lab_results = LabResult.objects.filter(
-                patient__assigned_doctor=request.user,
-                created_at__gte=timezone.now() - timedelta(days=7)
-            ).count()
-            
-            # Get completed medical records (last 24 hours)
-            completed_records = MedicalRecord.objects.filter(
-                patient__assigned_doctor=request.user,
-                created_at__gte=timezone.now() - timedelta(days=1)
-            ).count()
-
+            now = timezone.now()
+            counts = {
+                "appointment": Appointment.objects.filter(
+                    doctor=request.user, status__in=transitions.spellings("REQUESTED")
+                ).count(),
+                "lab_result": LabResult.objects.filter(
+                    patient__assigned_doctor=request.user, created_at__gte=now - timedelta(days=7)
+                ).count(),
+                "medical_record": MedicalRecord.objects.filter(
+                    patient__assigned_doctor=request.user, created_at__gte=now - timedelta(days=1)
+                ).count(),
+            }
             notifications = []
-            
-            if pending_appointments > 0:
-                notifications.append({
-                    "message": f"You have {pending_appointments} pending appointment(s) requiring approval",
-                    "type": "appointment",
-                    "count": pending_appointments
-                })
-                
-            if lab_results > 0:
-                notifications.append({
-                    "message": f"{lab_results} new lab result(s) available for review",
-                    "type": "lab_result", 
-                    "count": lab_results
-                })
-                
-            if completed_records > 0:
-                notifications.append({
-                    "message": f"{completed_records} new medical record(s) created",
-                    "type": "medical_record",
-                    "count": completed_records
-                })
+            for summary_type, template in self.NOTIFICATION_SUMMARY.items():
+                count = counts[summary_type]
+                if count > 0:
+                    notifications.append({
+                        "message": template.format(count=count),
+                        "type": summary_type,
+                        "count": count
+                    })
 
             return Response(notifications)
             
-        except Exception as e:
-            logger.error(f"Error fetching doctor notifications: {str(e)}")
+        except Exception:
+            logger.exception("Error fetching doctor notifications")
             return Response([], status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsDoctor])
@@ -211,8 +241,8 @@ class DoctorViewSet(viewsets.ModelViewSet):
             
             return Response(patient_data)
             
-        except Exception as e:
-            logger.error(f"Error fetching doctor patients: {str(e)}")
+        except Exception:
+            logger.exception("Error fetching doctor patients")
             return Response({"error": "Failed to fetch patients"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsDoctor])
@@ -260,8 +290,8 @@ class DoctorViewSet(viewsets.ModelViewSet):
             
             return Response(appointment_data)
             
-        except Exception as e:
-            logger.error(f"Error fetching doctor appointments: {str(e)}")
+        except Exception:
+            logger.exception("Error fetching doctor appointments")
             return Response({"error": "Failed to fetch appointments"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsDoctor])
@@ -305,8 +335,8 @@ class DoctorViewSet(viewsets.ModelViewSet):
                 "admittedPatients": admitted_patients  # For compatibility
             })
             
-        except Exception as e:
-            logger.error(f"Error fetching dashboard stats: {str(e)}")
+        except Exception:
+            logger.exception("Error fetching dashboard stats")
             return Response({
                 "total_patients": 0,
                 "total_appointments": 0,
@@ -322,19 +352,32 @@ class DoctorViewSet(viewsets.ModelViewSet):
 # NURSE DASHBOARD VIEWSETS (FULL CRUD)
 # =========================================================
 
+class NewestFirstPagination(CursorPagination):
+    """Keyset pages on created_at (no COUNT, no OFFSET) for ever-growing nurse logs."""
+    ordering = ("-created_at", "-id")
+    page_size = 20
+
+
 # ------------------------------
 # Nurse Tasks CRUD
 # ------------------------------
 class NurseTasksViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated, IsNurse]
+    pagination_class = NewestFirstPagination
+    filter_backends = []
 
     def get_queryset(self):
         """
         Restrict tasks to only those assigned to the current nurse.
-        Returns tasks in descending order of creation date.
+        Returns tasks in descending order of creation date; ?completed=false
+        for the open ones.
         """
-        return Task.objects.filter(nurse=self.request.user).order_by("-created_at")
+        qs = Task.objects.filter(nurse=self.request.user).select_related("nurse")
+        completed = self.request.query_params.get("completed")
+        if completed is not None:
+            qs = qs.filter(completed=completed.lower() in ["1", "true", "yes"])
+        return qs
 
     def perform_create(self, serializer):
         """
@@ -364,10 +407,16 @@ class NurseMedicationsViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Return all medications for now - nurses can see all medications
-        In a real system, you might want to filter by assigned patients
+        Nurses see every patient's medications; the list is limited to a
+        rolling window around now (?ward= narrows it to one ward).
         """
-        return Medication.objects.all().order_by("-scheduled_time")
+        qs = Medication.objects.select_related("patient__user").order_by("-scheduled_time")
+        if self.action == "list":
+            qs = rounds.recent(qs)
+            ward = self.request.query_params.get("ward")
+            if ward:
+                qs = qs.filter(patient__ward=ward)
+        return qs
 
     def perform_create(self, serializer):
         """
@@ -375,6 +424,42 @@ class NurseMedicationsViewSet(viewsets.ModelViewSet):
         """
         serializer.save()
 
+    def perform_update(self, serializer):
+        """
+        Stamp administered_at when a dose is marked as given.
+        """
+        instance = serializer.save()
+        if instance.administered and not instance.administered_at:
+            instance.administered_at = timezone.now()
+            instance.save(update_fields=["administered_at"])
+
+    @action(detail=False, methods=["get"])
+    def round(self, request):
+        """
+        Doses due, overdue and coming up, oldest first.
+        GET /api/nurse/medications/round/?ward=A&hours_back=12&hours_ahead=2
+        """
+        try:
+            lookback = min(int(request.query_params.get("hours_back", rounds.LOOKBACK_HOURS)), rounds.MAX_HOURS)
+            lookahead = min(int(request.query_params.get("hours_ahead", rounds.LOOKAHEAD_HOURS)), rounds.MAX_HOURS)
+        except ValueError:
+            return Response({"error": "hours_back and hours_ahead must be integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        doses = rounds.due(request.query_params.get("ward"), lookback_hours=max(lookback, 0),
+                           lookahead_hours=max(lookahead, 0))
+        return Response(doses)
+
+    @action(detail=False, methods=["post"])
+    def administer(self, request):
+        """
+        Mark several doses as given in one update: {"ids": [1, 2]}
+        """
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        administered = rounds.administer(ids)
+        return Response({"administered": administered, "skipped": len(set(ids)) - administered})
+
 # ------------------------------
 # Nurse Alerts CRUD
 # ------------------------------
@@ -408,12 +493,14 @@ class NurseHandoversViewSet(viewsets.ModelViewSet):
     """
     serializer_class = HandoverLogSerializer
     permission_classes = [IsAuthenticated, IsNurse]
+    pagination_class = NewestFirstPagination
+    filter_backends = []
 
     def get_queryset(self):
         """
         Return all handover logs - nurses should see all handovers for continuity of care
         """
-        return HandoverLog.objects.all().order_by("-created_at")
+        return HandoverLog.objects.select_related("nurse")
 
     def perform_create(self, serializer):
         """
@@ -421,6 +508,80 @@ class NurseHandoversViewSet(viewsets.ModelViewSet):
         """
         serializer.save(nurse=self.request.user)
 
+    @action(detail=False, methods=["get"])
+    def digest(self, request):
+        """
+        What the next shift needs: this shift's notes and admissions/
+        discharges, open tasks, unacknowledged alerts and medications due.
+        ?ward= narrows it to one ward; ?at= (ISO datetime) picks another
+        shift, e.g. the one that just ended.
+        """
+        at = request.query_params.get("at")
+        if at:
+            at = parse_datetime(at)
+            if at is None:
+                return Response({"error": "at must be an ISO datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        return Response(handover.digest(at or None, request.query_params.get("ward") or None))
+
+# ------------------------------
+# Vitals thresholds CRUD
+# ------------------------------
+class VitalsThresholdViewSet(viewsets.ModelViewSet):
+    """
+    Alert limits per vital: global (no ward, no patient), per ward, or per
+    patient. Read by the vitals rule engine on every evaluation.
+    """
+    serializer_class = VitalsThresholdSerializer
+    permission_classes = [IsAuthenticated, IsClinicStaff]
+
+    def get_queryset(self):
+        qs = VitalsThreshold.objects.all().order_by("vital", "ward", "patient_id")
+        ward = self.request.query_params.get("ward")
+        if ward is not None:
+            qs = qs.filter(ward=ward)
+        return qs
+
+# ------------------------------
+# Ward-wide vitals upload
+# ------------------------------
+class BulkVitalsUploadView(APIView):
+    """
+    POST a list of readings; they are inserted in one batch and scored by
+    the rule engine in a single pass. Returns per-reading NEWS scores and
+    findings (alerts are created automatically).
+    """
+    permission_classes = [IsAuthenticated, IsNurse | IsDoctor | IsAdmin]
+    MAX_READINGS = 10000
+
+    def post(self, request):
+        readings = request.data.get("readings") if isinstance(request.data, dict) else request.data
+        if not isinstance(readings, list) or not readings:
+            return Response({"error": "Expected a non-empty list of readings"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(readings) > self.MAX_READINGS:
+            return Response({"error": f"At most {self.MAX_READINGS} readings per upload"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BulkVitalsSerializer(data=readings, many=True)
+        serializer.is_valid(raise_exception=True)
+        entries = [dict(item, patient_id=item.pop("patient")) for item in serializer.validated_data]
+
+        patient_ids = {entry["patient_id"] for entry in entries}
+        known = set(Patient.objects.filter(pk__in=patient_ids).values_list("pk", flat=True))
+        unknown = sorted(patient_ids - known)
+        if unknown:
+            return Response({"error": "Unknown patient id(s)", "patients": unknown}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The vitals_recorded signal scores the batch and raises alerts,
+        # leaving each observation annotated with its result.
+        observations = vitals.record_many(entries, recorded_by=request.user)
+        results = [
+            {"patient": obs.patient_id, "observed_at": obs.observed_at,
+             "news": getattr(obs, "news", None), "findings": getattr(obs, "findings", [])}
+            for obs in observations
+        ]
+        return Response({"recorded": len(observations), "results": results}, status=status.HTTP_201_CREATED)
+
 # =========================================================
 # TASKS
 # =========================================================
@@ -455,40 +616,11 @@ class HandoverLogViewSet(viewsets.ModelViewSet):
 # =========================================================
 # APPOINTMENTS - FIXED VERSION
 # =========================================================
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Appointment.objects.select_related('patient__user', 'doctor').order_by("-created_at")
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        try:
-            user = self.request.user
-            logger.info(f"AppointmentViewSet.get_queryset called for user: {user.username} (role: {user.role})")
-            
-            queryset = Appointment.objects.select_related('patient__user', 'doctor').all()
-            
-            if user.role == Roles.PATIENT:
-                # Patient can only see their own appointments
-                patient_profile = getattr(user, 'patient_profile', None)
-                if patient_profile:
-                    queryset = queryset.filter(patient=patient_profile)
-                else:
-                    queryset = Appointment.objects.none()
-            elif user.role == Roles.DOCTOR:
-                # Doctor can see appointments where they are the doctor
-                queryset = queryset.filter(doctor=user)
-            elif user.role in [Roles.ADMIN, Roles.RECEPTIONIST, Roles.NURSE]:
-                # Admin, receptionist, and nurse can see all appointments
-                pass
-            else:
-                queryset = Appointment.objects.none()
-            
-            return queryset.order_by("-created_at")
-            
-        except Exception as e:
-            logger.error(f"Error in AppointmentViewSet.get_queryset: {str(e)}")
-            # Return empty queryset on error to prevent 500 errors
-            return Appointment.objects.none()
-
     def get_serializer_class(self):
         if self.action in ["create", "update", "partial_update"]:
             return CreateAppointmentSerializer
@@ -500,7 +632,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         except Exception as e:
-            logger.error(f"Error in AppointmentViewSet.list: {str(e)}")
+            logger.exception("Error in AppointmentViewSet.list")
             return Response(
                 {"error": "Unable to fetch appointments", "detail": str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -526,126 +658,83 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             else:
                 raise PermissionDenied("You are not allowed to create appointments.")
         except Exception as e:
-            logger.error(f"Error in AppointmentViewSet.perform_create: {str(e)}")
+            logger.error("Error in AppointmentViewSet.perform_create: %s", e)
             raise
 
-    @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, IsDoctor])
-    def approve(self, request, pk=None):
+    def _transition(self, request, pk, action_name, past_tense):
         """
-        Approve an appointment (doctor only)
+        Run a state-machine transition (compare-and-set, no prior SELECT)
+        and return the refreshed appointment. The ownership rule is part of
+        the UPDATE's WHERE clause.
         """
+        pk = policies.pk_or_404(pk)
+        queryset = self.get_queryset()
         try:
-            appointment = self.get_object()
-            
-            # Check if the appointment belongs to the requesting doctor
-            if appointment.doctor != request.user:
+            transitions.transition(
+                policies.owned(queryset, request.user, action_name), pk, action_name, actor=request.user
+            )
+        except transitions.TransitionNotFound:
+            if queryset.filter(pk=pk).exists():
                 return Response(
-                    {"error": "You can only approve your own appointments"}, 
+                    {"error": f"You cannot {action_name} this appointment"},
                     status=status.HTTP_403_FORBIDDEN
                 )
-            
-            # Check if appointment is in a state that can be approved
-            if appointment.status not in ['REQUESTED', 'PENDING']:
-                return Response(
-                    {"error": f"Cannot approve appointment with status: {appointment.status}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            appointment.status = 'ACCEPTED'
-            appointment.save()
-            
-            serializer = self.get_serializer(appointment)
-            return Response({
-                "message": "Appointment approved successfully",
-                "appointment": serializer.data
-            })
-            
-        except Exception as e:
-            logger.error(f"Error approving appointment: {str(e)}")
+            return Response({"error": "Appointment not found"}, status=status.HTTP_404_NOT_FOUND)
+        except transitions.InvalidTransition as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            logger.exception("Error during appointment %s", action_name)
             return Response(
-                {"error": "Failed to approve appointment"}, 
+                {"error": f"Failed to {action_name} appointment"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        appointment = queryset.get(pk=pk)
+        serializer = self.get_serializer(appointment)
+        return Response({
+            "message": f"Appointment {past_tense} successfully",
+            "appointment": serializer.data
+        })
+
+    @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, IsDoctor])
+    def approve(self, request, pk=None):
+        """
+        Approve an appointment (doctor only)
+        """
+        return self._transition(request, pk, "approve", "approved")
+
     @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, IsDoctor])
     def decline(self, request, pk=None):
         """
         Decline an appointment (doctor only)
         """
-        try:
-            appointment = self.get_object()
-            
-            # Check if the appointment belongs to the requesting doctor
-            if appointment.doctor != request.user:
-                return Response(
-                    {"error": "You can only decline your own appointments"}, 
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Check if appointment is in a state that can be declined
-            if appointment.status not in ['REQUESTED', 'PENDING']:
-                return Response(
-                    {"error": f"Cannot decline appointment with status: {appointment.status}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            appointment.status = 'DECLINED'
-            appointment.save()
-            
-            serializer = self.get_serializer(appointment)
-            return Response({
-                "message": "Appointment declined successfully",
-                "appointment": serializer.data
-            })
-            
-        except Exception as e:
-            logger.error(f"Error declining appointment: {str(e)}")
-            return Response(
-                {"error": "Failed to decline appointment"}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return self._transition(request, pk, "decline", "declined")
 
     @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, IsDoctor])
     def complete(self, request, pk=None):
         """
         Mark appointment as completed (doctor only)
         """
-        try:
-            appointment = self.get_object()
-            
-            # Check if the appointment belongs to the requesting doctor
-            if appointment.doctor != request.user:
-                return Response(
-                    {"error": "You can only complete your own appointments"}, 
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Check if appointment can be completed
-            if appointment.status not in ['ACCEPTED', 'APPROVED']:
-                return Response(
-                    {"error": f"Cannot complete appointment with status: {appointment.status}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            appointment.status = 'COMPLETED'
-            appointment.save()
-            
-            serializer = self.get_serializer(appointment)
-            return Response({
-                "message": "Appointment completed successfully",
-                "appointment": serializer.data
-            })
-            
-        except Exception as e:
-            logger.error(f"Error completing appointment: {str(e)}")
-            return Response(
-                {"error": "Failed to complete appointment"}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return self._transition(request, pk, "complete", "completed")
+
+    @action(detail=False, methods=['get'], url_path='transition-stats', permission_classes=[IsAuthenticated, IsAdmin])
+    def transition_stats(self, request):
+        """
+        Per-process transition throughput and latency (admin only)
+        """
+        return Response(transitions.stats.snapshot())
+
+    @action(detail=False, methods=['get'], url_path='reminder-stats', permission_classes=[IsAuthenticated, IsAdmin])
+    def reminder_stats(self, request):
+        """
+        Reminder scheduler health and lag per window (admin only)
+        """
+        return Response(reminders.stats())
+
 # =========================================================
 # MEDICAL RECORDS
 # =========================================================
-class MedicalRecordViewSet(viewsets.ModelViewSet):
+class MedicalRecordViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
     queryset = MedicalRecord.objects.all().order_by("-created_at")
     permission_classes = [IsAuthenticated]
 
@@ -655,8 +744,7 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         return MedicalRecordSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        qs = MedicalRecord.objects.all()
+        qs = super().get_queryset()
         
         # Filter by query parameters
         patient_id = self.request.query_params.get('patient')
@@ -666,59 +754,92 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
             qs = qs.filter(patient_id=patient_id)
         if appointment_id:
             qs = qs.filter(appointment_id=appointment_id)
-            
-        if user.role == Roles.PATIENT:
-            return qs.filter(patient__user=user)
-        elif user.role == Roles.DOCTOR:
-            return qs.filter(patient__assigned_doctor=user)
-        elif user.role == Roles.LAB:
-            return qs.filter(created_by=user)
-        elif user.role == Roles.NURSE:
-            return qs  # Nurses can see all medical records
-        elif user.role == Roles.RECEPTIONIST:
-            return qs.none()
         return qs
 
     def perform_create(self, serializer):
+        # The patient is already loaded by the serializer; the rule only
+        # compares its assigned_doctor_id.
         user = self.request.user
-        patient = serializer.validated_data.get("patient")
-        if user.role == Roles.DOCTOR and patient.assigned_doctor != user:
-            raise PermissionDenied("You can only add records for your assigned patients.")
-        elif user.role not in [Roles.DOCTOR, Roles.LAB, Roles.ADMIN, Roles.NURSE]:
+        record = MedicalRecord(patient=serializer.validated_data.get("patient"))
+        if not policies.permits(record, user, "create"):
+            if user.role == Roles.DOCTOR:
+                raise PermissionDenied("You can only add records for your assigned patients.")
             raise PermissionDenied("You are not allowed to create medical records.")
         serializer.save(created_by=user)
 
     def perform_update(self, serializer):
-        user = self.request.user
-        patient = serializer.instance.patient
-        if user.role == Roles.DOCTOR and patient.assigned_doctor != user:
+        # get_object() has checked the record's current patient; a record
+        # moved to another patient must be allowed for that patient too.
+        patient = serializer.validated_data.get("patient")
+        moved = MedicalRecord(patient=patient)
+        if patient is not None and not policies.permits(moved, self.request.user, self.action):
             raise PermissionDenied("You cannot update records for patients not assigned to you.")
         serializer.save()
 
 # =========================================================
 # PRESCRIPTIONS
 # =========================================================
-class PrescriptionViewSet(viewsets.ModelViewSet):
+class PrescriptionViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
     queryset = Prescription.objects.all().order_by("-created_at")
     serializer_class = PrescriptionSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        qs = Prescription.objects.all()
+        qs = super().get_queryset()
+        patient_id = self.request.query_params.get("patient")
+        if patient_id:
+            qs = qs.filter(patient_id=patient_id)
         status_param = self.request.query_params.get("status")
         if status_param:
-            qs = qs.filter(status__iexact=status_param)
-
-        if user.role == Roles.DOCTOR:
-            qs = qs.filter(patient__assigned_doctor=user)
-        elif user.role == Roles.PATIENT:
-            qs = qs.filter(patient__user=user)
-        elif user.role == Roles.NURSE:
-            # Nurses can see all prescriptions
-            pass
+            # Statuses are stored upper-case; an exact match can use the index.
+            qs = qs.filter(status=status_param.upper())
         return qs
 
+
+# =========================================================
+# PHARMACY QUEUE
+# =========================================================
+class PharmacyQueueViewSet(viewsets.ViewSet):
+    """
+    The dispensing work list (accounts/pharmacy.py).
+    GET  /api/pharmacy/queue/            open prescriptions, most urgent and oldest first
+    POST /api/pharmacy/queue/claim/      {"ids": [1, 2]}
+    POST /api/pharmacy/queue/release/    {"ids": [1, 2]}
+    POST /api/pharmacy/queue/dispense/   {"ids": [1, 2]}
+    GET  /api/pharmacy/queue/throughput/?hours=8
+    """
+    permission_classes = [IsAuthenticated, IsPharmacist]
+
+    def list(self, request):
+        return Response(pharmacy.queue())
+
+    def _batch(self, request, operation):
+        ids = request.data.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        done = operation(ids, request.user)
+        return Response({"done": done, "skipped": sorted(set(ids) - set(done))})
+
+    @action(detail=False, methods=["post"])
+    def claim(self, request):
+        return self._batch(request, pharmacy.claim)
+
+    @action(detail=False, methods=["post"])
+    def release(self, request):
+        return self._batch(request, pharmacy.release)
+
+    @action(detail=False, methods=["post"])
+    def dispense(self, request):
+        return self._batch(request, pharmacy.dispense)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsPharmacist | IsAdmin])
+    def throughput(self, request):
+        try:
+            hours = min(max(int(request.query_params.get("hours", pharmacy.THROUGHPUT_HOURS)), 1), 24 * 7)
+        except ValueError:
+            return Response({"error": "hours must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(pharmacy.throughput(hours))
+
 # =========================================================
 # PRESCRIBED MEDICATIONS
 # =========================================================
@@ -741,69 +862,373 @@ class PrescribedMedicationList(APIView):
 # =========================================================
 # PATIENTS
 # =========================================================
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Patient.objects.select_related('user').all().order_by("id")
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return Patient.objects.select_related('user').all().order_by("id")
-
     def get_serializer_class(self):
         if self.action in ["create"]:
             return CreatePatientSerializer
         return PatientSerializer
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsClinicStaff])
+    def typeahead(self, request):
+        """
+        As-you-type lookup on name, username and phone.
+        GET /api/patients/typeahead/?q=jan&limit=10
+        """
+        try:
+            limit = min(int(request.query_params.get("limit", typeahead.DEFAULT_LIMIT)), typeahead.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(typeahead.lookup(request.query_params.get("q", ""), max(limit, 1)))
+
+    @action(detail=False, methods=['post'], url_path='check-duplicates', permission_classes=[IsAuthenticated, IsClinicStaff])
+    def check_duplicates(self, request):
+        """
+        Return existing patients resembling the submitted registration details,
+        without creating anything.
+        """
+        payload = request.data.copy()
+        payload["allow_duplicate"] = True
+        serializer = CreatePatientSerializer(data=payload, partial=True)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        matches = duplicates.find_candidates(
+            data.get("first_name", ""),
+            data.get("last_name", ""),
+            data.get("date_of_birth"),
+            data.get("phone", ""),
+            data.get("next_of_kin_phone", ""),
+        )
+        return Response({"duplicates": matches})
+
+    @staticmethod
+    def _optional_id(request, name):
+        value = request.data.get(name)
+        if value in (None, ""):
+            return None
+        return int(value)
+
+    def _workflow(self, operation, *args, **kwargs):
+        try:
+            return operation(*args, **kwargs), None
+        except (Patient.DoesNotExist, BedStatus.DoesNotExist, transitions.TransitionNotFound):
+            return None, Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        except beds.BedConflict as e:
+            return None, Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except (admissions.InvalidPatientTransition, transitions.InvalidTransition) as e:
+            return None, Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'])
     def admit(self, request, pk=None):
+        """
+        Admit, optionally into a bed: {"bed": 3} or {"ward": "A"} (first
+        free bed), and settling a pending admission: {"pending_admission": 7}
+        """
         patient = self.get_object()
-        patient.status = 'Admitted'
-        patient.save()
-        return Response({'status': 'Patient admitted'})
+        try:
+            bed_id = self._optional_id(request, "bed")
+            pending_id = self._optional_id(request, "pending_admission")
+        except (TypeError, ValueError):
+            return Response({"error": "bed and pending_admission must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        bed, error = self._workflow(
+            admissions.admit, patient.pk, request.user,
+            ward=request.data.get("ward") or None, bed_id=bed_id, pending_admission_id=pending_id,
+        )
+        if error:
+            return error
+        return Response({'status': 'Patient admitted', 'bed': BedStatusSerializer(bed).data if bed else None})
 
     @action(detail=True, methods=['post'])  
     def discharge(self, request, pk=None):
+        """Discharge, freeing the patient's bed and completing planned discharges."""
         patient = self.get_object()
-        patient.status = 'Discharged'
-        patient.save()
-        return Response({'status': 'Patient discharged'})
+        bed, error = self._workflow(admissions.discharge, patient.pk, request.user)
+        if error:
+            return error
+        return Response({'status': 'Patient discharged', 'bed': bed.pk if bed else None})
 
     @action(detail=True, methods=['post'])
     def attend(self, request, pk=None):
+        """Mark attended, completing {"appointment": 5} or today's accepted appointment."""
         patient = self.get_object()
-        patient.status = 'Attended'
-        patient.save()
-        return Response({'status': 'Patient attended'})
+        try:
+            appointment_id = self._optional_id(request, "appointment")
+        except (TypeError, ValueError):
+            return Response({"error": "appointment must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        appointment_id, error = self._workflow(admissions.attend, patient.pk, request.user, appointment_id)
+        if error:
+            return error
+        return Response({'status': 'Patient attended', 'appointment': appointment_id})
+
+    @action(detail=False, methods=['post'], url_path='discharge-ward', permission_classes=[IsAuthenticated, IsClinicStaff])
+    def discharge_ward(self, request):
+        """
+        End-of-day discharge of a ward in one transaction:
+        {"ward": "A"} discharges admitted patients whose planned discharge
+        is due before "until" (ISO date or datetime; default midnight tonight);
+        {"ward": "A", "patients": [4, 9]} discharges those patients.
+        """
+        ward = request.data.get("ward")
+        if not ward:
+            return Response({"error": "ward is required"}, status=status.HTTP_400_BAD_REQUEST)
+        patient_ids = request.data.get("patients")
+        if patient_ids is not None and (
+            not isinstance(patient_ids, list) or not all(isinstance(i, int) for i in patient_ids)
+        ):
+            return Response({"error": "patients must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            until = self._parse_bound(request.data.get("until"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        discharged = admissions.discharge_ward(ward, request.user, until=until, patient_ids=patient_ids)
+        skipped = sorted(set(patient_ids) - set(discharged)) if patient_ids is not None else []
+        return Response({"discharged": discharged, "skipped": skipped})
     
+    @action(detail=True, methods=['get', 'post'])
+    def vitals(self, request, pk=None):
+        """
+        GET: vitals history. ?start=&end= bound the range (ISO date or
+        datetime); ?bucket=hour|day|week|month downsamples to min/max/avg
+        per bucket for trend charts; otherwise the newest ?limit= readings.
+        POST: append an observation (nurses, doctors, admins).
+        """
+        if request.method == "POST":
+            if request.user.role not in [Roles.NURSE, Roles.DOCTOR, Roles.ADMIN]:
+                return Response({"error": "Not allowed to record vitals"}, status=status.HTTP_403_FORBIDDEN)
+            patient = self.get_object()
+            serializer = VitalsObservationSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = dict(serializer.validated_data)
+            observation = vitals.record(
+                patient.pk, data, observed_at=data.pop("observed_at", None), recorded_by=request.user
+            )
+            return Response(VitalsObservationSerializer(observation).data, status=status.HTTP_201_CREATED)
+
+        bucket = request.query_params.get("bucket")
+        if bucket and bucket not in vitals.BUCKETS:
+            return Response(
+                {"error": f"bucket must be one of: {', '.join(vitals.BUCKETS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start = self._parse_bound(request.query_params.get("start"))
+            end = self._parse_bound(request.query_params.get("end"))
+            limit = min(int(request.query_params.get("limit", 500)), 5000)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        patient = self.get_object()
+        return Response(vitals.series(patient.pk, start=start, end=end, bucket=bucket, limit=limit))
+
+    @action(detail=True, methods=['get'])
+    def chart(self, request, pk=None):
+        """
+        Chart summary (name, age, latest vitals, active prescriptions, recent
+        labs, outstanding invoices) from the patient's snapshot row. The ETag
+        is the snapshot version; If-None-Match with it returns 304.
+        """
+        try:
+            snapshot = charts.get(int(pk))
+        except ValueError:
+            snapshot = None
+        if snapshot is None:
+            return Response({"error": "Patient not found"}, status=status.HTTP_404_NOT_FOUND)
+        version, data = snapshot
+        etag = f'"{version}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({"version": version, **charts.view(data, request.user)})
+        response["ETag"] = etag
+        return response
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Records, lab results, prescriptions, appointments and invoices as one
+        history, newest first, in keyset pages.
+        GET /api/patients/{id}/timeline/?limit=50&cursor=...
+        """
+        try:
+            limit = min(int(request.query_params.get("limit", timeline.DEFAULT_LIMIT)), timeline.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        pk = policies.pk_or_404(pk)
+        if not self.get_queryset().filter(pk=pk).exists():
+            return Response({"error": "Patient not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            events, cursor = timeline.page(pk, request.user, request.query_params.get("cursor"), max(limit, 1))
+        except timeline.InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        next_url = None
+        if cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+        return Response({"next": next_url, "results": events})
+
+    @action(detail=True, methods=['get'], url_path='vitals/latest')
+    def latest_vitals(self, request, pk=None):
+        """
+        Current vitals, served from the per-patient LatestVitals row.
+        """
+        latest = vitals.latest(policies.pk_or_404(pk))
+        if latest is None:
+            return Response({"error": "No vitals recorded"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(LatestVitalsSerializer(latest).data)
+
+    @staticmethod
+    def _parse_bound(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f"Invalid date: {value}")
+            parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def perform_create(self, serializer):
+        patient = serializer.save()
+        self._record_vitals(patient, serializer.validated_data)
+
     def perform_update(self, serializer):
         """
         Allow updating patient information including vitals and status
         """
-        serializer.save()
+        patient = serializer.save()
+        self._record_vitals(patient, serializer.validated_data)
+
+    def _record_vitals(self, patient, data):
+        # Vitals written through the patient endpoints are also appended to
+        # the time series; the Patient columns were just saved, so no mirror.
+        values = vitals.from_patient_fields(data)
+        if values:
+            vitals.record(patient.pk, values, recorded_by=self.request.user, mirror_patient=False)
+
+# =========================================================
+# BEDS & ADMISSIONS
+# =========================================================
+class BedViewSet(viewsets.ModelViewSet):
+    """
+    Beds per ward. Occupancy changes go through assign/release/allocate,
+    which lock the bed row; board and projection are served from the
+    in-process occupancy index (accounts/beds.py).
+    """
+    queryset = BedStatus.objects.select_related("patient__user").order_by("ward", "bed_number", "id")
+    serializer_class = BedStatusSerializer
+    permission_classes = [IsAuthenticated, IsClinicStaff]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        ward = self.request.query_params.get("ward")
+        if ward is not None:
+            qs = qs.filter(ward=ward)
+        return qs
+
+    @staticmethod
+    def _patient_id(request):
+        try:
+            patient_id = int(request.data.get("patient"))
+        except (TypeError, ValueError):
+            return None
+        return patient_id if Patient.objects.filter(pk=patient_id).exists() else None
+
+    def _occupancy_change(self, operation, *args):
+        try:
+            bed = operation(*args)
+        except BedStatus.DoesNotExist:
+            return Response({"error": "Bed not found"}, status=status.HTTP_404_NOT_FOUND)
+        except beds.BedConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(bed).data)
+
+    @action(detail=False, methods=["get"])
+    def board(self, request):
+        """
+        Every ward's beds in one response:
+        {ward: {"beds": [...], "ids": [...], "occupancy": "0110", "patients": [...], "free": n}}
+        """
+        return Response(beds.board.snapshot())
+
+    @action(detail=False, methods=["get"])
+    def projection(self, request):
+        """
+        Free beds per ward now and after the planned discharges and pending
+        admissions of the next ?hours= (default 24).
+        """
+        try:
+            hours = min(max(int(request.query_params.get("hours", beds.PROJECTION_HOURS)), 0), 24 * 7)
+        except ValueError:
+            return Response({"error": "hours must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(beds.projection(hours))
+
+    @action(detail=True, methods=["post"])
+    def assign(self, request, pk=None):
+        """Put a patient in this bed: {"patient": 12}"""
+        patient_id = self._patient_id(request)
+        if patient_id is None:
+            return Response({"error": "patient must be an existing patient id"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._occupancy_change(beds.assign, policies.pk_or_404(pk), patient_id)
+
+    @action(detail=True, methods=["post"])
+    def release(self, request, pk=None):
+        """Free this bed."""
+        return self._occupancy_change(beds.release, policies.pk_or_404(pk))
+
+    @action(detail=False, methods=["post"])
+    def allocate(self, request):
+        """Put a patient in the first free bed of a ward: {"ward": "A", "patient": 12}"""
+        patient_id = self._patient_id(request)
+        if patient_id is None:
+            return Response({"error": "patient must be an existing patient id"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._occupancy_change(beds.allocate, request.data.get("ward", ""), patient_id)
+
+
+class PendingAdmissionViewSet(viewsets.ModelViewSet):
+    queryset = PendingAdmission.objects.order_by("created_at")
+    serializer_class = PendingAdmissionSerializer
+    permission_classes = [IsAuthenticated, IsClinicStaff]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        processed = self.request.query_params.get("processed")
+        if processed is not None:
+            qs = qs.filter(processed=processed.lower() in ["1", "true", "yes"])
+        return qs
+
+
+class PlannedDischargeViewSet(viewsets.ModelViewSet):
+    queryset = PlannedDischarge.objects.select_related("patient__user").order_by("target_time")
+    serializer_class = PlannedDischargeSerializer
+    permission_classes = [IsAuthenticated, IsClinicStaff]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        completed = self.request.query_params.get("completed")
+        if completed is not None:
+            qs = qs.filter(completed=completed.lower() in ["1", "true", "yes"])
+        return qs
 
 # =========================================================
 # LAB RESULTS
 # =========================================================
-class LabResultViewSet(viewsets.ModelViewSet):
+class LabResultViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
     queryset = LabResult.objects.all().order_by("-created_at")
     serializer_class = LabResultSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        qs = LabResult.objects.all().order_by("-created_at")
-        doctor_param = self.request.query_params.get("doctor")
-
-        if doctor_param == "true" and user.role == Roles.DOCTOR:
-            qs = qs.filter(patient__assigned_doctor=user)
-        elif user.role == Roles.PATIENT:
-            qs = qs.filter(patient__user=user)
-        elif user.role == Roles.LAB:
-            qs = qs.filter(created_by=user)
-        elif user.role == Roles.NURSE:
-            # Nurses can see all lab results
-            pass
-        elif user.role == Roles.RECEPTIONIST:
-            qs = qs.none()
+        qs = super().get_queryset()
+        patient_id = self.request.query_params.get("patient")
+        if patient_id:
+            qs = qs.filter(patient_id=patient_id)
+        # Doctors see every result unless they ask for their own patients'.
+        if self.request.query_params.get("doctor") == "true" and self.request.user.role == Roles.DOCTOR:
+            qs = qs.filter(patient__assigned_doctor=self.request.user)
         return qs
 
 # =========================================================
@@ -852,6 +1277,169 @@ class UserSettingsView(APIView):
         serializer.save()
         return Response({"message": "Settings updated successfully!", "settings": serializer.data})
 
+# =========================================================
+# SEARCH
+# =========================================================
+class SearchView(APIView):
+    """
+    Ranked, role-scoped full-text search over patients, medical records,
+    lab results and prescriptions.
+    GET /api/search/?q=malaria&kind=lab_result&page=2
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = PageNumberPagination
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "Query parameter 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        kind = request.query_params.get("kind")
+        if kind and kind not in dict(SearchDocument.KIND_CHOICES):
+            return Response({"error": f"Unknown kind: {kind}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search.search(request.user, query, kind=kind)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(results, request, view=self)
+        return paginator.get_paginated_response(list(page))
+
+# =========================================================
+# NOTIFICATIONS
+# =========================================================
+class NotificationPagination(CursorPagination):
+    """Keyset pages (no COUNT); the unread total comes from the per-user counter."""
+    ordering = "-created_at"
+    page_size = 20
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["unread_count"] = notifications.unread_count(self.request.user)
+        return response
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The current user's notifications, newest first.
+    GET /api/notifications/?unread=true
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        qs = Notification.objects.filter(user=self.request.user).select_related("user")
+        if self.request.query_params.get("unread", "").lower() in ["1", "true", "yes"]:
+            qs = qs.filter(read=False)
+        return qs
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        return Response({"unread": notifications.unread_count(request.user)})
+
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        """
+        Mark notifications read: {"ids": [1, 2]} or {} for all
+        """
+        ids = request.data.get("ids")
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        marked = notifications.mark_read(request.user, ids)
+        return Response({"marked": marked, "unread": notifications.unread_count(request.user)})
+
+# =========================================================
+# OUTBOUND MESSAGES (email/SMS outbox)
+# =========================================================
+class OutboundMessageViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Admin view of the email/SMS outbox.
+    GET /api/outbound-messages/?status=dead&channel=sms
+    """
+    serializer_class = OutboundMessageSerializer
+    permission_classes = [IsAuthenticated, IsAdmin]
+    filter_backends = []
+
+    def get_queryset(self):
+        qs = OutboundMessage.objects.order_by("-created_at")
+        for field in ["status", "channel"]:
+            value = self.request.query_params.get(field)
+            if value:
+                qs = qs.filter(**{field: value})
+        return qs
+
+    @action(detail=False, methods=["post"])
+    def retry(self, request):
+        """
+        Re-queue dead letters: {"ids": [1, 2]} or {} for all
+        """
+        ids = request.data.get("ids")
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"requeued": messaging.retry_dead(ids)})
+
+# =========================================================
+# PROMETHEUS METRICS
+# =========================================================
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint: GET /metrics with "Authorization: Bearer
+    <METRICS_TOKEN>". Without a configured token the endpoint does not exist.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# =========================================================
+# PERFORMANCE REPORT
+# =========================================================
+class PerfReportView(APIView):
+    """
+    Worst endpoints from this process's recent requests (admin only;
+    needs QUERY_PROFILING).
+    GET /api/_perf/?sort=queries|time|db&limit=20
+    DELETE /api/_perf/ clears the buffer
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        if not settings.QUERY_PROFILING:
+            return Response({"error": "Query profiling is disabled; set QUERY_PROFILING=True"},
+                            status=status.HTTP_404_NOT_FOUND)
+        sort = request.query_params.get("sort", "queries")
+        if sort not in profiling.SORT_KEYS:
+            return Response({"error": f"sort must be one of {', '.join(profiling.SORT_KEYS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(profiling.perf_log.report(sort=sort, limit=limit))
+
+    def delete(self, request):
+        profiling.perf_log.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# =========================================================
+# BACKGROUND JOBS
+# =========================================================
+class JobStatsView(APIView):
+    """
+    Job queue depth and per-task outcomes/timings (admin only).
+    GET /api/jobs/stats/?hours=24
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get("hours", 24))
+        except ValueError:
+            return Response({"error": "hours must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(jobs.stats(since=timezone.now() - timedelta(hours=hours)))
+
 # =========================================================
 # NURSE "ME" ENDPOINT
 # =========================================================
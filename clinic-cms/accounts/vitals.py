@@ -0,0 +1,172 @@
+"""
+Vitals time series.
+
+Every reading is appended to ``VitalsObservation``; nothing is overwritten.
+``LatestVitals`` holds one row per patient with the newest value of each
+vital and when it was observed, so "current vitals" is a primary-key read.
+Each vital is merged on its own: a partial or late reading fills the
+values it has that are newer than the stored ones and leaves the rest. The legacy vitals columns
+on ``Patient`` are kept in step for the serializers that still read them.
+"""
+import re
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.db.models import Avg, Case, Count, F, Max, Min, Q, Value, When
+from django.db.models.functions import Greatest, TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import LatestVitals, Patient, VitalsObservation
+
+VITAL_FIELDS = ("temperature", "systolic", "diastolic", "heart_rate", "respiratory_rate")
+SERIES_FIELDS = ("id", "observed_at") + VITAL_FIELDS
+
+BUCKETS = {
+    "hour": TruncHour,
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+# Sent once per record_many() call with ``observations`` (the saved batch).
+vitals_recorded = Signal()
+
+BP_RE = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$")
+
+
+def parse_blood_pressure(value):
+    """'120/80' -> (120, 80); anything unparseable -> (None, None)."""
+    match = BP_RE.match(value or "")
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def format_blood_pressure(systolic, diastolic):
+    if systolic is None or diastolic is None:
+        return ""
+    return f"{systolic}/{diastolic}"
+
+
+def from_patient_fields(data):
+    """Map Patient-style vitals (free-text blood_pressure) to observation fields."""
+    values = {f: data.get(f) for f in ("temperature", "heart_rate", "respiratory_rate") if data.get(f) is not None}
+    systolic, diastolic = parse_blood_pressure(data.get("blood_pressure"))
+    if systolic is not None:
+        values["systolic"], values["diastolic"] = systolic, diastolic
+    return values
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def record(patient_id, values, observed_at=None, recorded_by=None, mirror_patient=True):
+    """Append one observation and refresh the patient's latest vitals."""
+    entry = dict(values, patient_id=patient_id, observed_at=observed_at or timezone.now())
+    return record_many([entry], recorded_by=recorded_by, mirror_patient=mirror_patient)[0]
+
+
+def record_many(entries, recorded_by=None, mirror_patient=True):
+    """
+    Append many observations with one bulk INSERT, then refresh
+    ``LatestVitals`` once per patient with the newest reading of each vital.
+    ``entries`` are dicts with ``patient_id``, optional ``observed_at`` and
+    any of ``VITAL_FIELDS``.
+    """
+    now = timezone.now()
+    observations = [
+        VitalsObservation(
+            patient_id=entry["patient_id"],
+            observed_at=entry.get("observed_at") or now,
+            recorded_by=recorded_by,
+            **{f: entry.get(f) for f in VITAL_FIELDS},
+        )
+        for entry in entries
+    ]
+    # patient_id -> [newest observed_at, {field: (value, observed_at)}]
+    newest = {}
+    for obs in observations:
+        entry = newest.setdefault(obs.patient_id, [obs.observed_at, {}])
+        entry[0] = max(entry[0], obs.observed_at)
+        for field in VITAL_FIELDS:
+            value = getattr(obs, field)
+            if value is not None and (field not in entry[1] or obs.observed_at >= entry[1][field][1]):
+                entry[1][field] = (value, obs.observed_at)
+
+    with transaction.atomic():
+        VitalsObservation.objects.bulk_create(observations)
+        for patient_id, (observed_at, readings) in newest.items():
+            _materialize(patient_id, observed_at, readings, mirror_patient)
+    vitals_recorded.send(sender=VitalsObservation, observations=observations)
+    return observations
+
+
+def _materialize(patient_id, observed_at, readings, mirror_patient):
+    # One UPDATE compares each vital's stored time with its reading's, so a
+    # heart-rate-only observation does not blank the last temperature and
+    # an older reading does not overwrite a newer value.
+    changes = {"observed_at": Greatest("observed_at", Value(observed_at))}
+    for field, (value, at) in readings.items():
+        newer = Q(**{f"{field}_at__isnull": True}) | Q(**{f"{field}_at__lte": at})
+        changes[field] = Case(
+            When(newer, then=Value(value)), default=F(field), output_field=LatestVitals._meta.get_field(field),
+        )
+        changes[f"{field}_at"] = Case(
+            When(newer, then=Value(at)), default=F(f"{field}_at"), output_field=LatestVitals._meta.get_field(f"{field}_at"),
+        )
+    row = LatestVitals.objects.filter(patient_id=patient_id)
+    if not row.update(**changes):
+        defaults = {"observed_at": observed_at}
+        for field, (value, at) in readings.items():
+            defaults[field], defaults[f"{field}_at"] = value, at
+        _, created = LatestVitals.objects.get_or_create(patient_id=patient_id, defaults=defaults)
+        if not created:
+            row.update(**changes)  # created concurrently; merge into it
+
+    if mirror_patient and readings:
+        # Mirror what is now stored, which may be newer than this batch.
+        current = row.values(*VITAL_FIELDS).first()
+        legacy = {f: current[f] for f in ("temperature", "heart_rate", "respiratory_rate") if f in readings}
+        blood_pressure = format_blood_pressure(current["systolic"], current["diastolic"])
+        if blood_pressure and {"systolic", "diastolic"} & set(readings):
+            legacy["blood_pressure"] = blood_pressure
+        if legacy:
+            Patient.objects.filter(pk=patient_id).update(**legacy)
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def latest(patient_id):
+    return LatestVitals.objects.filter(patient_id=patient_id).first()
+
+
+def series(patient_id, start=None, end=None, bucket=None, limit=500):
+    """
+    Raw observations (newest first, at most ``limit``) or, with ``bucket``,
+    per-bucket count/min/max/avg computed in the database.
+    """
+    qs = VitalsObservation.objects.filter(patient_id=patient_id)
+    if start:
+        qs = qs.filter(observed_at__gte=start)
+    if end:
+        qs = qs.filter(observed_at__lt=end)
+
+    if not bucket:
+        return list(qs.order_by("-observed_at").values(*SERIES_FIELDS)[:limit])
+
+    aggregates = {"count": Count("id")}
+    for field in VITAL_FIELDS:
+        aggregates[f"{field}_min"] = Min(field)
+        aggregates[f"{field}_max"] = Max(field)
+        aggregates[f"{field}_avg"] = Avg(field)
+    rows = (
+        qs.annotate(bucket=BUCKETS[bucket]("observed_at"))
+        .values("bucket")
+        .annotate(**aggregates)
+        .order_by("bucket")
+    )
+    return [
+        {k: (round(float(v), 1) if k.endswith("_avg") and v is not None else v) for k, v in row.items()}
+        for row in rows
+    ]
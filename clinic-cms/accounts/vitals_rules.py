@@ -0,0 +1,144 @@
+"""
+Vitals rule engine: turns incoming readings into ``Alert`` rows.
+
+Two kinds of rule are evaluated:
+
+* configured ``VitalsThreshold`` limits, resolved per reading with patient
+  rules overriding ward rules overriding global ones;
+* an early-warning score using the NEWS2 bands for the vitals we capture
+  (respiratory rate, temperature, systolic BP, heart rate).
+
+A batch is scored column by column: thresholds are resolved once per
+patient up front (two queries for the whole batch), then each vital's
+column is run through its band table in a single tight loop, so a ward
+upload of thousands of readings costs a handful of queries plus one
+``bulk_create`` for the alerts.
+"""
+import bisect
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Alert, Patient, VitalsThreshold
+from .vitals import VITAL_FIELDS
+
+# -----------------------------
+# Early-warning score (NEWS2 bands)
+# -----------------------------
+# vital -> (inclusive upper bounds, score for each band); the band index is
+# bisect_left(bounds, value).
+NEWS_BANDS = {
+    "respiratory_rate": ([8, 11, 20, 24], [3, 1, 0, 2, 3]),
+    "temperature": ([35.0, 36.0, 38.0, 39.0], [3, 1, 0, 1, 2]),
+    "systolic": ([90, 100, 110, 219], [3, 2, 1, 0, 3]),
+    "heart_rate": ([40, 50, 90, 110, 130], [3, 1, 0, 1, 2, 3]),
+}
+NEWS_URGENT = 5      # aggregate score requiring urgent review
+NEWS_RED = 3         # a single parameter this high also alerts
+
+LABELS = dict(VitalsThreshold.VITAL_CHOICES)
+
+
+def news_column(vital, values):
+    """Score one vital's column; None readings score None."""
+    bounds, scores = NEWS_BANDS[vital]
+    return [None if v is None else scores[bisect.bisect_left(bounds, float(v))] for v in values]
+
+
+# -----------------------------
+# Threshold resolution
+# -----------------------------
+def resolve_limits(patient_ids):
+    """
+    {patient_id: {vital: (low, high)}} with patient > ward > global
+    precedence. Two queries regardless of batch size.
+    """
+    wards = dict(Patient.objects.filter(pk__in=patient_ids).values_list("pk", "ward"))
+    rules = VitalsThreshold.objects.filter(active=True).filter(
+        Q(patient_id__in=patient_ids) | Q(patient__isnull=True, ward__in=set(wards.values()) | {""})
+    ).values_list("patient_id", "ward", "vital", "low", "high")
+
+    global_limits, ward_limits, patient_limits = {}, defaultdict(dict), defaultdict(dict)
+    for patient_id, ward, vital, low, high in rules:
+        if patient_id:
+            patient_limits[patient_id][vital] = (low, high)
+        elif ward:
+            ward_limits[ward][vital] = (low, high)
+        else:
+            global_limits[vital] = (low, high)
+
+    return {
+        pid: {**global_limits, **ward_limits.get(ward, {}), **patient_limits.get(pid, {})}
+        for pid, ward in wards.items()
+    }
+
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+def evaluate(observations, create_alerts=True):
+    """
+    Score a batch of ``VitalsObservation`` objects (saved or not). Returns
+    one dict per observation with its NEWS score and findings (also set as
+    ``obs.news`` / ``obs.findings``); with
+    ``create_alerts`` the findings are written as ``Alert`` rows, skipping
+    any identical unacknowledged alert already open for the patient.
+    """
+    if not observations:
+        return []
+    patient_ids = [obs.patient_id for obs in observations]
+    limits = resolve_limits(set(patient_ids))
+    columns = {f: [getattr(obs, f) for obs in observations] for f in VITAL_FIELDS}
+    findings = [[] for _ in observations]
+
+    # Configured thresholds, one column at a time.
+    for vital, values in columns.items():
+        label = LABELS[vital]
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            low, high = limits.get(patient_ids[i], {}).get(vital, (None, None))
+            if low is not None and value < low:
+                findings[i].append(f"{label} {value} below limit {low}")
+            elif high is not None and value > high:
+                findings[i].append(f"{label} {value} above limit {high}")
+
+    # Early-warning score, one column at a time.
+    totals = [0] * len(observations)
+    for vital in NEWS_BANDS:
+        for i, points in enumerate(news_column(vital, columns[vital])):
+            if points is None:
+                continue
+            totals[i] += points
+            if points >= NEWS_RED:
+                findings[i].append(f"{LABELS[vital]} {columns[vital][i]} in NEWS red band")
+    for i, total in enumerate(totals):
+        if total >= NEWS_URGENT:
+            findings[i].insert(0, f"NEWS {total}: urgent clinical review")
+
+    results = []
+    for i, obs in enumerate(observations):
+        # Annotated so callers that only see the observations (e.g. via the
+        # vitals_recorded signal) can report without re-scoring.
+        obs.news, obs.findings = totals[i], findings[i]
+        results.append({"patient": obs.patient_id, "observed_at": obs.observed_at,
+                        "news": obs.news, "findings": obs.findings})
+    if create_alerts:
+        _create_alerts(results)
+    return results
+
+
+def _create_alerts(results):
+    messages = [(r["patient"], "[Auto] " + "; ".join(r["findings"])) for r in results if r["findings"]]
+    if not messages:
+        return []
+    open_alerts = set(
+        Alert.objects.filter(patient_id__in={pid for pid, _ in messages}, acknowledged=False)
+        .values_list("patient_id", "message")
+    )
+    new_alerts = []
+    for key in messages:
+        if key not in open_alerts:
+            open_alerts.add(key)
+            new_alerts.append(Alert(patient_id=key[0], message=key[1]))
+    return Alert.objects.bulk_create(new_alerts)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_timeline_indexes'),
+        ('billing', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='billing_invoice_timeline_idx'),
+        ),
+    ]
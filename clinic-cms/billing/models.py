@@ -52,6 +52,9 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["patient", "created_at", "id"], name="billing_invoice_timeline_idx")]
+
     def __str__(self):
         # String representation to show invoice ID and patient name
         return f"Invoice {self.id} - {self.patient.user.get_full_name()} - {self.status}"
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse
+from django.utils import timezone
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -12,6 +13,8 @@ from io import BytesIO
 from .models import Invoice
 from .serializers import InvoiceSerializer
 from accounts.models import Roles, Patient, Appointment, User
+from accounts import charts, policies
+from accounts.policies import PolicyQuerysetMixin
 
 
 class IsAdminOrReceptionist(BasePermission):
@@ -19,30 +22,22 @@ class IsAdminOrReceptionist(BasePermission):
         return request.user.role in [Roles.ADMIN, Roles.RECEPTIONIST]
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(PolicyQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet to handle CRUD operations for invoices.
     Provides custom actions to mark invoices as paid and download PDF invoices.
+    Visibility by role, and who may mark invoices paid, is declared in
+    accounts/policies.py.
     """
     queryset = Invoice.objects.all().order_by("-created_at")
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Restrict invoices depending on user role."""
-        user = self.request.user
-
-        if user.role in [Roles.ADMIN, Roles.RECEPTIONIST]:
-            return Invoice.objects.all().order_by("-created_at")
-        elif user.role == Roles.DOCTOR:
-            return Invoice.objects.filter(doctor=user).order_by("-created_at")
-        elif user.role == Roles.PATIENT:
-            try:
-                patient = Patient.objects.get(user=user)
-                return Invoice.objects.filter(patient=patient).order_by("-created_at")
-            except Patient.DoesNotExist:
-                return Invoice.objects.none()
-        return Invoice.objects.none()
+        qs = super().get_queryset()
+        if self.action == "download":
+            qs = qs.select_related("patient__user", "doctor", "appointment")
+        return qs
 
     def perform_create(self, serializer):
         """Receptionists/Admins can create invoices linked to patients (appointment optional)."""
@@ -93,15 +88,15 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     # =======================================================
     @action(detail=True, methods=["post"], permission_classes=[IsAdminOrReceptionist])
     def mark_as_paid(self, request, pk=None):
-        """Mark invoice as paid"""
-        invoice = self.get_object()
-
-        if invoice.status == "paid":
+        """Mark invoice as paid (a single conditional UPDATE)"""
+        pk = policies.pk_or_404(pk)
+        invoice = policies.owned(self.get_queryset(), request.user, "mark_as_paid").filter(pk=pk)
+        updated = invoice.exclude(status="paid").update(status="paid", updated_at=timezone.now())
+        if not updated:
+            self.get_object()  # 404 or 403; otherwise it was already paid
             return Response({"detail": "Invoice is already marked as paid."},
                             status=status.HTTP_400_BAD_REQUEST)
-
-        invoice.status = "paid"
-        invoice.save()
+        charts.rows_changed(invoice)
         return Response({"message": "Invoice marked as paid successfully."},
                         status=status.HTTP_200_OK)
 
@@ -160,6 +155,6 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Not authorized to view unpaid invoices."},
                             status=status.HTTP_403_FORBIDDEN)
 
-        invoices = Invoice.objects.filter(status="unpaid")
+        invoices = self.get_queryset().filter(status="unpaid")
         serializer = self.get_serializer(invoices, many=True)
         return Response(serializer.data)
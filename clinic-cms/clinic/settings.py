@@ -39,6 +39,9 @@ INSTALLED_APPS = [
 # -------------------------------------------------------------------
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "accounts.middleware.RequestContextMiddleware",
+    "accounts.middleware.MetricsMiddleware",
+    "accounts.middleware.QueryProfilingMiddleware",  # no-op unless QUERY_PROFILING is set
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # important for React
     "django.middleware.common.CommonMiddleware",
@@ -47,8 +50,12 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "accounts.middleware.NotificationBatchMiddleware",
 ]
 
+# Per-request query profiling and the /api/_perf/ report (accounts/profiling.py)
+QUERY_PROFILING = config("QUERY_PROFILING", default=False, cast=bool)
+
 ROOT_URLCONF = "clinic.urls"
 
 TEMPLATES = [
@@ -96,6 +103,36 @@ AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator"},
 ]
 
+# -------------------------------------------------------------------
+# Password hashing (accounts/passwords.py)
+# -------------------------------------------------------------------
+# New hashes use PASSWORD_HASHER ("pbkdf2", or "argon2" with argon2-cffi
+# installed); the others stay listed so existing hashes verify and are
+# upgraded on the next login. Calibrate the costs with
+# `python manage.py benchmark_passwords --target-ms 100`.
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", default=1_000_000, cast=int)
+PASSWORD_ARGON2 = {
+    "time_cost": config("PASSWORD_ARGON2_TIME_COST", default=2, cast=int),
+    "memory_cost": config("PASSWORD_ARGON2_MEMORY_COST", default=102400, cast=int),  # KiB
+    "parallelism": config("PASSWORD_ARGON2_PARALLELISM", default=8, cast=int),
+}
+_PASSWORD_HASHERS = {
+    "pbkdf2": "accounts.passwords.PBKDF2PasswordHasher",
+    "argon2": "accounts.passwords.Argon2PasswordHasher",
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Hashing pool: concurrent hashes per process (0 = one per CPU) and how
+# many logins may wait for one before the rest get 429.
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=0, cast=int)
+PASSWORD_HASH_QUEUE = config("PASSWORD_HASH_QUEUE", default=32, cast=int)
+AUTHENTICATION_BACKENDS = ["accounts.passwords.PooledModelBackend"]
+
 # -------------------------------------------------------------------
 # Internationalization
 # -------------------------------------------------------------------
@@ -128,7 +165,7 @@ CORS_ALLOWED_ORIGINS = [
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ),
     # Allow read/write by authenticated users by default
     "DEFAULT_PERMISSION_CLASSES": (
@@ -149,8 +186,78 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "0.1.0",
 }
 
+# -------------------------------------------------------------------
+# Outbound email / SMS (accounts/messaging.py)
+# -------------------------------------------------------------------
+EMAIL_BACKEND = config("EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = config("EMAIL_HOST", default="localhost")
+EMAIL_PORT = config("EMAIL_PORT", default=25, cast=int)
+EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
+EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
+EMAIL_USE_TLS = config("EMAIL_USE_TLS", default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="AfyaCare <no-reply@afyacare.local>")
+
+# Channel -> transport class; FileTransport writes to MESSAGING_FILE_PATH.
+MESSAGING_TRANSPORTS = {
+    "email": config("MESSAGING_EMAIL_TRANSPORT", default="accounts.messaging.EmailTransport"),
+    "sms": config("MESSAGING_SMS_TRANSPORT", default="accounts.messaging.ConsoleTransport"),
+}
+MESSAGING_FILE_PATH = config("MESSAGING_FILE_PATH", default=str(BASE_DIR / "outbox.jsonl"))
+
+# Prometheus metrics (accounts/metrics.py). Each process writes its samples
+# under METRICS_DIR; clear it on deploy. /metrics requires
+# "Authorization: Bearer <METRICS_TOKEN>" and answers 404 while no token is set.
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# -------------------------------------------------------------------
+# Logging (accounts/logs.py): JSON lines written by a background thread,
+# tagged with the request id and route. LOG_SAMPLING keeps only a fraction
+# of DEBUG/INFO records on busy routes; warnings and errors are never
+# sampled. Log with %-style arguments, not f-strings, so messages are only
+# formatted for records that are kept.
+# -------------------------------------------------------------------
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+LOG_FILE = config("LOG_FILE", default="")
+LOG_SAMPLING = {
+    "default": 1.0,
+    "appointment-list": 0.05,
+    "appointment-detail": 0.05,
+    "notification-list": 0.05,
+    "notification-unread-count": 0.01,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_context": {"()": "accounts.logs.ContextFilter"},
+        "sampling": {"()": "accounts.logs.SamplingFilter"},
+    },
+    "handlers": {
+        "background": {
+            "class": "accounts.logs.BackgroundHandler",
+            "filename": LOG_FILE or None,
+            "filters": ["request_context", "sampling"],
+        },
+    },
+    "root": {"handlers": ["background"], "level": LOG_LEVEL},
+    "loggers": {
+        "django": {"handlers": ["background"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
+# Appointment reminder windows: name -> hours before the slot (accounts/reminders.py)
+APPOINTMENT_REMINDER_WINDOWS = {"24h": 24, "2h": 2}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Tokens carry role/specialization/is_active so requests authenticate
+    # without loading the user (accounts/authentication.py).
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.authentication.ClaimsTokenRefreshSerializer",
+    # Revoked tokens (logout) are rejected everywhere; see accounts/revocation.py.
+    "TOKEN_VERIFY_SERIALIZER": "accounts.authentication.RevocationAwareTokenVerifySerializer",
 }
\ No newline at end of file
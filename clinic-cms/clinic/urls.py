@@ -4,6 +4,7 @@ from django.http import HttpResponse
 from django.shortcuts import redirect
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from accounts.views import metrics_view
 
 # Simple homepage view
 def home(request):
@@ -17,6 +18,9 @@ urlpatterns = [
     path('', home),  # root path
 
     path('admin/', admin.site.urls),
+
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
     
     # API schema and docs
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
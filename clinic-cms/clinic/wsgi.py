@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clinic.settings')
 
 application = get_wsgi_application()
+
+# Build in-memory lookup indexes before the first request (non-PostgreSQL only).
+from accounts import typeahead  # noqa: E402
+
+try:
+    typeahead.warm()
+except Exception:  # database not migrated/reachable yet; built lazily instead
+    pass